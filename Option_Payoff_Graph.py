@@ -1,20 +1,59 @@
 ### ------------------ Import Libraries ------------------ ###
 import streamlit as st
-import numpy as np
 import pandas as pd
 
+import numpy as np
+import altair as alt #lightweight charts for the live spot fragment
+
+import collections
+import functools
+import os
 import time
-import io #to save the matplotlib chart to a buffer so that we can download it later
 
-import matplotlib.pyplot as plt
-from matplotlib.ticker import MaxNLocator #? to set y axis only to integers in the bar chart
+from payoff_engine import evaluate_portfolio
+from payoff_charts import asset_breakdown_png, contracts_per_strike_png, payoff_graph_pngs, payoff_x_axis, submit_render
+from live_spot import LiveSpotFeed, replay_ticks, socket_ticks
+from strategy_scanner import SCAN_TEMPLATES, load_chain, scan_chain, candidate_book, candidates_display
+from chain_store import ChainStore, META_FILE
+from backtest import read_price_series, relative_payoff, backtest, outcome_summary
+from hedging_simulator import simulate_hedge, hedge_summary
+from american_pricer import LATTICE_TOLERANCE, american_book_curve
+from vol_surface import SurfaceError, load_surface
+from book_history import BookHistory
+from multi_underlying import DEFAULT_UNDERLYING, aggregate_shards, book_frame, book_underlyings, evaluate_shards, leg_underlying, shard_frames, tag_legs
+from greeks_ladder import GREEKS, book_ladder, ladder_heatmap_data
+from tail_hedge import TAIL_HEDGE_BUDGET_SECONDS, TAIL_HEDGE_MAX_LEGS, TAIL_HEDGE_MAX_QUANTITY, optimize_tail_hedge
+from payoff_export import EXPORT_MIMES, cached_export, export_file_name, export_formats, export_group, payoff_tables
+from what_if import compare_variants, curves_frame, freeze_book, result_piecewise, book_piecewise, superpose, variant_metrics
+from performance import StageTimer, performance_enabled, start_profiler, stop_profiler
 
 
 ###! ------------------ Initial Page Configuration ------------------ ###
 
+LIVE_REFRESH_SECONDS = 0.5 #how often the live spot fragment redraws
+LIVE_HISTORY_TICKS = 2000 #ticks kept for the live mark P&L line
+SCAN_TOP_CANDIDATES = 50 #rows of the strategy scanner table
+BOOK_KEYS = ("call_inputs", "put_inputs", "underlying_inputs") #session state lists of the 3 books (order of the history snapshots)
+AMERICAN_CURVE_POINTS = 301 #spots of the pre-expiry curve (1 lattice over all spots x legs)
+GREEKS_LADDER_BUCKET = 5.0 #default strike bucket width of the greeks ladder
+
 st.set_page_config(page_title="Option Expiration Payoff", layout="wide")    
 
 
+###! ------------------ Performance Instrumentation ------------------ ###
+
+#* Hidden unless the page is opened with ?perf=1 or the OPTION_PAYOFF_PERF environment variable is set
+perf_enabled = performance_enabled() or st.query_params.get("perf", "0") not in ("", "0")
+stage_timer = StageTimer(enabled=perf_enabled)
+
+if perf_enabled:
+    #* a profiled rerun interrupted by st.rerun() never reaches the end of the script, so stop its profiler first
+    if st.session_state.get("active_profiler") is not None:
+        stop_profiler(st.session_state.pop("active_profiler"))
+    if st.session_state.pop("profile_next_rerun", False):
+        st.session_state["active_profiler"] = start_profiler()
+
+
 st.title(":blue[Option Expiration Payoff Graphs]")
 
 ###! ------------------ Linkedin ------------------ ###
@@ -175,6 +214,14 @@ col1, col2, col3 = st.columns(3, gap="small", border=False)
 
 ###! ------------------ Define Option Inputs Form Function ------------------ ###
 
+def archive_expiry():
+    #* (archive path, expiry, quote date) picked in the Strategy Scanner when its path is a chain archive (chain_store.py), else None
+    path = st.session_state.get("scan_path", "")
+    if not path or st.session_state.get("scan_expiry") is None or not os.path.isfile(os.path.join(path, META_FILE)):
+        return None
+    return path, st.session_state["scan_expiry"], st.session_state.get("scan_quote_date")
+
+
 
 def asset_input_section(
     asset_type, #set asset type for the inputs to use for string outputs
@@ -221,6 +268,14 @@ def asset_input_section(
                     help=f"Select Buy or Sell for the {asset_type.lower()}s"
                 )
 
+                #* Underlying (ticker) of the leg: every underlying is its own payoff (multi_underlying.py)
+                underlying = st.text_input(
+                    label=":blue[Underlying]",
+                    value=DEFAULT_UNDERLYING,
+                    key=f"{session_key}_underlying",
+                    help="Ticker of the underlying, legs of different underlyings are evaluated separately"
+                ).strip() or DEFAULT_UNDERLYING
+
 
             strike = 0.0 #assign strike price so that the underlying input doesn't cause an error
             if asset_type != "Underlying Contract":
@@ -249,6 +304,18 @@ def asset_input_section(
                     help=f"Choose the purchase price of the {asset_type.lower()}s"
                 )
 
+            #* with a chain archive open in the Strategy Scanner the price can be the archived mid quote of the strike
+            archive = archive_expiry() if asset_type in ("Call", "Put") else None
+            price_from_archive = False
+            if archive is not None:
+                with form_col2:
+                    price_from_archive = st.checkbox(
+                        f"Mid quote of the archive ({archive[1]})",
+                        value=True,
+                        key=f"{session_key}_archive_price",
+                        help=f"Use the mid quote of the strike in the chain archive (expiry {archive[1]}, quote date {archive[2]}) instead of the price above"
+                    )
+
 
             #*Submit Button
             submitted = st.form_submit_button(
@@ -261,13 +328,26 @@ def asset_input_section(
         st.session_state[session_key] = []
 
     #*when you press the submit button add the inputs to the data AFTER checking that option and strike prices are not 0
+    if submitted and price_from_archive:
+        try:
+            quote = ChainStore(archive[0]).quote(archive[1], strike, asset_type, quote_date=archive[2])
+        except (OSError, ValueError, KeyError, ImportError): #partial or corrupt archive, the scanner shows the error
+            quote = None
+        if quote is None:
+            with col:
+                st.warning(f"⚠️ No {asset_type.lower()} quote at strike {strike:.2f} in the archive, untick the archive quote to enter a price")
+            submitted = False #nothing is added
+        else:
+            price = round(quote["mid"], 2)
+
     if submitted:
         if asset_type == "Underlying Contract":
             if price == 0: 
                 with col:
                     st.warning("⚠️ Please enter a positive price to continue")
             else:
-                st.session_state[session_key].append([asset_type, strike, number, action, price]) #update the data with the inputs
+                st.session_state[session_key].append([asset_type, strike, number, action, price, underlying]) #update the data with the inputs
+                st.session_state["book_operation"] = f"{action} {number} {asset_type}" #label of the history entry
                 st.session_state[f"{session_key}_update_msg"] = True #set a flag to show updated message on the next rerun
                 st.rerun() #executes the code again from the top without waiting for user input. To show the "updated" message immediately
         else:    
@@ -275,7 +355,8 @@ def asset_input_section(
                 with col:
                     st.warning("⚠️ Please enter a positive strike and price to continue")
             else:#if we have positive values for strike and price
-                st.session_state[session_key].append([asset_type, strike, number, action, price]) #update the data with the inputs
+                st.session_state[session_key].append([asset_type, strike, number, action, price, underlying]) #update the data with the inputs
+                st.session_state["book_operation"] = f"{action} {number} {asset_type}" #label of the history entry
                 st.session_state[f"{session_key}_update_msg"] = True #set a flag to show updated message on the next rerun
                 st.rerun() #executes the code again from the top without waiting for user input. To show the "updated" message immediately
 
@@ -289,11 +370,8 @@ def asset_input_section(
         st.session_state[f"{session_key}_update_msg"] = False #set default value to False. We only want it true when the user presses the button
         st.rerun() #Force a code rerun from the top 
 
-    #* Build DataFrame
-    portfolio_df = pd.DataFrame(
-        data=st.session_state[session_key],
-        columns=["Type", "Strike", "Quantity", "Action", "Cost"]
-    )
+    #* Build DataFrame (all underlyings, rows without an underlying belong to the default one)
+    portfolio_df = book_frame(st.session_state[session_key])
 
     #* Reset last action
     with col:
@@ -306,6 +384,7 @@ def asset_input_section(
     if last_action_btn:
         if st.session_state[session_key]: #if the state exists
             st.session_state[session_key].pop() #remove the last element (the last input)
+            st.session_state["book_operation"] = f"Reset last {asset_type} action"
             st.session_state[f"{session_key}_last_msg"] = True #flag to show message to inform that last actio has been reset
             st.rerun() #force a code rerun from the top
 
@@ -334,6 +413,7 @@ def asset_input_section(
                     st.session_state[input_key][i][3] = "Sell"
                 elif values[3] == "Sell":
                     st.session_state[input_key][i][3] = "Buy"
+            st.session_state["book_operation"] = f"Swap {asset_type} Buy - Sell"
             st.rerun()
        
 
@@ -347,6 +427,7 @@ def asset_input_section(
 
     if reset_all_btn:
         st.session_state[session_key] = []
+        st.session_state["book_operation"] = f"Reset {asset_type}s"
         st.session_state[f"{session_key}_reset_msg"] = True
         st.rerun()
 
@@ -400,56 +481,127 @@ underlying_portfolio = asset_input_section(
     default_action=1 #buy
     )
 
-st.markdown("""---""")
-
-
-###! ------------------ Portfolio Descriptive Measures ------------------ ###
-
-###! ------------------ Define Function to Apply to Portfolios to get Summaries ------------------ ###
 
-def portfolio_statistics(portfolio):
-    assets_bought_musk = portfolio["Action"] == "Buy"
-    assets_bought = portfolio[assets_bought_musk]["Quantity"].sum()
+###! ------------------ Underlying Selector & Portfolio by Underlying ------------------ ###
 
-    assets_sold_musk = portfolio["Action"] == "Sell"
-    assets_sold = portfolio[assets_sold_musk]["Quantity"].sum()
+#* every underlying is its own payoff: the sections below show the selected one, the book is summarized per underlying
+#* (1 shard per underlying, evaluated in parallel worker processes and cached by its legs)
+underlyings = book_underlyings(st.session_state)
+selected_underlying = underlyings[0]
 
-    net_assets = assets_bought - assets_sold
+if len(underlyings) > 1:
+    selected_underlying = st.radio(":blue[Underlying shown below]", underlyings, horizontal=True, key="selected_underlying")
 
-    amount_paid = portfolio[assets_bought_musk]["Cost"].sum()
-    amount_received = portfolio[assets_sold_musk]["Cost"].sum()
+    with st.expander("🌐 Portfolio by Underlying", expanded=True):
+        with stage_timer.stage("Sharded evaluation"):
+            shard_summary = evaluate_shards(st.session_state)
+        shard_totals = aggregate_shards(shard_summary)
 
-    net_amount = amount_received - amount_paid
+        total_col1, total_col2, total_col3, total_col4 = st.columns(4)
+        total_col1.metric("Underlyings", f"{shard_totals['Underlyings']} ({shard_totals['Legs']} legs)")
+        total_col2.metric("Total Cost", f"€{shard_totals['Cost']:.2f}")
+        total_col3.metric("Worst Case Max Loss", "Unlimited" if np.isinf(shard_totals["Max Loss"]) else f"€{shard_totals['Max Loss']:.2f}",
+                          help="Every underlying at its own max loss at the same time")
+        total_col4.metric("Unlimited Loss Underlyings", shard_totals["Unlimited Loss Underlyings"])
+        st.dataframe(shard_summary.round(2).assign(**{column: shard_summary[column].map(lambda value: "Unlimited" if np.isinf(value) else f"€{value:.2f}")
+                                                       for column in ("Max Profit", "Max Loss")}), width="stretch")
 
-    asset_type = portfolio["Type"].iloc[0] #Get the first element only because ALL types are the same in each dataframe
-
-    output={
-        "assets_bought" : assets_bought,
-        "assets_sold" : assets_sold,
-        "net_assets" :net_assets,
-        "amount_paid" :amount_paid,
-        "amount_received" :amount_received,
-        "net_amount" : net_amount,
-        "asset_type" : asset_type
-    }
-
-    return output
-
-#* define variables for portfolio statistics and assign portfolios to default portfolios if no inputs
-if not call_portfolio.empty:
-    call_stats = portfolio_statistics(call_portfolio)
-else:
-    call_stats = {}
+call_portfolio, put_portfolio, underlying_portfolio = shard_frames([call_portfolio, put_portfolio, underlying_portfolio], selected_underlying)
 
-if not put_portfolio.empty:
-    put_stats = portfolio_statistics(put_portfolio)
-else:
-    put_stats = {}
+st.markdown("""---""")
 
-if not underlying_portfolio.empty:
-    underlying_stats = portfolio_statistics(underlying_portfolio)
-else:
-    underlying_stats = {}
+###! ------------------ Portfolio Descriptive Measures & Payoff Calculations ------------------ ###
+
+###! ------------------ Undo / Redo History of the Books ------------------ ###
+
+#* every change of the books since the last rerun becomes 1 entry of the history (book_history.py)
+book_history = st.session_state.setdefault("book_history", BookHistory(BOOK_KEYS))
+book_history.record(st.session_state, st.session_state.pop("book_operation", "Edit books"))
+
+undo_col, redo_col, history_col = st.columns([1, 1, 4], gap="small")
+with undo_col:
+    undo_pressed = st.button("↩️ Undo", key="book_undo", disabled=not book_history.can_undo(),
+                             help=f"Undo: {book_history.current.label}" if book_history.can_undo() else "Nothing to undo")
+with redo_col:
+    redo_pressed = st.button("↪️ Redo", key="book_redo", disabled=not book_history.can_redo(),
+                             help=f"Redo: {book_history.entries[book_history.cursor + 1].label}" if book_history.can_redo() else "Nothing to redo")
+with history_col:
+    if st.session_state.get("book_history_msg"):
+        st.write(f"✅ {st.session_state.pop('book_history_msg')}")
+    st.caption(f"History: step {book_history.cursor} of {len(book_history.entries) - 1} | last change: {book_history.current.label}")
+
+if undo_pressed or redo_pressed:
+    message = f"Undone: {book_history.undo()}" if undo_pressed else f"Redone: {book_history.redo()}"
+    st.session_state.update(book_history.restore()) #fresh lists, the snapshots stay untouched
+    st.session_state["book_history_msg"] = message
+    st.rerun()
+
+#* run the payoff pipeline once per book state: statistics, slopes and P&L at the strikes, position type, breakevens
+#* (an undo / redo or a rerun that didn't change the books reuses the result kept on its history entry)
+with stage_timer.stage("Payoff cache lookup"):
+    portfolio_result = book_history.cached_result(selected_underlying)
+if portfolio_result is None:
+    portfolio_result = evaluate_portfolio(call_portfolio, put_portfolio, underlying_portfolio, timer=stage_timer)
+    book_history.store_result(selected_underlying, portfolio_result)
+
+#* define variables for portfolio statistics (empty dictionaries if there are no inputs)
+call_stats = portfolio_result["call_stats"]
+put_stats = portfolio_result["put_stats"]
+underlying_stats = portfolio_result["underlying_stats"]
+
+
+###! ------------------ Live Preview of a Leg before Submitting it ------------------ ###
+
+#* The form inputs above only send their values on submit, so the preview has its own inputs inside a fragment:
+#* every edit reruns only this fragment, which adds the leg's payoff to the cached curve of the book (what_if.superpose)
+@st.fragment
+def leg_preview_panel(base_piecewise, base_strikes):
+    preview_col1, preview_col2, preview_col3, preview_col4, preview_col5 = st.columns(5, gap="small")
+    with preview_col1:
+        preview_type = st.selectbox("Asset", ["Call", "Put", "Underlying Contract"], key="preview_type")
+    with preview_col2:
+        preview_number = st.number_input("Quantity", min_value=1, max_value=10000, value=1, step=1, key="preview_number")
+    with preview_col3:
+        preview_action = st.radio("Action", ["Buy", "Sell"], horizontal=True, key="preview_action")
+    with preview_col4:
+        preview_strike = st.number_input("Strike Price", min_value=0.0, value=float(np.median(base_strikes)) if len(base_strikes) else 100.0,
+                                         step=1.0, format="%.2f", key="preview_strike", disabled=preview_type == "Underlying Contract")
+    with preview_col5:
+        preview_price = st.number_input("Price (€)", min_value=0.0, value=1.0, step=0.1, format="%.2f", key="preview_price")
+
+    if preview_price == 0 or (preview_type != "Underlying Contract" and preview_strike == 0):
+        st.caption("Enter a positive strike and price to preview the leg")
+        return
+
+    session_key = {"Call": "call_inputs", "Put": "put_inputs", "Underlying Contract": "underlying_inputs"}[preview_type]
+    leg = [preview_type, 0.0 if preview_type == "Underlying Contract" else preview_strike, preview_number, preview_action, preview_price]
+    preview_book = {key: [leg] if key == session_key else [] for key in BOOK_KEYS}
+
+    with stage_timer.stage("Leg preview"):
+        curves = {"Current Book": base_piecewise, "With the Previewed Leg": superpose(base_piecewise, book_piecewise(freeze_book(preview_book)))}
+        metrics = {name: variant_metrics(piecewise) for name, piecewise in curves.items()}
+
+    chart_strikes = np.union1d(base_strikes, [leg[1]] if leg[1] > 0 else [])
+    prices = payoff_x_axis(pd.Series(chart_strikes if len(chart_strikes) else [preview_price]))
+    st.line_chart(curves_frame(curves, prices), x_label="Stock Price at Expiration", y_label="P&L (€)", height=260)
+    st.dataframe(pd.DataFrame({
+        name: {
+            "Cost": f"€{values['Cost']:.2f}",
+            "Max Profit": "Unlimited" if np.isinf(values["Max Profit"]) else f"€{values['Max Profit']:.2f}",
+            "Max Loss": "Unlimited" if np.isinf(values["Max Loss"]) else f"€{values['Max Loss']:.2f}",
+            "Breakevens": ", ".join(f"{point:.2f}" for point in values["Breakevens"]) or "None",
+        } for name, values in metrics.items()
+    }).T, width="stretch")
+
+    if st.button(":green[Add this Leg to the Portfolio]", key="preview_commit"):
+        st.session_state[session_key] = st.session_state.get(session_key, []) + tag_legs([leg], selected_underlying)
+        st.session_state["book_operation"] = f"{preview_action} {preview_number} {preview_type}"
+        st.rerun() #whole page: the book changed
+
+
+with st.expander("👁️ Leg Preview (before submitting)", expanded=False):
+    base_piecewise = result_piecewise(portfolio_result)
+    leg_preview_panel(base_piecewise, base_piecewise.strikes)
 
 
 #* set new columns to print portfolio summaries 
@@ -457,11 +609,11 @@ col1, col2, col3 = st.columns(3, gap="small")
 
 ###! ------------------ Define Function to Print Portfolios Summaries ------------------ ###
 
-def print_stats(portfolio, col):
+def print_stats(portfolio_stats, col):
+    #* portfolio_stats: the summary the payoff pipeline already computed ({} if there are no inputs)
     with col:
-        if not portfolio.empty: 
+        if portfolio_stats: 
             st.markdown(":blue[**Input Summary:**]")
-            portfolio_stats = portfolio_statistics(portfolio)
 
             stats_col1, stats_col2 = st.columns(2, gap="small")
 
@@ -489,478 +641,37 @@ def print_stats(portfolio, col):
                 """)
 
 
-print_stats(call_portfolio, col1)
+with stage_timer.stage("Input summaries"):
+    print_stats(call_stats, col1)
 
-print_stats(put_portfolio, col2)
+    print_stats(put_stats, col2)
 
-print_stats(underlying_portfolio, col3)
+    print_stats(underlying_stats, col3)
 
 st.markdown("""---""")
 
 
-###! ------------------ Define Total Portfolio ------------------ ###
-total_portfolio = pd.DataFrame(columns=call_portfolio.columns)
-
-if not call_portfolio.empty:
-    total_portfolio = pd.concat([total_portfolio, call_portfolio], ignore_index=True)
-
-if not put_portfolio.empty:
-    total_portfolio = pd.concat([total_portfolio, put_portfolio], ignore_index=True)
-
-
-###! ------------------ Calculate Total Option Portfolio Metrics ------------------ ###
+###! ------------------ Total Portfolio Metrics ------------------ ###
+total_portfolio = portfolio_result["total_portfolio"]
 
-#* Calculate unique Stike Prices and Total Slopes/Quantity/Position at each strike
 if not total_portfolio.empty:
+    strikes = portfolio_result["strikes"] #unique strike prices
+    total_slopes = portfolio_result["total_slopes"] #total slope in each strike price interval
+    total_p_l = portfolio_result["total_p_l"] #total P&L at each strike price
+    pivot_table_quantities = portfolio_result["pivot_table_quantities"] #call and put quantities per strike
 
-    ###* ------------------ Change Buy / Sell to 1 / -1  ------------------ ###
-    mapped_action = total_portfolio["Action"].map({"Buy":1, "Sell":-1}) #map Buy to 1 and Sell to -1
-    mapped_type = total_portfolio["Type"].map({"Call":1, "Put":-1}) #map Call to 1 and Put to -1 
-
-    ###* ------------------ Create Total Position for each option position  ------------------ ###
-    total_portfolio["Position"] = total_portfolio["Quantity"] * mapped_action
-    total_portfolio["Position_Slope"] = total_portfolio["Position"] * mapped_type
-
-    ###* ------------------ Keep track of initial column number for later loops  ------------------ ###    
-    initial_columns = len(total_portfolio.columns) #number of initial columns in DataFrame
-
-    #*Calculate Total SLope for each Strike Price
-    strike_slopes = total_portfolio.groupby("Strike")[["Position_Slope", "Quantity", "Position"]].sum()
+    #* Volatility Spread Flags and Break-even Points
+    position_flags = portfolio_result["flags"]
+    option_position = position_flags["option_position"]
+    breakeven_points = portfolio_result["breakeven_points"]
 
-    #Get the different strike prices
-    strikes = total_portfolio["Strike"].sort_values().unique()
-    strikes = pd.Series(strikes)
+    #* Netted position for the text box of the graph
+    position_text_box = portfolio_result["position_text_box"]
 
-
-else:
+elif call_portfolio.empty and put_portfolio.empty:
     st.warning("⚠️ Enter an Option to Continue")
-
-
-###! ------------------ New Columns for the DataFrame based on strike price intervals  ------------------ ###
-
-#* Create Additional Columns to add to DataFrame
-columns = [] #we will (add number of strike prices + 1) columns | Below 95, 95-105, Above 105
-
-if not total_portfolio.empty:
-
-    if len(strikes) > 0:
-        columns.append(f"Below {min(strikes)}") #below minimum strike 
-        for i in range(1, len(strikes)):
-            columns.append(f"{strikes[i-1]} - {strikes[i]}") #e.g 95 - 105
-        columns.append(f"Above {max(strikes)}") #above max strike 
-
-        number_extra_columns = len(columns) #how many extra columns we add based on different strike prices
-
-    #Insert the extra columns to the DataFrame
-    for i in columns:
-        total_portfolio.insert(len(total_portfolio.columns), i, np.nan) #start at the final original column and add the columns with NaN values
-
-###! ------------------ Determine if options are ITM / OTM and adjust slopes in the strike intervals  ------------------ ###
-
-#* Add the Slopes based on if the options are ITM / OTM
-
-if not total_portfolio.empty:
-
-    for i in range(len(total_portfolio)): #for each single option position (each row)
-        #Find the position of the column that is below the strike price
-        position = ((strikes == total_portfolio["Strike"][i]).argmax()) + initial_columns
-        #argmax() will find the position in the strikes list that is equal to the strike price
-
-        if total_portfolio["Type"][i] == "Call": #for call options
-            total_portfolio.iloc[i, initial_columns :] = 0 # we put 0s initiall on all extra columns
-            total_portfolio.iloc[i, position+1 :] = total_portfolio["Position_Slope"][i] #we put the slope of the option position where the option is ITM
-
-        else: #for put options
-            total_portfolio.iloc[i, initial_columns:] = total_portfolio["Position_Slope"][i] #we put initially the slope of the option position in all the extra columns
-            total_portfolio.iloc[i, position+1 : ] = 0 #we put 0s in the columns where the option is OTM
-
-#* Calculate the Total Underlying Position. It will be used to adjust Total Slopes
-#* if an underlying position has been entered by the user
-if not underlying_portfolio.empty:
-    underlying_position = underlying_stats.get("net_assets")
-
-
-#* Calculate Total Slopes for each strike price interval
-total_slopes = []
-#* sum the slopes in each extra column (strike price interval) and add the underlying position slope to adjust it
-if not total_portfolio.empty:
-    if not underlying_portfolio.empty:
-        total_slopes = total_portfolio.iloc[:, - (len(strikes) + 1):].sum() + underlying_position
-    else:
-        total_slopes = total_portfolio.iloc[:, - (len(strikes) + 1):].sum()
-
-
-###! ------------------ Calculate Total Option P&Ls at each strike price ------------------ ###
-
-if not total_portfolio.empty:
-
-    #* Calculate Option P&Ls at each strike price 
-    option_p_l = pd.Series(index = strikes) #initiate empty Series to add P&Ls at each strike price later
-
-    for strike in strikes: #for every unique strike price
-        profit_loss = 0 #initiate P&L to add at each strike price
-
-        for j in range(len(total_portfolio)): #for each row
-
-            itm_amount = abs(total_portfolio["Strike"][j] - strike) #absolute amount by which the option is ITM for each strike price
-
-            if total_portfolio["Type"][j] == "Call": #for call options
-                if total_portfolio["Strike"][j] >= strike: #if the call is OTM
-                    profit_loss += total_portfolio["Cost"][j] * (-1 * total_portfolio["Position"][j]) # Only add the cost of the option depending on Buy / Sell
-                else: #if call is ITM
-                    profit_loss += (itm_amount - total_portfolio["Cost"][j]) * total_portfolio["Position"][j] # (ITM amount - cost) * number of options
-                
-            else: #for put options
-                if total_portfolio["Strike"][j] <= strike: #if put is OTM
-                    profit_loss += total_portfolio["Cost"][j] * (-1 * total_portfolio["Position"][j]) #only ad the cost of the option depending on Buy / Sell
-                else: #if put is ITM
-                    profit_loss += (itm_amount - total_portfolio["Cost"][j]) * total_portfolio["Position"][j] # (ITM amount - cost) * number of options
-        
-        #* add the total option P&L per strike price to the initialized Series
-        option_p_l.loc[strike] = profit_loss
-
-        ###! ------------------ Calculate Underlying Portfolio P&L at the Strike Prices ------------------ ###
-        if not underlying_portfolio.empty:
-            underlying_p_l = pd.Series(index = strikes) #initiate an empty Series that we will later add the P&L for each strike price
-        
-        #* map Buy / Sell to 1 / -1
-            numbered_action = underlying_portfolio["Action"].map({"Buy":1, "Sell":-1})
-
-        #* create new column based on total underlying position for each contract
-            underlying_portfolio["Position"] = underlying_portfolio["Quantity"] * numbered_action
-        
-        else:
-            underlying_p_l = pd.Series(0, index = strikes)
-
-        
-
-        #* create columns for each strike price in the underlying portfolio
-        #!!! WE ASSUME THAT THE STRIKE PRICE WILL BE THE UNDERLYING PRICE AT MATURITY !!!#
-        if not underlying_portfolio.empty:
-            for strike in strikes: 
-                col_name = f"{int(strike)}" #define column name to be added based on strike price
-                if col_name not in underlying_portfolio.columns: #check if a column for that strike price already exists to avoid errors
-                    underlying_portfolio.insert(len(underlying_portfolio.columns), col_name, np.nan) #at the end of the DataFrame add NaN columns for each strike price  
-                
-                for j in range(len(underlying_portfolio)): #for each row
-                    underlying_portfolio[col_name][j] = (strike - underlying_portfolio["Cost"][j]) * underlying_portfolio["Position"][j] 
-                    #P&L is the (strike price that we assume is underlying price at maturity - price that we bought the asset for) * 1 or -1 depending on Buy / Sell
-
-                # Calculate Total Underlying P&L per Strike Price
-                underlying_p_l.loc[strike] = underlying_portfolio[col_name].sum() #create an index value for each strike price and sum profits based on it
-
-###! ------------------ Calculate Total Portfolio P&L at each strike price ------------------ ###
-            total_p_l = option_p_l + underlying_p_l
-        else:
-            total_p_l = option_p_l
-
-
-
-
-###! ------------------ Break-even Points & Check for Option Position Type ------------------ ###
-
-if not total_portfolio.empty:
-
-    #how many times P&L will change sign
-    
-    #np.sign() will give +- 1 depending if the value is positive or negative
-    signs = np.sign(total_p_l)
-
-    #np.diff() will take the difference of i+1 - i each time. We have a sign change when the difference is different from 0 --> If the difference is 0 it means both P&Ls were the same sign 
-    sign_changes = np.diff(signs)
-    
-    p_l_sign_changes = np.count_nonzero(sign_changes)
-    p_l_sign_change_flag = False
-    if p_l_sign_changes > 0:
-        p_l_sign_change_flag = True
-
-
-    breakeven_points = [] #initiate empty list for BE points
-
-    ##! ------------------ Check for Options Position Types ------------------ ###
-
-    #* Volatility Spread Flags
-    option_position = ""
-
-    single_call_flag = False
-    single_put_flag = False
-    straddle_flag = False
-    strangle_flag = False
-    butterfly_flag = False
-    condor_flag = False
-    call_ratio_flag = False
-    put_ratio_flag = False
-    call_christmass_tree_flag = False
-    put_christmass_tree_flag = False
-
-    #* Flag to check if all strikes are equally spaced
-    equally_spaced_strikes_flag = False #Flag to check if all strike prices are equally spaced between them
-
-  
-    #* create pivot table to calculate call and put quantities per strike
-    pivot_table_quantities = total_portfolio.pivot_table(
-            index="Strike", columns="Type", values="Quantity", aggfunc="sum", fill_value=0
-            )
-
-
-    options_bought = 0
-    options_sold = 0
-
-    if "Call" in total_portfolio["Type"].values:
-        call_quantity_per_strike = pivot_table_quantities["Call"] #this returns a series with strike prices in the index and quantities as values per strike for calls
-        calls_bought = call_stats["assets_bought"]
-        calls_sold = call_stats["assets_sold"]
-        total_call_quantity = pivot_table_quantities["Call"].sum() #this returns a scalar with the total quantity of calls
-        options_bought += calls_bought
-        options_sold += calls_sold
-    
-    if "Put" in total_portfolio["Type"].values:
-        put_quantity_per_strike = pivot_table_quantities["Put"] #this returns a series with strike prices in the index and quantities as values per strike for puts
-        puts_bought = put_stats["assets_bought"]
-        puts_sold = put_stats["assets_sold"]
-        total_put_quantity = pivot_table_quantities["Put"].sum() #this returns a scalar with the total quantity of puts
-        options_bought += puts_bought
-        options_sold += puts_sold   
-
-
-    if len(strikes) > 1:
-        strike_differences = pivot_table_quantities.index.sort_values().diff()[1:]
-        equally_spaced_strikes_flag = (strike_differences == strike_differences[0]).all()
-
-    if underlying_portfolio.empty:
-        #* 1 strike price - Both Calls and Puts
-        if len(strikes) == 1: #If we have only 1 strike price 
-            if total_portfolio["Type"].nunique() == 2: # and both calls and puts in our total portfolio
-                #* Check for Straddle    
-                if total_call_quantity == total_put_quantity:
-                    straddle_flag = True
-                    option_position = "Straddle"
-        
-            elif total_portfolio["Type"].nunique() == 1: #If we only have 1 type of option (single option)
-                    #* Check for naked call
-                if total_portfolio["Type"].iloc[0] == "Call" and (options_bought == 0 or options_sold == 0): #we only have Call / Put in our "Type" column. So we only need to check the first element
-                    single_call_flag = True
-                    option_position = "Naked Call"
-                elif total_portfolio["Type"].iloc[0] == "Put" and (options_bought == 0 or options_sold == 0):
-                    #* check for naked put
-                    single_put_flag = True
-                    option_position = "Naked Put"
-
-        #* 2 Strikes 
-        if len(strikes) == 2: #If we have 2 strikes
-            if total_portfolio["Type"].nunique() == 2: #And both calls and puts in our total portfolio
-                #* Check for Strangle
-                if options_bought != options_sold and (options_bought == 0 or options_sold == 0):
-                    strangle_flag = True 
-                    option_position = "Strangle"
-
-            elif total_portfolio["Type"].nunique() == 1: #If we have only calls or only puts (ratio spreads)
-                if  options_bought != options_sold:
-                    if total_portfolio["Type"].iloc[0] == "Call":
-                        call_ratio_flag = True
-                        option_position = "Call Ratio"
-                    else:
-                        put_ratio_flag = True
-                        option_position = "Put Ratio"
-        
-        #* 3 Strikes - only Calls or only Puts - equally spaced strikes
-        if len(strikes) == 3 and (total_portfolio["Type"].nunique() == 1):
-            #* Check for Butterfly
-            if (options_bought == options_sold) and equally_spaced_strikes_flag:
-                butterfly_flag = True
-                option_position = "Butterfly"
-            
-            #*check for christmass tree
-            elif options_bought != options_sold and (options_sold / options_bought == 2 or options_sold / options_bought == 0.5): #we buy (sell) 1 at lower strike price and sell(buy) 2 at 2 higher strike prices
-                if total_portfolio["Type"].iloc[0] == "Call":
-                    call_christmass_tree_flag = True
-                    option_position = "Call Christmass Tree"    
-                else:  
-                    put_christmass_tree_flag = True
-                    option_position = "Put Christmass Tree"
-                
-        #* 4 Strikes - only Calls or Puts - equally spaced strikes
-        if len(strikes) == 4 and total_portfolio["Type"].nunique() == 1:
-            #* Check for Condor
-            if options_bought == options_sold and strike_differences[0] == strike_differences[-1]:
-                condor_flag = True
-
-
-###! ------------------ Calculate Breakeven Points (BE Points) ------------------ ###
-
-    #! Break Even points if we have a naked Call
-    if single_call_flag: #Breakeven for Call = Strike Price + Call Price
-        number_breakeven_points = 1
-        
-        if total_p_l.iloc[0] >= 0: #if we sold the call (negative slope)
-            point = strikes.iloc[0] - (abs(total_p_l.iloc[0]) / total_slopes.iloc[1]) # a Call is ITM if price is > strike price so we have a slope above strike price but we will have negative slope so we want subtract a negative number to make it positive
-        else: #if we bought the call (positive slope)
-            point = strikes.iloc[0] + (abs(total_p_l.iloc[0]) / total_slopes.iloc[1]) # a Call is ITM if price is > strike price so we have a slope above strike price
-        breakeven_points.append(point)
-
-    #! Break Even points if we have a naked Put
-    elif single_put_flag: #Breakeven for Put = Strike Price - Put Price
-        number_breakeven_points = 1
-        
-        if total_p_l.iloc[0] > 0: #if we sold the put (positive slope)
-            point = strikes.iloc[0] - (abs(total_p_l.iloc[0]) / total_slopes.iloc[0]) #Put has a slope if price is below strike price
-        else: #if we bought the put (negative slope)
-            point = strikes.iloc[0] + (abs(total_p_l.iloc[0]) / total_slopes.iloc[0]) #Put has a slope if price is below strike price
-        breakeven_points.append(point)
-
-    #! Break Even points if we have a Straddle
-    elif straddle_flag:
-        number_breakeven_points = 2
-        
-        for i in range(number_breakeven_points): #for each breakeven point
-            point = strikes.iloc[0] + (abs(total_p_l.iloc[0]) / total_slopes.iloc[i])
-            breakeven_points.append(point)
-
-    #! Break Even points if we have a Strangle
-    elif strangle_flag:
-        number_breakeven_points = 2
-
-        if total_p_l.iloc[0] >= 0:
-            point_1 = strikes.iloc[0] - (abs(total_p_l.iloc[0]) / total_slopes.iloc[0]) #we will have 3 slopes (Only the one in the middle will be 0)
-            point_2 = strikes.iloc[1] - (abs(total_p_l.iloc[0]) / total_slopes.iloc[2]) #we will have 3 slopes (Only the one in the middle will be 0)
-        else:
-            point_1 = strikes.iloc[0] + (abs(total_p_l.iloc[0]) / total_slopes.iloc[0]) #we will have 3 slopes (Only the one in the middle will be 0)
-            point_2 = strikes.iloc[1] + (abs(total_p_l.iloc[0]) / total_slopes.iloc[2]) #we will have 3 slopes (Only the one in the middle will be 0)
-        breakeven_points.append(point_1)
-        breakeven_points.append(point_2)
-
-    #! Break Even points if we have a Butterfly
-    elif butterfly_flag:
-        number_breakeven_points = 2
-
-        if p_l_sign_change_flag:
-            if total_p_l.iloc[1] >= 0: #if we sold the middle strike price --> We bought the wings sold the body --> Long Butterfly
-                point_1 = strikes.min() + abs(total_slopes.iloc[1] * total_p_l.iloc[0]) # we will have 4 total strike intervals and slopes only in the 2 middle (below min strike and above max strike we are 0 slope)
-                point_2 = strikes.max() - abs(total_slopes.iloc[2] * total_p_l.iloc[2]) 
-            else: #if we bought the middle strike price --> We sold the wings bought the body --> Short Butterfly
-                point_1 = strikes.min() + abs(total_slopes.iloc[1] * total_p_l.iloc[0]) # we will have 4 total strike intervals and slopes only in the 2 middle (below min strike and above max strike we are 0 slope)
-                point_2 = strikes.max() - abs(total_slopes.iloc[2] * total_p_l.iloc[2])
-            breakeven_points.append(point_1)
-            breakeven_points.append(point_2)
-
-    
-    #! Break Even points if we have a Condor
-    elif condor_flag:
-        number_breakeven_points = 2
-        if p_l_sign_change_flag:
-            if total_p_l.iloc[1] >= 0: #if we sold the middle strike price --> We bought the wings sold the body --> Long Condor
-                point_1 = strikes.min() + abs(total_slopes.iloc[1] * total_p_l.iloc[0]) # we will have 5 total strike intervals and slopes only in the 2nd and 4th position (below min strike, above max strike and between wing strikes are 0 slope)
-                point_2 = strikes.max() - abs(total_slopes.iloc[3] * total_p_l.iloc[-1])
-            else: #if we bought the middle strike price --> We sold the wings bought the body --> Short Butterfly
-                point_1 = strikes.min() + abs(total_slopes.iloc[1] * total_p_l.iloc[0]) # we will have 4 total strike intervals and slopes only in the 2 middle (below min strike and above max strike we are 0 slope)
-                point_2 = strikes.max() - abs(total_slopes.iloc[3] * total_p_l.iloc[-1])
-            breakeven_points.append(point_1)
-            breakeven_points.append(point_2)
-
-
-    #! Break Even points if we have a Call Ratio
-    elif call_ratio_flag:
-        number_breakeven_points = 2
-
-        if p_l_sign_change_flag:
-            point_1 = strikes.min() + abs(total_slopes.iloc[1] * total_p_l.iloc[0]) 
-            point_2 = strikes.max() + abs(total_p_l.iloc[1] / total_slopes.iloc[2])
-            breakeven_points.append(point_1)
-            breakeven_points.append(point_2)
-        else:
-            point_2 = strikes.max() + abs(total_p_l.iloc[1] / total_slopes.iloc[2])
-            breakeven_points.append(point_2)
-
-
-    #! Break Even points if we have a Put Ratio
-    elif put_ratio_flag:
-        number_breakeven_points = 2
-
-        if p_l_sign_change_flag:
-            point_1 = strikes.max() - abs(total_slopes.iloc[1] * total_p_l.iloc[1]) 
-            point_2 = strikes.min() - abs(total_p_l.iloc[0] / total_slopes.iloc[0])
-            breakeven_points.append(point_1)
-            breakeven_points.append(point_2)
-        else:
-            point_1 = strikes.max() - abs(total_slopes.iloc[1] * total_p_l.iloc[1])
-            point_2 = strikes.min() - abs(total_p_l.iloc[0] / total_slopes.iloc[0])
-            breakeven_points.append(point_1)
-            breakeven_points.append(point_2)
-
-    
-
-    #! Break Even points if we have a Call Christmass Tree
-    elif call_christmass_tree_flag:
-        number_breakeven_points = 2
-
-        if p_l_sign_change_flag:
-            if total_p_l.iloc[1] >= 0: #if we sold the higher strike price options
-                point_1 = strikes.min() + abs(total_p_l.iloc[0] * total_slopes.iloc[1])
-                point_2 = strikes.max() + abs(total_p_l.iloc[1] / total_slopes.iloc[-1])
-                breakeven_points.append(point_1)
-                breakeven_points.append(point_2)
-            else:
-                point_1 = strikes.min() + abs(total_p_l.iloc[0] * total_slopes.iloc[1])
-                point_2 = strikes.max() + abs(total_p_l.iloc[1] / total_slopes.iloc[-1])
-                breakeven_points.append(point_1)
-                breakeven_points.append(point_2)
-        else:
-            point_2 = strikes.max() + abs(total_p_l.iloc[1] / total_slopes.iloc[-1])
-            breakeven_points.append(point_2)
-
-    elif put_christmass_tree_flag:
-        number_breakeven_points = 2
-
-        if p_l_sign_change_flag:
-            if total_p_l.iloc[1] >= 0: #if we sold the higher strike price options
-                point_1 = strikes.max() - abs(total_p_l.iloc[-1] * total_slopes.iloc[2])
-                point_2 = strikes.min() - abs(total_p_l.iloc[0] / total_slopes.iloc[0])
-                breakeven_points.append(point_1)
-                breakeven_points.append(point_2)
-            else:
-                point_1 = strikes.max() - abs(total_p_l.iloc[-1] * total_slopes.iloc[2])
-                point_2 = strikes.min() - abs(total_p_l.iloc[0] / total_slopes.iloc[0])
-                breakeven_points.append(point_1)
-                breakeven_points.append(point_2)
-        else:
-            point_2 = strikes.min() - abs(total_p_l.iloc[0] / total_slopes.iloc[0])
-            breakeven_points.append(point_2)
-
-
-###! ------------------ Consolidate DataFrames to remove duplicate entries and use for Position Text Box ------------------ ###
-
-    options = total_portfolio.copy()
-
-    options_group_cols = ["Type", "Strike", "Cost"] #*assign the columns based on which we will group by
-    #as_index = False to return the dataframe with the columns it had instead of a Multiindex
-    options_grouped = options.groupby(options_group_cols, as_index=False)
-    # .agg() applies sum() in the position column
-    options_grouped = options_grouped.agg({"Position" : "sum"})
-    #remove any canceled out positions (net position 0) from opposite user inputs
-    options_grouped = options_grouped[options_grouped["Position"] != 0]
-
-    #* Do the same for the underlying portfolio
-    underlying_group_cols = ["Cost"]
-    if not underlying_portfolio.empty:
-        underlyings_grouped = underlying_portfolio.groupby(underlying_group_cols, as_index=False)
-        # .agg() applies sum() in the position column
-        underlyings_grouped = underlyings_grouped.agg({"Position" : "sum"})
-        #remove any canceled out positions (net position 0) from opposite user inputs
-        underlyings_grouped = underlyings_grouped[underlyings_grouped["Position"] != 0]
-
-    ###! ------------------ Create Text Box with the full Position to Plot on the top left of the Graph ------------------ ###
-    position_text_box = ""
- 
-    for index, row in options_grouped.iterrows(): #? iterrows returns a tuple (index, row). Index is the rows index value and row a Series with the columns and their values for that row
-        pos = row["Position"]
-        strike  = row["Strike"]
-        opt_type = row["Type"]
-        cost = row["Cost"]
-
-        if pos > 0:
-            position_text_box += f"+{pos} {strike:.1f} {opt_type} -{cost:.2f}  \n"
-        else:
-            position_text_box += f"{pos} {strike:.1f} {opt_type} {cost:.2f}  \n"
+else:
+    st.warning("⚠️ All option legs offset each other. Enter an Option to Continue")
 
 
 ###! ------------------ Create Portfolio Total Metrics ------------------ ### 
@@ -1045,6 +756,14 @@ if not underlying_portfolio.empty:
 
 if not total_portfolio.empty:
 
+    #* the 3 charts (the payoff graph drawn once for its display and download PNGs) render concurrently on the chart thread pool,
+    #* each widget below only waits for its own PNG
+    chart_renders = {
+        "pie": submit_render(asset_breakdown_png, sizes, labels, colors),
+        "contracts": submit_render(contracts_per_strike_png, pivot_table_quantities, strikes),
+        "payoff": submit_render(payoff_graph_pngs, strikes, total_p_l, total_slopes, breakeven_points, position_flags, position_text_box), #(display, download)
+    }
+
     with portfolio_col_2:
             
             portfolio_tabs = st.tabs(
@@ -1053,103 +772,136 @@ if not total_portfolio.empty:
 
             with portfolio_tabs[0]: #Asset Breakdown tab
             #* Create a pie chart with the number of asset types 
-                def autopct_format(pct, allvals): #? function to show both numbers and percentages
-                    absolute = int(round(pct/100.*sum(allvals)))
-                    return f"{pct:.1f}%\n({absolute})" 
-
-                fig, ax = plt.subplots(figsize=(15, 4))
-                ax.pie(
-                    sizes,
-                    labels=labels,
-                    autopct=lambda pct: autopct_format(pct, sizes),
-                    startangle=90,
-                    colors=colors,
-                    textprops={'fontweight': 'bold'}  #This makes both labels and autopct bold
-                )
-
-                plt.legend(loc="upper left")
-                ax.axis('equal') #makes the pie chart a circle
-                plt.tight_layout()
-                st.pyplot(fig)
+                with stage_timer.stage("Pie chart"):
+                    st.image(chart_renders["pie"].result(), width="stretch")
 
 
             with portfolio_tabs[1]: # number of options per strike tab
-            #* Create a pie chart with the number of asset types using the pivot table we calculated before
-                for col in ["Call", "Put"]:
-                    if col not in pivot_table_quantities: #ensure both columns exist otherwise set to 0
-                        pivot_table_quantities[col] = 0
-
-                fig, ax = plt.subplots(figsize=(15, 4))
-                index = strikes
-                x = range(len(strikes))
-
-                bar_width = 0.1
-                call_bars = ax.bar([i - bar_width/2 for i in x], pivot_table_quantities['Call'], width=bar_width, label='Calls', color='cornflowerblue')
-                put_bars = ax.bar([i + bar_width/2 for i in x], pivot_table_quantities['Put'], width=bar_width, label='Puts', color='lightcoral')
-
-
-                #* add quantities in bars
-                for bar in call_bars:
-                    height = bar.get_height()
-                    if height > 0:
-                        ax.text(bar.get_x() + bar.get_width()/2, height/2, int(height),
-                                ha='center', va='center', fontsize=10, fontweight='bold', color='black')
-
-                for bar in put_bars:
-                    height = bar.get_height()
-                    if height > 0:
-                        ax.text(bar.get_x() + bar.get_width()/2, height/2, int(height),
-                                ha='center', va='center', fontsize=10, fontweight='bold', color='black')
-
-                ax.set_xticks(x)
-                ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-                ax.set_xticklabels(strikes, fontweight='bold') #? rotation=45 if we want them to be side labels
-                ax.set_ylabel("Number of Contracts", fontweight='bold')
-                ax.set_xlabel("Strike Price", fontweight='bold')
-                ax.set_title("Contracts per Strike", fontweight='bold')
-                
-                ax.legend()
-                plt.tight_layout()
-                st.pyplot(fig)
+            #* Create a bar chart with the number of contracts per strike using the pivot table we calculated before
+                with stage_timer.stage("Contracts per strike chart"):
+                    st.image(chart_renders["contracts"].result(), width="stretch")
+
+
+###! ------------------ Greeks Risk Ladder ------------------ ###
+
+#* delta / gamma / vega / theta per strike bucket (and expiry) at a chosen spot and vol, scatter-added over the
+#* leg arrays (greeks_ladder.py); only this fragment reruns when its inputs change
+@st.fragment
+def greeks_ladder_panel(portfolio_result, default_spot):
+    ladder_col1, ladder_col2, ladder_col3, ladder_col4, ladder_col5 = st.columns(5, gap="small")
+    with ladder_col1:
+        ladder_spot = st.number_input("Spot", min_value=0.01, value=default_spot, key="ladder_spot")
+    with ladder_col2:
+        ladder_vol = st.number_input("Volatility (%)", min_value=1.0, max_value=300.0, value=25.0, step=1.0, key="ladder_vol")
+    with ladder_col3:
+        ladder_days = st.number_input("Trading days to expiration", min_value=0, max_value=1260, value=30, key="ladder_days")
+    with ladder_col4:
+        ladder_rate = st.number_input("Interest rate (%)", min_value=-5.0, max_value=25.0, value=0.0, step=0.25, key="ladder_rate")
+    with ladder_col5:
+        ladder_bucket = st.number_input("Strike bucket width", min_value=0.01, value=GREEKS_LADDER_BUCKET, step=1.0, key="ladder_bucket")
+
+    with stage_timer.stage("Greeks ladder"):
+        ladder = book_ladder(portfolio_result, ladder_spot, ladder_vol / 100, ladder_days, ladder_rate / 100, ladder_bucket)
+
+    #* every greek has its own color scale (scaled by its largest |exposure|), the cells show the exposures themselves
+    heatmap_data = ladder_heatmap_data(ladder)
+    heatmap_data["Row"] = heatmap_data["Bucket"]
+    if ladder["Expiry"].nunique() > 1: #1 row per (bucket, expiry) once legs have different expiries
+        heatmap_data["Row"] += heatmap_data["Expiry"].map(lambda days: f" | {days:g}d" if pd.notna(days) else "")
+    row_order = list(dict.fromkeys(heatmap_data["Row"]))
+    base = alt.Chart(heatmap_data).encode(x=alt.X("Greek", sort=list(GREEKS), title=None), y=alt.Y("Row", sort=row_order, title="Strike Bucket"))
+    cells = base.mark_rect().encode(color=alt.Color("Scaled", scale=alt.Scale(scheme="redblue", domain=[-1, 1]), legend=None),
+                                    tooltip=["Bucket", "Expiry", "Greek", alt.Tooltip("Exposure", format=".4f")])
+    labels = base.mark_text(fontSize=11).encode(text=alt.Text("Exposure", format=".3f"))
+    st.altair_chart((cells + labels).properties(height=max(24 * len(row_order), 120)), width="stretch")
+
+    totals = ladder[list(GREEKS)].sum()
+    total_cols = st.columns(len(GREEKS))
+    for total_col, greek in zip(total_cols, GREEKS):
+        total_col.metric(f"Total {greek}", f"{totals[greek]:.3f}")
+    st.caption("Delta in underlying units, gamma per 1 move of the spot, vega per 1 vol point, theta per trading day")
 
-st.markdown("""---""")
 
+if not total_portfolio.empty:
 
-###! ------------------ Plot Expiration Payoff Graph ------------------ ###
+    with st.expander("🪜 Greeks Risk Ladder", expanded=False):
+        greeks_ladder_panel(portfolio_result, float(strikes.median()))
 
-###! ------------------ X-axis Range (Simulate stock prices) ------------------ ###
-st.subheader(":blue[Expiration Payoff Graph]")
 
+###! ------------------ Tail-Hedge Optimizer ------------------ ###
+
+#* cheapest out-of-the-money chain legs that cap the unlimited tails (and the max loss) of the book, searched in batches
+#* within a time budget (tail_hedge.py)
 if not total_portfolio.empty:
 
-    #* Set x-axis range
-    if len(strikes) > 1:
-        distance = (strikes.max() - strikes.min()) * 3 #set distance equal to 2*range for the x-axis prices
-    else:
-        distance = strikes.iloc[0] / 1.5
-    number_of_ticks = 1000 #how many different intervals between the min and max of the x axis
-    
-    min_point = strikes.min() - distance
-    max_point = strikes.max() + distance
-    
-    stock_prices = np.linspace(min_point, max_point, number_of_ticks ) #Simulate stock prices x-axis
-    
-    if len(strikes) > 1:
-        segments = len(total_slopes) - 1  #how many different segments we have in the x-axis --> how many lines we have to calculate
-    else: 
-        segments = len(total_slopes)
+    tail_below, tail_above = float(total_slopes.iloc[0]), float(total_slopes.iloc[-1])
+    with st.expander("🧯 Tail-Hedge Optimizer", expanded=tail_below > 0 or tail_above < 0): #opened when a tail has unlimited loss
+        st.caption(f"Slope of the book below the lowest strike: {tail_below:+g} | above the highest strike: {tail_above:+g}")
+
+        tail_col1, tail_col2, tail_col3, tail_col4 = st.columns(4, gap="small")
+        with tail_col1:
+            tail_path = st.text_input("Path to a local option chain", value=st.session_state.get("scan_path", ""), key="tail_path",
+                                      help="CSV with a strike column and call / put prices (or call_bid, call_ask, put_bid, put_ask)")
+        with tail_col2:
+            tail_max_loss = st.number_input("Max loss after the hedge (€)", min_value=0.0, value=round(0.1 * float(strikes.median()), 2), key="tail_max_loss")
+            tail_max_slope = st.number_input("Max losing tail slope", min_value=0.0, value=0.0, step=1.0, key="tail_max_slope",
+                                             help="0 = no unlimited loss on either side")
+        with tail_col3:
+            tail_max_legs = st.number_input("Max hedge legs", min_value=1, max_value=4, value=TAIL_HEDGE_MAX_LEGS, key="tail_max_legs")
+            tail_max_quantity = st.number_input("Max quantity per leg", min_value=1, max_value=10, value=TAIL_HEDGE_MAX_QUANTITY, key="tail_max_quantity")
+        with tail_col4:
+            tail_budget = st.number_input("Time budget (s)", min_value=0.1, max_value=60.0, value=TAIL_HEDGE_BUDGET_SECONDS, step=0.5, key="tail_budget")
+
+        if st.button(":blue[Find Hedges]", key="tail_run"):
+            if not os.path.isfile(tail_path):
+                st.warning("⚠️ Please enter the path of an existing option chain file")
+            else:
+                try:
+                    with stage_timer.stage("Tail-hedge search"):
+                        tail_chain = load_chain(tail_path)
+                        st.session_state["tail_chain"] = tail_chain
+                        st.session_state["tail_results"] = optimize_tail_hedge(
+                            result_piecewise(portfolio_result), tail_chain, max_tail_slope=tail_max_slope, max_loss=tail_max_loss,
+                            max_legs=int(tail_max_legs), max_quantity=int(tail_max_quantity), time_budget=tail_budget,
+                        )
+                except ValueError as exc:
+                    st.warning(f"⚠️ {exc}")
+
+        if st.session_state.get("tail_results") is not None:
+            tail_ranked, tail_stats = st.session_state["tail_results"]
+            st.caption(f"{tail_stats['Evaluated']:,} combinations scored, {tail_stats['Feasible']:,} within the limits in {tail_stats['Seconds']:.2f}s"
+                       f"{'' if tail_stats['Exhausted'] else ' (time budget reached: best found so far)'}")
+            if tail_ranked.empty:
+                st.warning("⚠️ No combination of chain legs meets the limits, try more legs, a larger quantity or a looser max loss")
+            else:
+                st.dataframe(candidates_display(tail_ranked), width="stretch")
+                tail_load_col1, tail_load_col2 = st.columns([1, 3], gap="small")
+                with tail_load_col1:
+                    tail_rank = st.number_input("Hedge to add", min_value=0, max_value=len(tail_ranked) - 1, value=0, key="tail_rank")
+                with tail_load_col2:
+                    st.write("")
+                    if st.button("Add hedge to the portfolio", key="tail_add"):
+                        tail_book = candidate_book(tail_ranked.iloc[int(tail_rank)], st.session_state["tail_chain"])
+                        st.session_state["call_inputs"] = st.session_state["call_inputs"] + tag_legs(tail_book["call_inputs"], selected_underlying)
+                        st.session_state["put_inputs"] = st.session_state["put_inputs"] + tag_legs(tail_book["put_inputs"], selected_underlying)
+                        st.session_state["book_operation"] = "Add tail hedge"
+                        st.session_state["tail_results"] = None #ranked for the previous book
+                        st.rerun()
+
+st.markdown("""---""")
+
 
-###! ------------------ Y-axis Range ------------------ ###
+###! ------------------ Plot Expiration Payoff Graph ------------------ ###
+
+st.subheader(":blue[Expiration Payoff Graph]")
 
-    #* set y-axis limits
-    if len(total_p_l) > 1:
-        max_y_lim = 1.2*(abs(total_p_l.max()) + abs(total_p_l.min())) #set maximum range on y so that the graph is symmetrical around y=0
-        min_y_lim = -1.2*(abs(total_p_l.max()) + abs(total_p_l.min())) #set minimum range on y so that the graph is symmetrical around y=0
-    else: #if we only have 1 number in our total P&L set different limits (e.g 1 Option or Straddle)
-        max_y_lim = abs(total_p_l.max()) * 3
-        min_y_lim = abs(total_p_l.max()) * -3
+if not total_portfolio.empty:
 
-###! ------------------ Y-axis Range and Profits per Segment ------------------ ###
+    #* how much the leg netting reduced the book before the payoff calculations
+    compression = portfolio_result["compression"]
+    if compression["raw_legs"] > compression["netted_legs"]:
+        locked_str = f" | Locked-in P&L from offsetting legs: €{compression['locked_p_l']:.2f}" if compression["locked_p_l"] != 0 else ""
+        st.caption(f"Netted {compression['raw_legs']} legs into {compression['netted_legs']} ({compression['ratio']:.1f}x compression){locked_str}")
 
     #? Graph Explanation
     with st.expander("ℹ️ Graph Description"): 
@@ -1167,126 +919,415 @@ if not total_portfolio.empty:
         """)
 
 
-    #* Plot
-    plt.figure(figsize = (20,6)) #set the size of the figure
+    #* Add download button
+    with stage_timer.stage("Payoff graph PNG (download)"):
+        payoff_download_png = chart_renders["payoff"].result()[1]
 
-    #* plot the line below minimum strike
-    x_axis_below = stock_prices[stock_prices <= strikes.min()]
-    line_below_min_strike = total_slopes.iloc[0] * (x_axis_below - strikes.min()) + total_p_l.iloc[0]
-    
-    plt.plot(x_axis_below, line_below_min_strike, label = f"Below {strikes.min()}, Slope:{total_slopes.iloc[0]}", c="black", linewidth=1.5)
-
-    #* Plot for each segment between strikes prices we calculate the line
-    be_point_intervals = []     
-    for i in range(len(strikes) - 1):  
-        condition = (stock_prices >= strikes.iloc[i]) & (stock_prices <= strikes.iloc[i+1])
-        x_range = stock_prices[condition]
-        line = total_slopes.iloc[i+1] * (stock_prices[condition] - strikes[i]) + total_p_l.iloc[i]
-        
-        plt.plot(x_range, line, label=f"{strikes.iloc[i]} - {strikes.iloc[i+1]}, Slope:{total_slopes.iloc[i+1]}", c="black", linewidth=1.5)
-
-    #*plot the line above max strike
-    x_axis_above = stock_prices[stock_prices >= strikes.max()]
-    line_above_max_strike = total_slopes.iloc[-1] * (x_axis_above - strikes.max()) + total_p_l.iloc[-1]
-    plt.plot(x_axis_above, line_above_max_strike, label = f"Above {strikes.max()}, Slope:{total_slopes.iloc[-1]}", c="black", linewidth=1.5)
-
-    plt.ylim(min_y_lim, max_y_lim) #set the range on y axis so that it is symmetrical around y=0
-
-    #*Place the x-axis in the middle of the graph 
-    ax = plt.gca() #get the axes of the plot 
-    ax.spines['bottom'].set_position(('data', 0)) #set the bottom spine (x-axis) to the point y=0
-    ax.spines["bottom"].set_linestyle("dashed") #make the x-axis dashed
-    ax.xaxis.set_ticks([]) #remove values from the x-axis
-    ax.spines["left"].set_linestyle("dashed") #make the y-axis dashed
-    ax.yaxis.set_ticks([0]) #show only the 0 as value in the y-axis
-    ax.spines["top"].set_visible(False) #hide the top border
-    ax.spines["right"].set_visible(False) #hide the right border
-    
-    #!plot the breakeven points
-    if single_call_flag:
-        ax.plot(breakeven_points[0], 0, marker = "o", color="black")
-        ax.annotate(f"BE Point: \n{round(breakeven_points[0],2)}", [breakeven_points[0],0], [breakeven_points[0], max_y_lim/8], weight='bold', fontsize=8, horizontalalignment="center", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3"))
-    elif single_put_flag:
-        ax.plot(breakeven_points[0], 0, marker = "o", color="black")
-        ax.annotate(f"BE Point: \n{round(breakeven_points[0],2)}", [breakeven_points[0],0], [breakeven_points[0], max_y_lim/8], weight='bold', fontsize=8, horizontalalignment="center", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3"))    
-    elif straddle_flag:
-        for i in range(len(breakeven_points)):
-            ax.plot(breakeven_points[i], 0, marker = "o", color="black")
-            ax.annotate(f"BE Point: \n{round(breakeven_points[i],2)}", [breakeven_points[i],0], [breakeven_points[i], max_y_lim/8], weight='bold', fontsize=8, horizontalalignment="center", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3"))
-    elif strangle_flag:
-        for i in range(len(breakeven_points)):
-            ax.plot(breakeven_points[i], 0, marker = "o", color="black")
-            ax.annotate(f"BE Point: \n{round(breakeven_points[i],2)}", [breakeven_points[i],0], [breakeven_points[i], max_y_lim/8], weight='bold', fontsize=8, horizontalalignment="center", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3"))
-    elif butterfly_flag:
-        for i in range(len(breakeven_points)):
-            ax.plot(breakeven_points[i], 0, marker = "o", color="black")
-            ax.annotate(f"BE Point: \n{round(breakeven_points[i],2)}", [breakeven_points[i],0], [breakeven_points[i], max_y_lim/8], weight='bold', fontsize=8, horizontalalignment="center", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3"))
-    elif condor_flag:
-        for i in range(len(breakeven_points)):
-            ax.plot(breakeven_points[i], 0, marker = "o", color="black")
-            ax.annotate(f"BE Point: \n{round(breakeven_points[i],2)}", [breakeven_points[i],0], [breakeven_points[i], max_y_lim/8], weight='bold', fontsize=8, horizontalalignment="center", color="black", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3"))
-    elif call_ratio_flag:
-        for i in range(len(breakeven_points)):
-            ax.plot(breakeven_points[i], 0, marker = "o", color="black")
-            ax.annotate(f"BE Point: \n{round(breakeven_points[i],2)}", [breakeven_points[i],0], [breakeven_points[i], max_y_lim/10], weight='bold', fontsize=8, horizontalalignment="center", color="black", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3"))
-    elif put_ratio_flag:
-        for i in range(len(breakeven_points)):
-            ax.plot(breakeven_points[i], 0, marker = "o", color="black")
-            ax.annotate(f"BE Point: \n{round(breakeven_points[i],2)}", [breakeven_points[i],0], [breakeven_points[i], max_y_lim/10], weight='bold', fontsize=8, horizontalalignment="center", color="black", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3"))
-    elif call_christmass_tree_flag:
-        for i in range(len(breakeven_points)):
-            ax.plot(breakeven_points[i], 0, marker = "o", color="black")
-            ax.annotate(f"BE Point: \n{round(breakeven_points[i],2)}", [breakeven_points[i],0], [breakeven_points[i], max_y_lim/10], weight='bold', fontsize=8, horizontalalignment="center", color="black", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3"))
-    elif put_christmass_tree_flag:
-        for i in range(len(breakeven_points)):
-            ax.plot(breakeven_points[i], 0, marker = "o", color="black")
-            ax.annotate(f"BE Point: \n{round(breakeven_points[i],2)}", [breakeven_points[i],0], [breakeven_points[i], max_y_lim/10], weight='bold', fontsize=8, horizontalalignment="center", color="black", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3"))
+    st.download_button(
+        label=":blue[Download Payoff Graph as PNG]",
+        data=payoff_download_png,
+        file_name="payoff_graph.png",
+        mime="image/png"
+    )   
 
+    with stage_timer.stage("Payoff graph"):
+        st.image(chart_renders["payoff"].result()[0], width="stretch")
 
+
+###! ------------------ What-If Comparison (Payoff Superposition) ------------------ ###
+
+#* named variants = the current book + adjustment legs; only the adjustment is evaluated, its curve is added to the
+#* cached curve of the current book (what_if.py)
+if not total_portfolio.empty:
+
+    with st.expander("🧪 What-If Comparison", expanded=False):
+        variants = st.session_state.setdefault("what_if_variants", {}) #name -> adjustment book (same layout as the session state books)
+
+        whatif_col1, whatif_col2, whatif_col3, whatif_col4 = st.columns(4, gap="small")
+        with whatif_col1:
+            whatif_name = st.text_input("Variant name", value=f"Adjustment {len(variants) + 1}", key="whatif_name")
+            whatif_type = st.selectbox("Asset", ["Call", "Put", "Underlying Contract"], key="whatif_type")
+        with whatif_col2:
+            whatif_number = st.number_input("Quantity", min_value=1, max_value=10000, value=1, step=1, key="whatif_number")
+            whatif_action = st.radio("Action", ["Buy", "Sell"], horizontal=True, key="whatif_action")
+        with whatif_col3:
+            whatif_strike = st.number_input("Strike Price", min_value=0.0, value=float(strikes.median()), step=1.0, format="%.2f", key="whatif_strike",
+                                            disabled=whatif_type == "Underlying Contract")
+        with whatif_col4:
+            whatif_price = st.number_input("Price (€)", min_value=0.0, value=1.0, step=0.1, format="%.2f", key="whatif_price")
+
+        if st.button(":green[Add Leg to Variant]", key="whatif_add"):
+            if not whatif_name.strip():
+                st.warning("⚠️ Please name the variant")
+            elif whatif_price == 0 or (whatif_type != "Underlying Contract" and whatif_strike == 0):
+                st.warning("⚠️ Please enter a positive strike and price to continue")
+            else:
+                session_key = {"Call": "call_inputs", "Put": "put_inputs", "Underlying Contract": "underlying_inputs"}[whatif_type]
+                adjustment = variants.setdefault(whatif_name.strip(), {"call_inputs": [], "put_inputs": [], "underlying_inputs": []})
+                strike = 0.0 if whatif_type == "Underlying Contract" else whatif_strike
+                adjustment[session_key].append([whatif_type, strike, whatif_number, whatif_action, whatif_price])
+
+        if variants:
+            with stage_timer.stage("What-if comparison"):
+                whatif_curves, whatif_table = compare_variants(portfolio_result, variants)
+            st.dataframe(whatif_table.round(2), width="stretch")
+            st.line_chart(curves_frame(whatif_curves, payoff_x_axis(strikes)), x_label="Stock Price at Expiration", y_label="P&L (€)", height=320)
+
+            manage_col1, manage_col2, manage_col3 = st.columns([2, 1, 1], gap="small")
+            with manage_col1:
+                whatif_selected = st.selectbox("Variant", list(variants), key="whatif_selected")
+            with manage_col2:
+                apply_variant = st.button(":blue[Apply to Book]", key="whatif_apply", help="Adds the adjustment legs to the inputs above (undoable)")
+            with manage_col3:
+                remove_variant = st.button(":red[Remove Variant]", key="whatif_remove")
+
+            if apply_variant:
+                for session_key, rows in variants.pop(whatif_selected).items():
+                    st.session_state[session_key] = st.session_state.get(session_key, []) + tag_legs(rows, selected_underlying)
+                st.session_state["book_operation"] = f"Apply {whatif_selected}"
+                st.rerun()
+            if remove_variant:
+                variants.pop(whatif_selected)
+                st.rerun()
+        else:
+            st.caption("Add legs to a named variant to compare it with the current book")
+
+
+###! ------------------ Pre-Expiry Value of American Legs ------------------ ###
+
+#* Only this fragment reruns when its inputs change: the lattice prices every (spot, leg) pair at once (american_pricer.py)
+@st.fragment
+def american_curve_panel(portfolio_result, stock_prices_range):
+    if not st.toggle("Show the pre-expiry curve with American legs", key="american_show"):
+        return
+
+    american_col1, american_col2, american_col3, american_col4 = st.columns(4, gap="small")
+    with american_col1:
+        american_days = st.number_input("Trading days to expiration", min_value=0, max_value=1260, value=30, key="american_days")
+    with american_col2:
+        american_vol = st.number_input("Volatility (%)", min_value=1.0, max_value=300.0, value=25.0, step=1.0, key="american_vol")
+    with american_col3:
+        american_rate = st.number_input("Interest rate (%)", min_value=-5.0, max_value=25.0, value=4.0, step=0.25, key="american_rate")
+    with american_col4:
+        american_dividend = st.number_input("Dividend yield (%)", min_value=0.0, max_value=25.0, value=0.0, step=0.25, key="american_dividend")
+
+    #* optional skew: every leg gets the vol of its (strike, expiry) from a local surface file (fitted once per file content)
+    surface_path = st.text_input("Path to a local vol surface (optional)", key="american_surface",
+                                 help="CSV with strike or moneyness, days or years and iv columns. Without it the flat volatility above is used")
+    surface = None
+    if surface_path:
+        if not os.path.isfile(surface_path):
+            st.warning("⚠️ Please enter the path of an existing vol surface file")
+        else:
+            try:
+                with stage_timer.stage("Vol surface"):
+                    surface = load_surface(surface_path)
+            except (SurfaceError, ValueError) as exc:
+                st.warning(f"⚠️ {exc}")
+
+    with stage_timer.stage("American lattice"):
+        curve = american_book_curve(portfolio_result, stock_prices_range, american_days, american_vol / 100,
+                                    american_rate / 100, american_dividend / 100, surface=surface)
+
+    st.line_chart(curve, x="Stock Price", y=["Pre-Expiry P&L", "Expiration P&L"], height=280)
+    st.line_chart(curve, x="Stock Price", y="Delta", height=160)
+    if curve["Converged"].iloc[0]:
+        st.caption(f"{len(curve)} spots, {curve['Lattice Steps'].iloc[0]} lattice steps (converged within €{LATTICE_TOLERANCE:.3f} per leg)")
     else:
-        if p_l_sign_changes > 0:
-            for i in range(len(breakeven_points)):
-                ax.plot(breakeven_points[i], 0, marker = "o", color="black")
-                ax.annotate(f"BE Point at: \n{round(breakeven_points[i],2)}", [breakeven_points[i],0], [breakeven_points[i], 3], arrowprops = dict(width=0.03, color="black", shrink=0.1), weight='bold', fontsize=8)
-
-    #* Plot P&L at Strike Prices
-    for i in range(len(strikes)):
-        if total_p_l.iloc[i] < 0: #negative P&L
-            plt.text(strikes.iloc[i], total_p_l.iloc[i] + max_y_lim/10, f"{round(total_p_l.iloc[i],2)}€", weight="bold", horizontalalignment = "center", color="firebrick", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3")) # if P&L is negative, give a red color 
-        elif total_p_l.iloc[i] > 0: #positive P&L
-            plt.text(strikes.iloc[i], total_p_l.iloc[i] + max_y_lim/10, f"{round(total_p_l.iloc[i],2)}€", weight="bold", horizontalalignment = "center", color="green", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3")) #if P&L is positive, give a green color
-        else: #0 P&L
-            plt.text(strikes.iloc[i], total_p_l.iloc[i], f"{round(total_p_l.iloc[i],2)}€", weight="bold", horizontalalignment = "center", color="dimgray", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3")) #if P&L is positive, give a green color
-
-    #* Plot the option position text in the top left of the graph
-    plt.text(stock_prices.min(), max_y_lim, position_text_box, horizontalalignment="left", verticalalignment="top", fontsize=12)
-
-    #* add graph title and axis titles
-    if option_position != "":
-        plt.title(f"Option Position Parity Graph ({option_position})", c="black", weight="bold")
-    else:
-        plt.title("Option Position Parity Graph", c="black", weight="bold")
-    plt.xlabel("Stock Price", loc = "right", c="black", weight="bold")
-    plt.ylabel("Payoff at Expiration", c="black", weight="bold")
+        st.warning(f"⚠️ The lattice stopped at {curve['Lattice Steps'].iloc[0]} steps before 2 estimates agreed within €{LATTICE_TOLERANCE:.3f} per leg: "
+                   "the pre-expiry values below are approximate")
 
-    #* plot dashed vertical lines at the strike prices and the strike prices at the bottom of the graph
-    for i in strikes:
-        plt.axvline(i, min_y_lim, max_y_lim, ls="dashed", color="gray", linewidth = 0.7)
-        plt.text(i, min_y_lim, i, horizontalalignment = "center", weight="bold")
 
-    #* Save the figure to a buffer
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png")
-    buf.seek(0)
+if not total_portfolio.empty:
 
-    #* Add download button
-    st.download_button(
-        label=":blue[Download Payoff Graph as PNG]",
-        data=buf,
-        file_name="payoff_graph.png",
-        mime="image/png"
-    )   
+    with st.expander("⏳ Pre-Expiry Value (American Legs)", expanded=False):
+        american_curve_panel(portfolio_result, np.linspace(*payoff_x_axis(strikes)[[0, -1]], AMERICAN_CURVE_POINTS))
+
+
+###! ------------------ Live Spot P&L (Streaming Mode) ------------------ ###
+
+#* Only this fragment reruns on every refresh: it drains the new ticks from the background feed and
+#* evaluates them on the cached piecewise linear payoff (binary search per tick), the rest of the page stays as it is
+#* It only polls while a feed thread is alive (run_every is chosen at every full rerun)
+def live_spot_panel(payoff_evaluator, payoff_vertices, polling):
+    feed = st.session_state.get("live_feed")
+    if feed is None:
+        st.caption("Start a feed to follow the mark P&L of the portfolio")
+        return
+
+    history = st.session_state.setdefault("live_history", collections.deque(maxlen=LIVE_HISTORY_TICKS))
+    feed_running = feed.running #before draining, so the last ticks of a feed that just ended are not lost
+    timestamps, prices = feed.drain()
+    history.extend(zip(timestamps, prices))
+    if polling and not feed_running:
+        st.rerun() #the feed ended: 1 full rerun turns the polling off and shows why it ended
+
+    if feed.error is not None:
+        st.warning(f"⚠️ The price feed stopped: {feed.error}")
+    elif not feed_running:
+        st.caption("The price feed ended")
+    if not history:
+        st.caption("Waiting for the first tick...")
+        return
+
+    #* the whole window is re-marked with the current portfolio, so changing the book never leaves stale P&Ls
+    window = np.asarray(history, dtype=float)
+    mark_p_l = payoff_evaluator.evaluate(window[:, 1])
+    spot, p_l = window[-1, 1], mark_p_l[-1]
+
+    metric_col1, metric_col2, metric_col3 = st.columns(3)
+    metric_col1.metric("Spot", f"{spot:.2f}")
+    metric_col2.metric("Mark P&L at Expiration", f"€{p_l:.2f}", delta=f"{p_l - mark_p_l[0]:.2f}")
+    metric_col3.metric("Ticks Received", f"{feed.received:,}")
+
+    #* the payoff curve is only its vertices (piecewise linear), the spot is a single marker on top of it
+    curve = alt.Chart(payoff_vertices).mark_line(color="black").encode(x=alt.X("Stock Price", scale=alt.Scale(zero=False)), y="P&L")
+    marker = alt.Chart(pd.DataFrame({"Stock Price": [spot], "P&L": [p_l]})).mark_point(color="firebrick", size=120, filled=True).encode(x="Stock Price", y="P&L")
+    st.altair_chart(curve + marker, width="stretch")
+
+    st.line_chart(pd.DataFrame({"Mark P&L": mark_p_l}), height=180)
+
+
+if not total_portfolio.empty:
+
+    with st.expander("📡 Live Spot P&L", expanded=False):
+        live_source = st.radio("Price source", ["File replay", "Local socket"], horizontal=True, key="live_source")
+
+        live_col1, live_col2 = st.columns(2, gap="small")
+        if live_source == "File replay":
+            with live_col1:
+                live_path = st.text_input("Path to a local price file", key="live_path", help="CSV with a price / close column, or one price per line")
+            with live_col2:
+                live_rate = st.number_input("Ticks per second", min_value=1.0, max_value=5000.0, value=200.0, step=50.0, key="live_rate")
+        else:
+            with live_col1:
+                live_host = st.text_input("Host", value="127.0.0.1", key="live_host")
+            with live_col2:
+                live_port = st.number_input("Port", min_value=1, max_value=65535, value=9009, key="live_port")
+
+        start_col, stop_col = st.columns(2, gap="small")
+        with start_col:
+            start_feed = st.button(":green[Start Feed]", key="live_start")
+        with stop_col:
+            stop_feed = st.button(":red[Stop Feed]", key="live_stop")
+
+        if (start_feed or stop_feed) and st.session_state.get("live_feed") is not None:
+            st.session_state.pop("live_feed").stop()
+            st.session_state.pop("live_history", None)
+
+        if start_feed:
+            if live_source == "File replay" and not os.path.isfile(live_path):
+                st.warning("⚠️ Please enter the path of an existing price file")
+            elif live_source == "File replay":
+                st.session_state["live_feed"] = LiveSpotFeed(replay_ticks(live_path, ticks_per_second=live_rate)).start()
+            else:
+                st.session_state["live_feed"] = LiveSpotFeed(socket_ticks(live_host, int(live_port))).start()
+
+        live_evaluator = portfolio_result["payoff_evaluator"]
+        stock_prices_range = payoff_x_axis(strikes) #same x-axis range as the payoff graph
+        vertex_prices = np.concatenate([[stock_prices_range[0]], strikes.to_numpy(dtype=float), [stock_prices_range[-1]]])
+        live_vertices = pd.DataFrame({"Stock Price": vertex_prices, "P&L": live_evaluator.evaluate(vertex_prices)})
+
+        live_polling = st.session_state.get("live_feed") is not None and st.session_state["live_feed"].running
+        st.fragment(live_spot_panel, run_every=LIVE_REFRESH_SECONDS if live_polling else None)(live_evaluator, live_vertices, live_polling)
+
+
+###! ------------------ Historical Backtest ------------------ ###
+
+#* the book is kept relative to the spot it was priced at and opened on every date of a local price series
+if not total_portfolio.empty:
+
+    with st.expander("📈 Historical Backtest", expanded=False):
+        backtest_col1, backtest_col2, backtest_col3 = st.columns(3, gap="small")
+        with backtest_col1:
+            backtest_path = st.text_input("Path to a local price series", key="backtest_path", help="CSV with a date column and a close / price column (OHLC files work as well)")
+        with backtest_col2:
+            backtest_spot = st.number_input("Spot when the book was priced", min_value=0.01, value=float(strikes.median()), key="backtest_spot",
+                                            help="Strikes and premiums are scaled by (spot at entry / this spot) on every entry date")
+        with backtest_col3:
+            backtest_horizon = st.number_input("Rows (trading days) to expiration", min_value=1, max_value=2520, value=21, key="backtest_horizon",
+                                               help="Rows of the price file from entry to expiration: 21 rows of daily closes are about 1 month")
+
+        if st.button(":blue[Run Backtest]", key="backtest_run"):
+            if not os.path.isfile(backtest_path):
+                st.warning("⚠️ Please enter the path of an existing price file")
+            else:
+                try:
+                    with stage_timer.stage("Backtest"):
+                        backtest_outcomes = backtest(read_price_series(backtest_path),
+                                                     {"Book": relative_payoff(portfolio_result["payoff_evaluator"], backtest_spot)},
+                                                     horizon=int(backtest_horizon))
+                    st.session_state["backtest_outcomes"] = backtest_outcomes
+                except ValueError as exc:
+                    st.warning(f"⚠️ {exc}")
+
+        if st.session_state.get("backtest_outcomes") is not None:
+            backtest_outcomes = st.session_state["backtest_outcomes"]
+            st.dataframe(outcome_summary(backtest_outcomes).round(2), width="stretch")
+
+            #* distribution of the expiration P&L over all entry dates
+            counts, edges = np.histogram(backtest_outcomes["Book"], bins=40)
+            st.bar_chart(pd.DataFrame({"Entries": counts}, index=np.round((edges[:-1] + edges[1:]) / 2, 2)), x_label="P&L at Expiration", height=220)
+            st.line_chart(backtest_outcomes.rename(columns={"Book": "P&L at Expiration by Entry Date"}), height=220)
+
+
+###! ------------------ Delta Hedging Simulator ------------------ ###
+
+#* what hedging the book's delta with the underlying would cost: simulated paths, rebalanced to the Black-Scholes delta
+if not total_portfolio.empty:
+
+    with st.expander("🛡️ Delta Hedging Simulator", expanded=False):
+        hedge_col1, hedge_col2, hedge_col3 = st.columns(3, gap="small")
+        with hedge_col1:
+            hedge_spot = st.number_input("Spot", min_value=0.01, value=float(strikes.median()), key="hedge_spot")
+            hedge_vol = st.number_input("Volatility (%)", min_value=1.0, max_value=300.0, value=20.0, step=1.0, key="hedge_vol",
+                                        help="Annualized, used for both the simulated paths and the deltas")
+        with hedge_col2:
+            hedge_days = st.number_input("Trading days to expiration", min_value=1, max_value=1260, value=21, key="hedge_days")
+            hedge_rebalance = st.number_input("Rebalance every (days)", min_value=1, max_value=252, value=1, key="hedge_rebalance")
+        with hedge_col3:
+            hedge_cost = st.number_input("Transaction cost (bps)", min_value=0.0, max_value=500.0, value=5.0, step=1.0, key="hedge_cost")
+            hedge_paths = st.number_input("Paths", min_value=1_000, max_value=200_000, value=20_000, step=1_000, key="hedge_paths")
+
+        if st.button(":blue[Run Simulation]", key="hedge_run"):
+            with stage_timer.stage("Hedging simulation"):
+                st.session_state["hedge_paths_result"] = simulate_hedge(
+                    portfolio_result, hedge_spot, hedge_vol / 100, int(hedge_days),
+                    rebalance_every=int(hedge_rebalance), cost_bps=hedge_cost, n_paths=int(hedge_paths),
+                )
+
+        if st.session_state.get("hedge_paths_result") is not None:
+            hedge_paths_result = st.session_state["hedge_paths_result"]
+            hedge_table, hedge_costs = hedge_summary(hedge_paths_result)
+            st.dataframe(hedge_table.round(2), width="stretch")
+
+            metric_col1, metric_col2, metric_col3 = st.columns(3)
+            metric_col1.metric("Mean Hedge Turnover", f"{hedge_costs['Mean Turnover']:.1f} units")
+            metric_col2.metric("Mean Transaction Costs", f"€{hedge_costs['Mean Transaction Costs']:.2f}")
+            metric_col3.metric("P95 Transaction Costs", f"€{hedge_costs['P95 Transaction Costs']:.2f}")
+
+            #* hedged vs unhedged P&L on the same bins
+            edges = np.histogram_bin_edges(hedge_paths_result[["Hedged P&L", "Unhedged P&L"]].to_numpy(), bins=50)
+            st.bar_chart(pd.DataFrame({name: np.histogram(hedge_paths_result[name], bins=edges)[0] for name in ("Hedged P&L", "Unhedged P&L")},
+                                      index=np.round((edges[:-1] + edges[1:]) / 2, 2)),
+                         x_label="P&L at Expiration", y_label="Paths", stack=False, height=240)
+
+
+###! ------------------ Export the Payoff Data ------------------ ###
+
+#* the numbers behind the graph (+ the scenario tables of this session) for downstream risk systems (payoff_export.py)
+#* files are only encoded when a download button is clicked, from the tables cached with the pipeline result
+if not total_portfolio.empty:
+
+    with st.expander("💾 Export Payoff Data", expanded=False):
+        #* export state lives in the session, keyed by the object each table comes from (not in the cached pipeline result)
+        export_groups = st.session_state.setdefault("export_groups", {})
+        export_sources = {"payoff": export_group(export_groups, "payoff", portfolio_result, payoff_tables)}
+        for scenario_name, scenario_key in (("hedge paths", "hedge_paths_result"), ("backtest outcomes", "backtest_outcomes")):
+            if st.session_state.get(scenario_key) is not None:
+                export_sources[scenario_name] = export_group(export_groups, scenario_name, st.session_state[scenario_key],
+                                                             lambda scenario, name=scenario_name: {name: scenario.reset_index()})
+            else:
+                export_groups.pop(scenario_name, None)
+        export_tables = {name: (entry, table) for entry in export_sources.values() for name, table in entry["tables"].items()}
+
+        export_col1, export_col2, export_col3 = st.columns([2, 1, 1], gap="small")
+        with export_col1:
+            export_name = st.selectbox("Table", list(export_tables), key="export_table",
+                                       format_func=lambda name: f"{name.title()} ({len(export_tables[name][1]):,} rows)")
+        with export_col2:
+            export_format = st.selectbox("Format", export_formats(), key="export_format",
+                                         help=None if len(export_formats()) > 1 else "Parquet / Arrow exports need pyarrow")
+        with export_col3:
+            st.download_button(
+                label=f":blue[Download {export_format}]",
+                data=functools.partial(cached_export, export_tables[export_name][0], export_name, export_format),
+                file_name=export_file_name(export_name, export_format),
+                mime=EXPORT_MIMES[export_format],
+                key="export_download",
+                on_click="ignore",
+            )
+
+        st.dataframe(export_tables[export_name][1].head(20), width="stretch", hide_index=True)
+
+
+###! ------------------ Option-Chain Strategy Scanner ------------------ ###
+
+#* every instance of a spread template across a local chain snapshot is scored at once (strategy_scanner.py),
+#* the best candidate can then be loaded into the Call / Put inputs above
+with st.expander("🔎 Strategy Scanner", expanded=False):
+    scan_col1, scan_col2, scan_col3, scan_col4 = st.columns(4, gap="small")
+    with scan_col1:
+        scan_path = st.text_input("Path to a local option chain", key="scan_path", help="CSV with a strike column and call / put prices (or call_bid, call_ask, put_bid, put_ask), or a chain archive directory built with chain_store.py")
+
+        #* chain archives are memory-mapped: opening one and listing its expiries does not read the quotes
+        scan_store = None
+        if os.path.isfile(os.path.join(scan_path, META_FILE)):
+            try:
+                scan_store = ChainStore(scan_path)
+            except (OSError, ValueError, KeyError, ImportError) as exc: #partial or corrupt archive
+                st.warning(f"⚠️ Could not open the chain archive: {exc}")
+        if scan_store is not None:
+            scan_quote_date = st.selectbox("Quote date", [str(day) for day in scan_store.quote_dates()[::-1]], key="scan_quote_date")
+            scan_expiry = st.selectbox("Expiry", [str(day) for day in scan_store.expiries(scan_quote_date)], key="scan_expiry")
+    with scan_col2:
+        scan_template = st.selectbox("Strategy", list(SCAN_TEMPLATES), key="scan_template")
+    with scan_col3:
+        scan_direction = st.radio("Direction", ["Long", "Short"], horizontal=True, key="scan_direction")
+        scan_span = st.number_input("Max strikes between legs", min_value=1, max_value=50, value=10, key="scan_span")
+    with scan_col4:
+        scan_rank = st.selectbox("Rank by", ["Reward/Risk", "Max Profit", "Max Loss", "Cost"], key="scan_rank")
+
+    if st.button(":blue[Scan Chain]", key="scan_run"):
+        if scan_store is None and not os.path.isfile(scan_path):
+            st.warning("⚠️ Please enter the path of an existing option chain file or archive")
+        elif scan_store is not None and scan_expiry is None:
+            st.warning("⚠️ The archive has no chains for this quote date")
+        else:
+            try:
+                with stage_timer.stage("Strategy scan"):
+                    scan_chain_df = load_chain(scan_path) if scan_store is None else scan_store.chain_frame(scan_expiry, quote_date=scan_quote_date)
+                    st.session_state["scan_chain"] = scan_chain_df
+                    st.session_state["scan_results"] = scan_chain(scan_chain_df, scan_template, direction=scan_direction,
+                                                                  max_span=int(scan_span), rank_by=scan_rank)
+            except ValueError as exc:
+                st.warning(f"⚠️ {exc}")
+
+    if st.session_state.get("scan_results") is not None:
+        scan_results = st.session_state["scan_results"]
+        st.caption(f"{len(scan_results):,} candidates scored, best {min(len(scan_results), SCAN_TOP_CANDIDATES)} shown")
+        st.dataframe(candidates_display(scan_results.head(SCAN_TOP_CANDIDATES)), width="stretch")
+
+        if not scan_results.empty:
+            load_col1, load_col2 = st.columns([1, 3], gap="small")
+            with load_col1:
+                scan_rank_to_load = st.number_input("Candidate to load", min_value=0, max_value=min(len(scan_results), SCAN_TOP_CANDIDATES) - 1, value=0, key="scan_load_rank")
+            with load_col2:
+                st.write("")
+                if st.button("Load candidate into the portfolio", key="scan_load", help="Replaces the Call and Put inputs of the selected underlying, the Underlying inputs are kept"):
+                    scanned_book = candidate_book(scan_results.iloc[int(scan_rank_to_load)], st.session_state["scan_chain"])
+                    for session_key in ("call_inputs", "put_inputs"): #the legs of the other underlyings are kept
+                        st.session_state[session_key] = ([row for row in st.session_state[session_key] if leg_underlying(row) != selected_underlying]
+                                                         + tag_legs(scanned_book[session_key], selected_underlying))
+                    st.session_state["book_operation"] = "Load scanner candidate"
+                    st.rerun()
+
+
+###! ------------------ Performance Panel ------------------ ###
+
+if perf_enabled:
+    if st.session_state.get("active_profiler") is not None:
+        st.session_state["profile_report"] = stop_profiler(st.session_state.pop("active_profiler"))
+
+    with st.expander("⏱️ Performance", expanded=False):
+        st.markdown(f"Rerun time: **{1000 * stage_timer.elapsed():.1f} ms**")
+        st.dataframe(stage_timer.as_frame(), hide_index=True)
+
+        if st.button("Profile the next rerun", help="Capture a cProfile (or pyinstrument, if installed) report of one full rerun"):
+            st.session_state["profile_next_rerun"] = True
+            st.rerun()
+
+        if "profile_report" in st.session_state:
+            st.code(st.session_state["profile_report"], language="text")
 
-    plt.legend(loc="upper right")
-    plt.tight_layout()
-    st.pyplot(plt)
+    stage_timer.log()
@@ -0,0 +1,182 @@
+### ------------------ Binomial Lattice Pricer for American Legs ------------------ ###
+#* Pre-expiry value and delta of every option leg of a book as an American option (Cox-Ross-Rubinstein lattice).
+#* All (spot, leg) pairs are priced at once: every time step is 1 (rows x nodes) array updated in place
+#* (backward induction into preallocated buffers, no allocation inside the loop).
+#* Convergence: the last step uses the Black-Scholes value instead of the lattice (BBS), and 2 lattices of N / 2 and N
+#* steps are extrapolated (Richardson, 2 · V(N) - V(N/2)); N doubles until 2 successive estimates agree within `tolerance`
+#* or N reaches LATTICE_MAX_STEPS (then the result says it did not converge).
+#* Run from the repository root: python american_pricer.py --spots 300 --days 60 --vol 0.3 --dividend 0.03
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from pricing import TRADING_DAYS, normal_cdf
+
+
+LATTICE_START_STEPS = 32
+LATTICE_MAX_STEPS = 1024
+LATTICE_TOLERANCE = 5e-3 #price units, per leg (half a cent: ~128 steps, the error is O(1/N) near the exercise boundary)
+MIN_SPOT = 1e-6 #the lattice needs a positive spot (payoff x-axes can start below 0)
+
+
+###! ------------------ European Value (last lattice step) ------------------ ###
+
+def black_scholes(spots, strikes, omega, time_left, vol, rate, dividend):
+    #* omega = 1 for calls, -1 for puts
+    sqrt_time = vol * np.sqrt(time_left)
+    d1 = (np.log(spots / strikes) + (rate - dividend + 0.5 * vol ** 2) * time_left) / sqrt_time
+    d2 = d1 - sqrt_time
+    return omega * (spots * np.exp(-dividend * time_left) * normal_cdf(omega * d1) - strikes * np.exp(-rate * time_left) * normal_cdf(omega * d2))
+
+
+###! ------------------ 1 Lattice: all (spot, leg) rows at once ------------------ ###
+
+def lattice(spots, strikes, omega, time_to_expiry, vol, rate, dividend, steps):
+    #* spots, strikes, omega, vol: (rows,) -> value and delta at time 0 of every row (every row has its own up factor)
+    dt = time_to_expiry / steps
+    vol = np.broadcast_to(np.asarray(vol, dtype=float), spots.shape)[:, None]
+    up = np.exp(vol * np.sqrt(dt))
+    p_up = (np.exp((rate - dividend) * dt) - 1 / up) / (up - 1 / up)
+    discount = np.exp(-rate * dt)
+
+    #* node j of step n is spot · up^(2j - n): powers[:, steps + 2j - n] for j = 0..n
+    powers = up ** np.arange(-steps, steps + 1)
+    rows = len(spots)
+    node_spots = np.empty((rows, steps))
+    values = np.empty((rows, steps))
+    scratch = np.empty((rows, steps))
+    spots, strikes, omega = spots[:, None], strikes[:, None], omega[:, None]
+
+    #* step N - 1: max(exercise, European value over the last dt)
+    n = steps - 1
+    np.multiply(spots, powers[:, steps - n:steps + n + 1:2], out=node_spots)
+    values[:] = black_scholes(node_spots, strikes, omega, dt, vol, rate, dividend)
+    np.maximum(values, omega * (node_spots - strikes), out=values)
+
+    for n in range(steps - 2, -1, -1):
+        value, above, exercise, step_spots = values[:, :n+1], values[:, 1:n+2], scratch[:, :n+1], node_spots[:, :n+1]
+        if n == 0:
+            delta = (values[:, 1] - values[:, 0]) / (spots[:, 0] * (up[:, 0] - 1 / up[:, 0]))
+
+        #* continuation = discount · (p · up node + (1 - p) · down node), then early exercise
+        np.multiply(above, discount * p_up, out=exercise)
+        value *= discount * (1 - p_up)
+        value += exercise
+        np.multiply(spots, powers[:, steps - n:steps + n + 1:2], out=step_spots)
+        np.subtract(step_spots, strikes, out=exercise)
+        exercise *= omega
+        np.maximum(value, exercise, out=value)
+
+    if steps == 1:
+        delta = np.zeros(rows)
+    return values[:, 0].copy(), delta
+
+
+###! ------------------ Converged Prices of the Legs ------------------ ###
+
+def american_prices(spots, leg_strikes, leg_calls, time_to_expiry, vol, rate=0.0, dividend=0.0,
+                    tolerance=LATTICE_TOLERANCE, start_steps=LATTICE_START_STEPS, max_steps=LATTICE_MAX_STEPS):
+    #* (spots, legs) values and deltas, the number of lattice steps and whether 2 successive estimates agreed within
+    #* `tolerance` (False: max_steps was reached first, the values are the last estimate)
+    #* vol: 1 flat vol, 1 per leg (legs,) or 1 per spot and leg (spots, legs), e.g. from vol_surface.VolSurface.vol
+    spots = np.maximum(np.asarray(spots, dtype=float), MIN_SPOT)
+    leg_strikes = np.asarray(leg_strikes, dtype=float)
+    shape = (len(spots), len(leg_strikes))
+    row_vols = np.broadcast_to(np.asarray(vol, dtype=float), shape).reshape(-1)
+
+    if time_to_expiry <= 0: #expired: intrinsic value
+        omega = np.where(leg_calls, 1.0, -1.0)
+        values = np.maximum(omega * (spots[:, None] - leg_strikes[None, :]), 0.0)
+        return values, np.where(values > 0, omega, 0.0), 0, True
+
+    row_spots = np.repeat(spots, len(leg_strikes))
+    row_strikes = np.tile(leg_strikes, len(spots))
+    row_omega = np.tile(np.where(leg_calls, 1.0, -1.0), len(spots))
+
+    def priced(steps):
+        return lattice(row_spots, row_strikes, row_omega, time_to_expiry, row_vols, rate, dividend, steps)
+
+    steps = start_steps
+    coarse_value, coarse_delta = priced(steps // 2)
+    fine_value, fine_delta = priced(steps)
+    estimate = (2 * fine_value - coarse_value, 2 * fine_delta - coarse_delta)
+
+    converged = False
+    while steps < max_steps:
+        steps *= 2
+        coarse_value, coarse_delta = fine_value, fine_delta #the previous fine lattice is the next coarse one
+        fine_value, fine_delta = priced(steps)
+        previous, estimate = estimate, (2 * fine_value - coarse_value, 2 * fine_delta - coarse_delta)
+        if np.max(np.abs(estimate[0] - previous[0])) <= tolerance:
+            converged = True
+            break
+
+    return estimate[0].reshape(shape), estimate[1].reshape(shape), steps, converged
+
+
+###! ------------------ Pre-Expiry Curve of a Book ------------------ ###
+
+def american_book_curve(portfolio_result, spots, days, vol, rate=0.0, dividend=0.0, tolerance=LATTICE_TOLERANCE, surface=None):
+    #* P&L of the book if it were closed at these spots `days` trading days before expiration (American legs),
+    #* and its delta (options + underlying legs); Lattice Steps / Converged: see american_prices
+    #* with a vol surface every leg gets the vol of its (strike, expiry) (per spot for a moneyness surface) instead of `vol`
+    total_portfolio = portfolio_result["total_portfolio"]
+    if total_portfolio.empty:
+        raise ValueError("The book has no open option position to price")
+
+    if surface is not None:
+        vol = surface.vol(total_portfolio["Strike"].to_numpy(dtype=float)[None, :], max(days, 1) / TRADING_DAYS,
+                          spot=np.maximum(np.asarray(spots, dtype=float), MIN_SPOT)[:, None])
+
+    positions = total_portfolio["Position"].to_numpy(dtype=float)
+    values, deltas, steps, converged = american_prices(
+        spots, total_portfolio["Strike"].to_numpy(dtype=float), (total_portfolio["Type"] == "Call").to_numpy(),
+        days / TRADING_DAYS, vol, rate, dividend, tolerance,
+    )
+
+    #* value of the open legs + the net amount of every fill (= -Σ position · price paid, closed legs included)
+    net_amount = sum(portfolio_result[key].get("net_amount", 0.0) for key in ("call_stats", "put_stats", "underlying_stats"))
+    underlying_position = portfolio_result["underlying_stats"].get("net_assets", 0)
+    spots = np.asarray(spots, dtype=float)
+
+    return pd.DataFrame({
+        "Stock Price": spots,
+        "Pre-Expiry P&L": values @ positions + underlying_position * spots + net_amount,
+        "Expiration P&L": portfolio_result["payoff_evaluator"].evaluate(spots),
+        "Delta": deltas @ positions + underlying_position,
+    }).assign(**{"Lattice Steps": steps, "Converged": converged})
+
+
+def main():
+    from benchmarks.synthetic_books import book_frames, template_book
+    from payoff_engine import evaluate_portfolio
+
+    parser = argparse.ArgumentParser(description="Time the American pre-expiry curve of a template book")
+    parser.add_argument("--template", default="put_ratio", help="strategy template of benchmarks.synthetic_books (straddle, put_ratio...)")
+    parser.add_argument("--spots", type=int, default=300, help="points of the curve")
+    parser.add_argument("--days", type=float, default=60, help="trading days to expiration")
+    parser.add_argument("--vol", type=float, default=0.3)
+    parser.add_argument("--rate", type=float, default=0.04)
+    parser.add_argument("--dividend", type=float, default=0.0)
+    parser.add_argument("--tolerance", type=float, default=LATTICE_TOLERANCE)
+    args = parser.parse_args()
+
+    portfolio_result = evaluate_portfolio(*book_frames(template_book(args.template)))
+    spots = np.linspace(50, 150, args.spots)
+
+    start = time.perf_counter()
+    curve = american_book_curve(portfolio_result, spots, args.days, args.vol, args.rate, args.dividend, args.tolerance)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.template}: {args.spots} spots x {len(portfolio_result['total_portfolio'])} legs, "
+          f"{curve['Lattice Steps'].iloc[0]} lattice steps{'' if curve['Converged'].iloc[0] else ' (not converged)'}, {1000 * elapsed:.1f} ms")
+    with pd.option_context("display.width", 200):
+        print(curve.drop(columns="Converged").iloc[::max(args.spots // 10, 1)].round(4).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
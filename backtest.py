@@ -0,0 +1,176 @@
+### ------------------ Historical Backtest of Fixed Strategies ------------------ ###
+#* "What if the book had been opened on every day of the price history?"
+#* Every strategy is kept relative to the spot at entry: strikes and premiums are fractions of the spot it was priced at,
+#* so opened at spot S0 and held for `horizon` rows (trading days) its expiration P&L is S0 · f(S_T / S0), f being its payoff in spot units.
+#* All strategies are stacked into padded (strategies x vertices) arrays and evaluated on all entry dates at once.
+#* Run from the repository root: python backtest.py prices.csv --chain chain.csv --spot 100 --horizon 21
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from payoff_engine import LEG_COLUMNS, evaluate_portfolio
+from strategy_scanner import SCAN_TEMPLATES, load_chain, template_positions
+
+
+PRICE_COLUMNS = ("close", "adj close", "adj_close", "price", "last", "spot")
+DATE_COLUMNS = ("date", "datetime", "timestamp", "time")
+OUTCOME_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+###! ------------------ Read a Local Price Series ------------------ ###
+
+def read_price_series(path):
+    #* OHLC or close-only CSV: a date column and a close / price column, sorted by date
+    raw = pd.read_csv(path)
+    columns = {name.strip().lower(): name for name in raw.columns}
+
+    price_column = next((columns[name] for name in PRICE_COLUMNS if name in columns), None)
+    if price_column is None:
+        raise ValueError(f"The price file needs one of the columns: {', '.join(PRICE_COLUMNS)}")
+    date_column = next((columns[name] for name in DATE_COLUMNS if name in columns), None)
+
+    closes = raw[price_column].astype(float)
+    if date_column is not None:
+        closes.index = pd.to_datetime(raw[date_column])
+        closes = closes.sort_index()
+    return closes.dropna().rename("Close")
+
+
+###! ------------------ Strategies Relative to Spot ------------------ ###
+
+def relative_payoff(payoff_evaluator, reference_spot):
+    #* P(S) / S_ref as a function of S / S_ref: the strikes and intercepts scale with the spot, the slopes don't
+    return {
+        "strikes": payoff_evaluator.strikes / reference_spot,
+        "slopes": payoff_evaluator.slopes,
+        "intercepts": payoff_evaluator.intercepts / reference_spot,
+    }
+
+
+def book_strategy(call_portfolio, put_portfolio, underlying_portfolio, reference_spot):
+    result = evaluate_portfolio(call_portfolio, put_portfolio, underlying_portfolio)
+    if result["total_portfolio"].empty:
+        raise ValueError("The book has no open option position to backtest")
+    return relative_payoff(result["payoff_evaluator"], reference_spot)
+
+
+def template_offsets(n_slots, width):
+    #* slots centered on the at-the-money strike: 1 -> [0], 2 -> [-w, w], 3 -> [-w, 0, w], 4 -> [-3w, -w, w, 3w]
+    offsets = 2 * np.arange(n_slots) - (n_slots - 1)
+    return (offsets // 2 if n_slots % 2 else offsets) * width
+
+
+def chain_template_strategies(chain, spot, widths=(1, 2, 3, 4), directions=("Long", "Short")):
+    #* every scanner template, priced once on a chain snapshot at a few widths (in strikes) around the at-the-money strike
+    strikes = chain["Strike"].to_numpy()
+    atm = int(np.abs(strikes - spot).argmin())
+    strategies = {}
+
+    for name, template in SCAN_TEMPLATES.items():
+        for direction in directions:
+            types, slots, positions = template_positions(template, direction)
+            for width in (widths if template["slots"] > 1 else widths[:1]):
+                chain_rows = atm + template_offsets(template["slots"], width)[slots]
+                if chain_rows.min() < 0 or chain_rows.max() >= len(strikes):
+                    continue
+
+                legs = pd.DataFrame({
+                    "Type": types,
+                    "Strike": strikes[chain_rows],
+                    "Quantity": np.abs(positions).astype(int),
+                    "Action": np.where(positions > 0, "Buy", "Sell"),
+                    "Cost": np.where(types == "Call", chain["Call"].to_numpy()[chain_rows], chain["Put"].to_numpy()[chain_rows]),
+                }, columns=LEG_COLUMNS)
+                label = f"{direction} {name}" if template["slots"] == 1 else f"{direction} {name} ({width} strikes)"
+                strategies[label] = book_strategy(legs[legs["Type"] == "Call"], legs[legs["Type"] == "Put"],
+                                                  pd.DataFrame(columns=LEG_COLUMNS), spot)
+
+    return strategies
+
+
+def stack_strategies(strategies):
+    #* pad to a common number of vertices: +inf strikes are never crossed, so the padded intervals are never used
+    n_vertices = max(len(strategy["strikes"]) for strategy in strategies.values())
+    strikes = np.full((len(strategies), n_vertices), np.inf)
+    slopes = np.zeros((len(strategies), n_vertices + 1))
+    intercepts = np.zeros((len(strategies), n_vertices + 1))
+
+    for row, strategy in enumerate(strategies.values()):
+        n = len(strategy["strikes"])
+        strikes[row, :n] = strategy["strikes"]
+        slopes[row, :n + 1] = strategy["slopes"]
+        intercepts[row, :n + 1] = strategy["intercepts"]
+
+    return strikes, slopes, intercepts
+
+
+###! ------------------ Backtest: (entry dates x strategies) in 1 Evaluation ------------------ ###
+
+def backtest(closes, strategies, horizon=21, chunk_size=50_000):
+    #* P&L at expiration of every strategy opened on every row that has `horizon` rows (trading days) of data after it
+    closes = pd.Series(closes, dtype=float)
+    if len(closes) <= horizon:
+        raise ValueError(f"The price series needs more than {horizon} rows for a {horizon}-row horizon")
+
+    entry = closes.to_numpy()[:-horizon]
+    moves = closes.to_numpy()[horizon:] / entry #S_T / S0
+    strikes, slopes, intercepts = stack_strategies(strategies)
+    columns = np.arange(len(strategies))
+
+    outcomes = np.empty((len(entry), len(strategies)))
+    for start in range(0, len(entry), chunk_size):
+        move = moves[start:start + chunk_size, None]
+        #* interval of every (date, strategy): number of vertices at or below the move (= searchsorted side="right")
+        interval = (strikes[None, :, :] <= move[:, :, None]).sum(axis=2)
+        relative = slopes[columns, interval] * move + intercepts[columns, interval]
+        outcomes[start:start + chunk_size] = entry[start:start + chunk_size, None] * relative
+
+    return pd.DataFrame(outcomes, index=closes.index[:-horizon], columns=list(strategies))
+
+
+def outcome_summary(outcomes):
+    #* distribution of the expiration P&L per strategy
+    values = outcomes.to_numpy()
+    percentiles = np.percentile(values, OUTCOME_PERCENTILES, axis=0)
+    tail = values <= percentiles[0] #worst 5% of the entries
+
+    summary = pd.DataFrame({
+        "Mean": values.mean(axis=0),
+        "Std": values.std(axis=0),
+        "Min": values.min(axis=0),
+        **{f"P{level}": row for level, row in zip(OUTCOME_PERCENTILES, percentiles)},
+        "Max": values.max(axis=0),
+        "Win Rate": (values > 0).mean(axis=0),
+        "Expected Shortfall (5%)": np.where(tail.any(axis=0), (values * tail).sum(axis=0) / np.maximum(tail.sum(axis=0), 1), np.nan),
+        "Entries": len(values),
+    }, index=outcomes.columns)
+    return summary.sort_values("Mean", ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the chain's spread templates over a local price series")
+    parser.add_argument("prices", help="CSV with a date column and a close / price column")
+    parser.add_argument("--chain", required=True, help="option chain snapshot (see strategy_scanner.load_chain) to price the templates")
+    parser.add_argument("--spot", type=float, required=True, help="underlying price of the chain snapshot")
+    parser.add_argument("--horizon", type=int, default=21, help="rows (trading days) of the price file from entry to expiration")
+    parser.add_argument("--widths", type=int, nargs="*", default=[1, 2, 3, 4], help="template widths in chain strikes")
+    args = parser.parse_args()
+
+    closes = read_price_series(args.prices)
+    strategies = chain_template_strategies(load_chain(args.chain), args.spot, widths=args.widths)
+
+    start = time.perf_counter()
+    outcomes = backtest(closes, strategies, horizon=args.horizon)
+    elapsed = time.perf_counter() - start
+
+    print(f"{outcomes.shape[0]:,} entry dates x {outcomes.shape[1]} strategies in {1000 * elapsed:.1f} ms")
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(outcome_summary(outcomes).round(3))
+
+
+if __name__ == "__main__":
+    main()
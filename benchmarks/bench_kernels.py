@@ -0,0 +1,115 @@
+### ------------------ NumPy vs Numba Payoff Kernels ------------------ ###
+#* Times every payoff kernel on both backends for a few book sizes and checks that their results are bit-identical.
+#* The first Numba call of each kernel is reported separately (compilation, or loading it from the on-disk cache).
+#* Run from the repository root: python -m benchmarks.bench_kernels --output kernel_results.json
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from payoff_kernels import KERNELS, KERNEL_BACKEND, strike_profit_loss, strike_interval_slopes, breakeven_scan, evaluate_piecewise
+from benchmarks.bench_pipeline import environment
+
+
+###! ------------------ Kernel Inputs ------------------ ###
+
+def kernel_inputs(n_legs, n_strikes, n_prices, seed=0):
+    rng = np.random.default_rng(seed)
+    strikes = 100.0 + 2.5 * (np.arange(n_strikes) - n_strikes // 2)
+    leg_strikes = rng.choice(strikes, n_legs)
+    leg_calls = rng.random(n_legs) < 0.5
+    leg_positions = rng.integers(1, 11, n_legs) * rng.choice([-1.0, 1.0], n_legs)
+    leg_costs = np.round(rng.uniform(0.5, 10.0, n_legs), 2)
+
+    #* slopes / intercepts of the resulting payoff for the evaluation kernel (same construction as PayoffEvaluator)
+    p_l = strike_profit_loss(leg_strikes, leg_calls, leg_positions, leg_costs, strikes, backend="numpy")
+    slopes = strike_interval_slopes(leg_strikes, leg_calls, leg_positions, strikes, backend="numpy")
+    anchor = np.maximum(np.arange(n_strikes + 1) - 1, 0)
+    intercepts = p_l[anchor] - slopes * strikes[anchor]
+
+    prices = rng.uniform(strikes[0] - 20.0, strikes[-1] + 20.0, n_prices)
+    return {
+        "strike_profit_loss": (leg_strikes, leg_calls, leg_positions, leg_costs, strikes),
+        "strike_interval_slopes": (leg_strikes, leg_calls, leg_positions, strikes),
+        "breakeven_scan": (strikes, p_l, slopes),
+        "evaluate_piecewise": (strikes, slopes, intercepts, prices),
+    }
+
+
+PUBLIC_KERNELS = {
+    "strike_profit_loss": strike_profit_loss,
+    "strike_interval_slopes": strike_interval_slopes,
+    "breakeven_scan": breakeven_scan,
+    "evaluate_piecewise": evaluate_piecewise,
+}
+
+
+###! ------------------ Time both Backends ------------------ ###
+
+def best_time(function, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return min(samples)
+
+
+def run_case(n_legs, n_strikes, n_prices, repeats):
+    inputs = kernel_inputs(n_legs, n_strikes, n_prices)
+    case = {"legs": n_legs, "strikes": n_strikes, "prices": n_prices, "kernels": {}}
+
+    for name, function in PUBLIC_KERNELS.items():
+        row = {}
+        results = {}
+        for backend in KERNELS:
+            start = time.perf_counter()
+            results[backend] = function(*inputs[name], backend=backend) #first call: Numba compiles or loads from its cache
+            row[f"{backend}_first_call"] = time.perf_counter() - start
+            row[backend] = best_time(lambda: function(*inputs[name], backend=backend), repeats)
+
+        if "numba" in results:
+            row["identical"] = bool(np.array_equal(results["numpy"], results["numba"]))
+            row["speedup"] = row["numpy"] / row["numba"]
+        case["kernels"][name] = row
+
+    return case
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the NumPy and Numba payoff kernels")
+    parser.add_argument("--legs", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--strikes", type=int, default=50)
+    parser.add_argument("--prices", type=int, default=100_000, help="prices for the evaluation kernel")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", default=None, help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    print(f"Backends: {', '.join(KERNELS)} (default {KERNEL_BACKEND})")
+    if "numba" not in KERNELS:
+        print("Numba is not installed, only the NumPy kernels are timed")
+
+    cases = [run_case(legs, args.strikes, args.prices, args.repeats) for legs in args.legs]
+    mismatches = 0
+    for case in cases:
+        for name, row in case["kernels"].items():
+            line = f"{case['legs']:>5} legs  {name:<24} numpy {1e6 * row['numpy']:10.1f} us"
+            if "numba" in row:
+                line += (f"  numba {1e6 * row['numba']:10.1f} us  x{row['speedup']:6.1f}"
+                         f"  first call {1000 * row['numba_first_call']:8.1f} ms  {'identical' if row['identical'] else 'MISMATCH'}")
+                mismatches += not row["identical"]
+            print(line)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"environment": environment(), "backends": list(KERNELS), "cases": cases}, file, indent=2)
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
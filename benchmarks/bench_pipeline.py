@@ -0,0 +1,140 @@
+### ------------------ Benchmark of the Payoff Pipeline ------------------ ###
+#* Times every stage of the app's payoff pipeline on seeded synthetic books and writes the results to JSON
+#* Run from the repository root: python -m benchmarks.bench_pipeline --output bench_results.json
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+from payoff_engine import evaluate_portfolio
+from payoff_charts import payoff_graph_png
+from performance import StageTimer
+from payoff_kernels import KERNEL_BACKEND
+from benchmarks.synthetic_books import random_book, mixed_template_book, book_frames
+
+
+STAGES = ["Portfolio statistics", "Leg netting", "Slope table", "Strike P&L", "Underlying P&L", "Pivot table", "Classification", "Breakevens", "Netting & position text", "Render"]
+
+
+###! ------------------ Run the Pipeline Once and Time each Stage ------------------ ###
+
+def time_pipeline(book, render=True):
+    timer = StageTimer(enabled=True)
+    result = evaluate_portfolio(*book_frames(book), timer=timer)
+
+    if render and not result["total_portfolio"].empty:
+        with timer.stage("Render"):
+            payoff_graph_png(result["strikes"], result["total_p_l"], result["total_slopes"], result["breakeven_points"], result["flags"], result["position_text_box"])
+
+    return timer.timings
+
+
+def summarize(samples):
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "max": max(samples),
+    }
+
+
+def run_case(case, repeats, render):
+    per_stage = {stage: [] for stage in STAGES}
+    error = None
+
+    for _ in range(repeats):
+        try:
+            timings = time_pipeline(case["book"], render=render)
+        except Exception as exc: #a degenerate random book should not stop the whole run
+            error = f"{type(exc).__name__}: {exc}"
+            break
+        for stage, seconds in timings.items():
+            per_stage.setdefault(stage, []).append(seconds)
+
+    result = {key: value for key, value in case.items() if key != "book"}
+    result["stages"] = {stage: summarize(samples) for stage, samples in per_stage.items() if samples}
+    result["total_median"] = sum(stage["median"] for stage in result["stages"].values())
+    if error is not None:
+        result["error"] = error
+    return result
+
+
+###! ------------------ Benchmark Cases ------------------ ###
+
+def build_cases(legs, strikes, underlyings, templates, seed):
+    cases = []
+    for n_legs, n_strikes, n_underlyings in itertools.product(legs, strikes, underlyings):
+        cases.append({
+            "name": f"random_L{n_legs}_S{n_strikes}_U{n_underlyings}",
+            "n_legs": n_legs,
+            "n_strikes": n_strikes,
+            "n_underlyings": n_underlyings,
+            "seed": seed,
+            "book": random_book(n_legs, n_strikes, n_underlyings, seed=seed),
+        })
+
+    for n_templates in templates:
+        book = mixed_template_book(n_templates, seed=seed)
+        cases.append({
+            "name": f"templates_T{n_templates}",
+            "n_templates": n_templates,
+            "n_legs": len(book["call_inputs"]) + len(book["put_inputs"]),
+            "seed": seed,
+            "book": book,
+        })
+
+    return cases
+
+
+def environment():
+    try:
+        git_rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        git_rev = None
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_rev": git_rev,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "matplotlib": matplotlib.__version__,
+        "kernel_backend": KERNEL_BACKEND,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each stage of the option payoff pipeline on synthetic books")
+    parser.add_argument("--legs", type=int, nargs="+", default=[10, 100, 500], help="number of option legs per random book")
+    parser.add_argument("--strikes", type=int, nargs="+", default=[5, 25], help="number of distinct strikes per random book")
+    parser.add_argument("--underlyings", type=int, nargs="+", default=[0, 10], help="number of underlying fills per random book")
+    parser.add_argument("--templates", type=int, nargs="*", default=[1, 10, 50], help="number of strategy templates per mixed book")
+    parser.add_argument("--repeats", type=int, default=5, help="timed repetitions per case")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the book generators")
+    parser.add_argument("--no-render", action="store_true", help="skip the chart rendering stage")
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON results")
+    args = parser.parse_args()
+
+    results = {"environment": environment(), "repeats": args.repeats, "cases": []}
+
+    for case in build_cases(args.legs, args.strikes, args.underlyings, args.templates, args.seed):
+        result = run_case(case, args.repeats, render=not args.no_render)
+        results["cases"].append(result)
+        print(f"{result['name']:<28} total {1000 * result['total_median']:9.2f} ms" + (f"  ({result['error']})" if "error" in result else ""))
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
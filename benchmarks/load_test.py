@@ -0,0 +1,273 @@
+### ------------------ Concurrent Session Load Test (Streamlit AppTest) ------------------ ###
+#* Drives many simulated users of the page headlessly with streamlit.testing.v1.AppTest: every session loads the page,
+#* submits the Call / Put / Underlying forms, swaps Buy - Sell, resets the last action and the portfolios.
+#* Records the latency of every rerun (percentiles per action), the script runs each action caused (st.rerun() loops)
+#* and the RSS of the worker processes while the sessions run.
+#* AppTest patches process-wide Streamlit state while it runs, so sessions can't share a process concurrently:
+#* every worker process keeps its share of the sessions open and interleaves their actions (1 action per session in turn),
+#* and the worker processes run in parallel.
+#* Run from the repository root: python -m benchmarks.load_test --sessions 50 --workers 4 --p95-budget-ms 3000
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import collections
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+from streamlit.runtime.scriptrunner.script_runner import ScriptRunnerEvent
+
+from benchmarks.bench_pipeline import environment
+
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Option_Payoff_Graph.py")
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+
+###! ------------------ Count the Script Runs behind every Action ------------------ ###
+
+#* AppTest.run() executes the script, plus every st.rerun() it requests, through a LocalScriptRunner:
+#* counting its SCRIPT_STARTED events gives the script runs of the action
+_script_runs = threading.local()
+_original_runner_run = LocalScriptRunner.run
+
+
+def _counting_run(self, *args, **kwargs):
+    try:
+        return _original_runner_run(self, *args, **kwargs)
+    finally:
+        _script_runs.count = getattr(_script_runs, "count", 0) + self.events.count(ScriptRunnerEvent.SCRIPT_STARTED)
+
+
+LocalScriptRunner.run = _counting_run
+
+
+###! ------------------ Simulated User Actions ------------------ ###
+
+FORMS = {
+    #* session key -> form key of the inputs
+    "call_inputs": "call_option_inputs",
+    "put_inputs": "put_option_inputs",
+    "underlying_inputs": "underlying_contract_inputs",
+}
+
+
+def submit_form(at, rng, session_key):
+    at.number_input(key=f"{session_key}_number").set_value(int(rng.integers(1, 5)))
+    at.radio(key=f"{session_key}_action").set_value("Buy" if rng.random() < 0.5 else "Sell")
+    if session_key != "underlying_inputs":
+        at.number_input(key=f"{session_key}_strike").set_value(float(80 + 5 * rng.integers(0, 9)))
+    at.number_input(key=f"{session_key}_price").set_value(round(float(rng.uniform(1, 10)), 2))
+
+    submit = next(button for button in at.button if button.proto.form_id == FORMS[session_key])
+    return submit.click().run()
+
+
+def click_button(at, key=None, label=None):
+    if key is not None:
+        matches = [button for button in at.button if button.key == key]
+    else:
+        matches = [button for button in at.button if button.label == label]
+    if not matches: #e.g. the swap button only exists once the portfolio has legs
+        return None
+    return matches[0].click().run()
+
+
+ACTIONS = {
+    "submit call": lambda at, rng: submit_form(at, rng, "call_inputs"),
+    "submit put": lambda at, rng: submit_form(at, rng, "put_inputs"),
+    "submit underlying": lambda at, rng: submit_form(at, rng, "underlying_inputs"),
+    "swap calls": lambda at, rng: click_button(at, key="call_inputs_swap"),
+    "swap puts": lambda at, rng: click_button(at, key="put_inputs_swap"),
+    "reset last call": lambda at, rng: click_button(at, key="Call_last_action"),
+    "reset last put": lambda at, rng: click_button(at, key="Put_last_action"),
+    "reset calls": lambda at, rng: click_button(at, label=":red[Press to Reset Calls]"),
+    "reset puts": lambda at, rng: click_button(at, label=":red[Press to Reset Puts]"),
+}
+
+#* every session: a few legs on each side, edits, then a reset (the order of the middle part is shuffled per session)
+SESSION_SCRIPT = ["submit call", "submit put", "submit call", "submit put", "submit underlying",
+                  "swap calls", "swap puts", "reset last call", "reset last put"]
+SESSION_END = ["reset calls", "reset puts"]
+
+
+###! ------------------ Run the Sessions of 1 Worker (interleaved) ------------------ ###
+
+def session_plan(session_id, seed):
+    #* the order of the middle part is shuffled per session
+    rng = np.random.default_rng(seed + session_id)
+    middle = list(SESSION_SCRIPT)
+    rng.shuffle(middle)
+    return rng, ["load"] + middle + SESSION_END
+
+
+def run_action(at, action, rng):
+    _script_runs.count = 0
+    start = time.perf_counter()
+    try:
+        result = at.run() if action == "load" else ACTIONS[action](at, rng)
+        error = None if result is None or not result.exception else str(result.exception[0].value)[:200]
+    except Exception as exc: #a broken action must not stop the rest of the load test
+        result, error = None, f"{type(exc).__name__}: {exc}"[:200]
+
+    return {
+        "action": action,
+        "seconds": time.perf_counter() - start,
+        "script_runs": _script_runs.count,
+        "skipped": result is None and error is None,
+        "error": error,
+    }
+
+
+def run_worker(session_ids, seed, timeout):
+    records = []
+    with RssSampler() as sampler:
+        sessions = {session_id: (AppTest.from_file(APP_PATH, default_timeout=timeout), *session_plan(session_id, seed)) for session_id in session_ids}
+
+        #* step k of every open session, then step k + 1...: all the sessions of the worker stay alive together
+        for step in range(max(len(plan) for _, _, plan in sessions.values())):
+            for session_id, (at, rng, plan) in sessions.items():
+                if step < len(plan):
+                    records.append({"session": session_id, **run_action(at, plan[step], rng)})
+
+    return records, sampler.samples
+
+
+###! ------------------ RSS while the Sessions Run ------------------ ###
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    #* no /proc (macOS): peak RSS is the best there is (bytes on macOS, KB on Linux)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class RssSampler:
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            self.samples.append((time.perf_counter() - start, current_rss_mb()))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.samples.append((self.samples[-1][0] if self.samples else 0.0, current_rss_mb()))
+
+
+###! ------------------ Summaries ------------------ ###
+
+def latency_summary(seconds):
+    milliseconds = 1000 * np.asarray(seconds)
+    summary = {f"p{level}_ms": float(np.percentile(milliseconds, level)) for level in LATENCY_PERCENTILES}
+    summary.update({"mean_ms": float(milliseconds.mean()), "max_ms": float(milliseconds.max()), "count": len(milliseconds)})
+    return summary
+
+
+def summarize(records, worker_rss_samples, wall_seconds):
+    by_action = collections.defaultdict(list)
+    for record in records:
+        if not record["skipped"]:
+            by_action[record["action"]].append(record)
+
+    actions = {}
+    for action, rows in by_action.items():
+        runs = [row["script_runs"] for row in rows]
+        actions[action] = {
+            **latency_summary([row["seconds"] for row in rows]),
+            "script_runs_mean": float(np.mean(runs)),
+            "script_runs_max": int(max(runs)),
+            "errors": sum(row["error"] is not None for row in rows),
+        }
+
+    #* RSS of every worker from its own samples, summed over the workers
+    workers = [[value for _, value in samples] for samples in worker_rss_samples]
+    executed = [record for record in records if not record["skipped"]]
+    return {
+        "overall": {**latency_summary([record["seconds"] for record in executed]), "script_runs": sum(record["script_runs"] for record in executed)},
+        "actions": actions,
+        "errors": [record for record in executed if record["error"] is not None][:20],
+        "rss_mb": {
+            "start": sum(rss[0] for rss in workers),
+            "end": sum(rss[-1] for rss in workers),
+            "peak": sum(max(rss) for rss in workers),
+            "growth": sum(rss[-1] - rss[0] for rss in workers),
+            "per_worker_peak": [max(rss) for rss in workers],
+        },
+        "wall_seconds": wall_seconds,
+        "actions_per_second": len(executed) / wall_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the page with many concurrent simulated AppTest sessions")
+    parser.add_argument("--sessions", type=int, default=50, help="simulated users")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (every worker keeps its sessions open together)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="AppTest timeout of a single rerun (seconds)")
+    parser.add_argument("--p95-budget-ms", type=float, default=None, help="exit with 1 if the overall p95 rerun latency is above this")
+    parser.add_argument("--rss-budget-mb", type=float, default=None, help="exit with 1 if the RSS grows by more than this")
+    parser.add_argument("--output", default=None, help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    #* session i goes to worker i % workers
+    shares = [list(range(worker, args.sessions, args.workers)) for worker in range(min(args.workers, args.sessions))]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(shares)) as pool:
+        results = list(pool.map(run_worker, shares, [args.seed] * len(shares), [args.timeout] * len(shares)))
+    records = [record for worker_records, _ in results for record in worker_records]
+    summary = summarize(records, [samples for _, samples in results], time.perf_counter() - start)
+
+    print(f"{args.sessions} sessions on {len(shares)} workers, {summary['overall']['count']} actions, "
+          f"{summary['overall']['script_runs']} script runs in {summary['wall_seconds']:.1f}s")
+    print(f"{'action':<20}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'runs':>7}{'errors':>8}")
+    for action, row in summary["actions"].items():
+        print(f"{action:<20}{row['count']:>7}{row['p50_ms']:>10.0f}{row['p95_ms']:>10.0f}{row['p99_ms']:>10.0f}{row['max_ms']:>10.0f}"
+              f"{row['script_runs_mean']:>7.1f}{row['errors']:>8}")
+    overall, rss = summary["overall"], summary["rss_mb"]
+    print(f"overall p50 {overall['p50_ms']:.0f} ms, p95 {overall['p95_ms']:.0f} ms, p99 {overall['p99_ms']:.0f} ms")
+    print(f"RSS {rss['start']:.0f} MB -> {rss['end']:.0f} MB (peak {rss['peak']:.0f} MB, growth {rss['growth']:+.0f} MB)")
+    for error in summary["errors"][:5]:
+        print("  ERROR", error["action"], error["error"])
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"environment": environment(), "arguments": vars(args), **summary}, file, indent=2)
+
+    failed = bool(summary["errors"])
+    if args.p95_budget_ms is not None and overall["p95_ms"] > args.p95_budget_ms:
+        print(f"p95 latency {overall['p95_ms']:.0f} ms is over the budget of {args.p95_budget_ms:.0f} ms")
+        failed = True
+    if args.rss_budget_mb is not None and rss["growth"] > args.rss_budget_mb:
+        print(f"RSS growth {rss['growth']:.0f} MB is over the budget of {args.rss_budget_mb:.0f} MB")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+### ------------------ Load Generator for the Payoff Service ------------------ ###
+#* Opens `--connections` keep-alive connections to payoff_service.py and sends POST /payoff requests as fast as the
+#* service answers them for `--duration` seconds. Books are drawn from a pool of `--pool` synthetic books, so a small
+#* pool exercises the dedupe of identical books within a batch and a large one the vectorized evaluation.
+#* Reports the latency percentiles, throughput, status codes and the batcher counters of GET /health.
+#* Starts the service in-process unless --url points to a running one.
+#* Run from the repository root: python -m benchmarks.service_load --connections 64 --duration 10 --pool 500
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import asyncio
+import collections
+import json
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from payoff_service import run_service
+from benchmarks.bench_pipeline import environment
+from benchmarks.synthetic_books import mixed_template_book, random_book
+
+
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+
+###! ------------------ Request Bodies ------------------ ###
+
+def book_pool(size, max_legs, prices, seed=0):
+    #* half random books, half books made of strategy templates, every one with `prices` prices to evaluate
+    rng = np.random.default_rng(seed)
+    bodies = []
+    for index in range(size):
+        if index % 2:
+            book = mixed_template_book(int(rng.integers(1, 4)), seed=seed + index)
+        else:
+            book = random_book(int(rng.integers(2, max_legs + 1)), int(rng.integers(2, 12)), int(rng.integers(0, 3)), seed=seed + index)
+        if prices:
+            book["prices"] = np.round(rng.uniform(50, 150, prices), 2).tolist()
+        bodies.append(json.dumps(book).encode())
+    return bodies
+
+
+###! ------------------ Keep-Alive HTTP Client ------------------ ###
+
+async def post(reader, writer, host, path, body):
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def get_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+async def connection_worker(host, port, bodies, stop_at, seed, latencies, statuses):
+    rng = np.random.default_rng(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < stop_at:
+            body = bodies[int(rng.integers(len(bodies)))]
+            start = time.perf_counter()
+            status, _ = await post(reader, writer, host, "/payoff", body)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+    finally:
+        writer.close()
+
+
+###! ------------------ Run the Load ------------------ ###
+
+async def run_load(args):
+    url = urlsplit(args.url or f"http://127.0.0.1:{args.port}")
+    host, port = url.hostname, url.port
+
+    service = None
+    if args.url is None:
+        ready = asyncio.Event()
+        service = asyncio.create_task(run_service(host, port, args.max_batch, args.max_wait_ms, args.deadline_ms, ready=ready))
+        await ready.wait()
+
+    bodies = book_pool(args.pool, args.max_legs, args.prices, args.seed)
+    latencies, statuses = [], collections.Counter()
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            connection_worker(host, port, bodies, start + args.duration, args.seed + connection, latencies, statuses)
+            for connection in range(args.connections)
+        ))
+        wall_seconds = time.perf_counter() - start
+        health = await get_json(host, port, "/health")
+    finally:
+        if service is not None:
+            service.cancel()
+            await asyncio.gather(service, return_exceptions=True)
+
+    milliseconds = 1000 * np.asarray(latencies)
+    return {
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / wall_seconds,
+        "latency_ms": {**{f"p{level}": float(np.percentile(milliseconds, level)) for level in LATENCY_PERCENTILES},
+                       "mean": float(milliseconds.mean()), "max": float(milliseconds.max())},
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "service": health,
+        "wall_seconds": wall_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the local payoff service")
+    parser.add_argument("--url", default=None, help="running service (default: start one in-process)")
+    parser.add_argument("--port", type=int, default=8765, help="port of the in-process service")
+    parser.add_argument("--connections", type=int, default=64, help="concurrent keep-alive connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--pool", type=int, default=500, help="distinct books the requests are drawn from")
+    parser.add_argument("--max-legs", type=int, default=20)
+    parser.add_argument("--prices", type=int, default=0, help="prices to evaluate in every request")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-batch", type=int, default=256, help="in-process service: books per batch")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="in-process service: batch window")
+    parser.add_argument("--deadline-ms", type=float, default=250.0, help="in-process service: request deadline")
+    parser.add_argument("--output", default=None, help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_load(args))
+
+    latency, service = summary["latency_ms"], summary["service"]
+    print(f"{summary['requests']:,} requests in {summary['wall_seconds']:.1f}s ({summary['requests_per_second']:,.0f}/s) "
+          f"over {args.connections} connections, statuses {summary['statuses']}")
+    print(f"latency p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms, p99 {latency['p99']:.2f} ms, max {latency['max']:.2f} ms")
+    print(f"{service['batches']:,} batches, mean {service['mean_batch_size']:.1f} requests per batch, "
+          f"{service['deduplicated']:,} deduplicated, {service['timeouts']:,} timeouts")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"environment": environment(), "arguments": vars(args), **summary}, file, indent=2)
+
+    sys.exit(0 if set(summary["statuses"]) <= {"200"} else 1)
+
+
+if __name__ == "__main__":
+    main()
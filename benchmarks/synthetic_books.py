@@ -0,0 +1,105 @@
+### ------------------ Import Libraries ------------------ ###
+import numpy as np
+import pandas as pd
+
+from payoff_engine import LEG_COLUMNS
+
+
+#* Books are dictionaries with the same keys and row layout the app keeps in st.session_state
+#* [Type, Strike, Quantity, Action, Cost]
+BOOK_KEYS = ("call_inputs", "put_inputs", "underlying_inputs")
+
+
+###! ------------------ Simple Option Prices for the Generated Legs ------------------ ###
+
+def synthetic_price(option_type, strike, spot, time_value=2.0):
+    #* intrinsic value + a time value that decays the further the strike is from spot
+    if option_type == "Call":
+        intrinsic = max(spot - strike, 0.0)
+    else:
+        intrinsic = max(strike - spot, 0.0)
+    return round(float(intrinsic + time_value * np.exp(-abs(strike - spot) / (0.1 * spot))), 2)
+
+
+def empty_book():
+    return {key: [] for key in BOOK_KEYS}
+
+
+def add_leg(book, option_type, strike, quantity, action, spot, price=None):
+    key = "call_inputs" if option_type == "Call" else "put_inputs"
+    price = synthetic_price(option_type, strike, spot) if price is None else price
+    book[key].append([option_type, float(strike), int(quantity), action, price])
+
+
+###! ------------------ Random Books (N legs, S distinct strikes, U underlying fills) ------------------ ###
+
+def random_book(n_legs, n_strikes, n_underlyings=0, seed=0, spot=100.0, strike_spacing=5.0, cost_jitter=0.1):
+    rng = np.random.default_rng(seed)
+    book = empty_book()
+
+    #* strike grid centered around spot
+    strike_grid = spot + strike_spacing * (np.arange(n_strikes) - n_strikes // 2)
+    strike_grid = strike_grid[strike_grid > 0]
+
+    #* make sure every strike of the grid is used at least once so the book has exactly S distinct strikes
+    leg_strikes = np.concatenate([strike_grid, rng.choice(strike_grid, size=max(n_legs - len(strike_grid), 0))])[:n_legs]
+    rng.shuffle(leg_strikes)
+
+    for strike in leg_strikes:
+        option_type = "Call" if rng.random() < 0.5 else "Put"
+        action = "Buy" if rng.random() < 0.5 else "Sell"
+        #* fills at the same strike get slightly different prices, like orders executed at different times
+        price = round(synthetic_price(option_type, strike, spot) * (1 + cost_jitter * rng.uniform(-1, 1)), 2)
+        add_leg(book, option_type, strike, rng.integers(1, 11), action, spot, price=price)
+
+    for _ in range(n_underlyings):
+        action = "Buy" if rng.random() < 0.5 else "Sell"
+        fill_price = round(float(spot * (1 + rng.normal(0, 0.02))), 2)
+        book["underlying_inputs"].append(["Underlying Contract", 0.0, int(rng.integers(1, 11)), action, fill_price])
+
+    return book
+
+
+###! ------------------ Volatility Spread Templates (same as the strategy tabs) ------------------ ###
+
+#* (type, strike offset in widths, quantity, action) for every leg of the long version of each spread
+TEMPLATES = {
+    "straddle": [("Call", 0, 1, "Buy"), ("Put", 0, 1, "Buy")],
+    "strangle": [("Call", 1, 1, "Buy"), ("Put", -1, 1, "Buy")],
+    "butterfly": [("Call", -1, 1, "Buy"), ("Call", 0, 2, "Sell"), ("Call", 1, 1, "Buy")],
+    "iron_condor": [("Put", -2, 1, "Buy"), ("Put", -1, 1, "Sell"), ("Call", 1, 1, "Sell"), ("Call", 2, 1, "Buy")],
+    "call_ratio": [("Call", 0, 1, "Buy"), ("Call", 1, 2, "Sell")],
+    "put_ratio": [("Put", 0, 1, "Buy"), ("Put", -1, 2, "Sell")],
+    "call_christmas_tree": [("Call", 0, 1, "Buy"), ("Call", 1, 1, "Sell"), ("Call", 2, 1, "Sell")],
+    "put_christmas_tree": [("Put", 0, 1, "Buy"), ("Put", -1, 1, "Sell"), ("Put", -2, 1, "Sell")],
+}
+
+
+def template_book(name, center=100.0, width=5.0, lots=1, spot=None, book=None):
+    spot = center if spot is None else spot
+    book = empty_book() if book is None else book
+
+    for option_type, offset, quantity, action in TEMPLATES[name]:
+        add_leg(book, option_type, center + offset * width, quantity * lots, action, spot)
+
+    return book
+
+
+def mixed_template_book(n_templates, seed=0, spot=100.0):
+    rng = np.random.default_rng(seed)
+    book = empty_book()
+    names = list(TEMPLATES)
+
+    for _ in range(n_templates):
+        name = names[rng.integers(len(names))]
+        center = spot + 5.0 * rng.integers(-4, 5)
+        width = 2.5 * rng.integers(1, 5)
+        template_book(name, center=center, width=width, lots=int(rng.integers(1, 4)), spot=spot, book=book)
+
+    return book
+
+
+###! ------------------ Convert a Book to the App's DataFrames ------------------ ###
+
+def book_frames(book):
+    return tuple(pd.DataFrame(data=[list(row) for row in book[key]], columns=LEG_COLUMNS) for key in BOOK_KEYS)
@@ -0,0 +1,182 @@
+### ------------------ Payoff Engine vs Reference Evaluator ------------------ ###
+#* Randomized property checks: on many seeded books the engine's option_p_l, total_p_l, total_slopes,
+#* breakevens, tail metrics and PayoffEvaluator must match the brute-force evaluator in payoff_reference.py.
+#* The same run reports the throughput of the reference evaluator.
+#* Run from the repository root: python -m benchmarks.verify_reference --books 300
+#* tests/test_payoff_reference.py runs the same checks on a fixed set of seeded books under pytest.
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from payoff_engine import evaluate_portfolio
+from payoff_reference import (
+    reference_payoff,
+    reference_slopes,
+    reference_breakevens,
+    reference_tail_metrics,
+)
+from benchmarks.synthetic_books import random_book, mixed_template_book, book_frames
+
+
+TOLERANCE = 1e-9
+
+
+def close(a, b):
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    return a.shape == b.shape and bool(np.allclose(a, b, rtol=TOLERANCE, atol=TOLERANCE))
+
+
+###! ------------------ Properties Checked on Every Book ------------------ ###
+
+def check_book(book):
+    failures = []
+
+    call_portfolio, put_portfolio, underlying_portfolio = book_frames(book)
+    option_legs = pd.concat([call_portfolio, put_portfolio], ignore_index=True)
+    if option_legs.empty:
+        return failures
+
+    result = evaluate_portfolio(*book_frames(book))
+    if result["total_portfolio"].empty: #every option leg was offset by the netting, there is no payoff to compare
+        return failures
+    strikes = result["strikes"].to_numpy(dtype=float)
+
+    #* option P&L at the strikes (options only) and total P&L (options + underlying)
+    no_underlyings = underlying_portfolio.iloc[0:0]
+    if not close(result["option_p_l"], reference_payoff(option_legs, no_underlyings, strikes)):
+        failures.append("option_p_l")
+    if not close(result["total_p_l"], reference_payoff(option_legs, underlying_portfolio, strikes)):
+        failures.append("total_p_l")
+
+    #* slope of every strike interval, including the 2 tails
+    if not close(result["total_slopes"], reference_slopes(option_legs, underlying_portfolio, strikes)):
+        failures.append("total_slopes")
+
+    #* breakevens: same points, and the reference payoff is 0 at each of them
+    breakevens = sorted(result["breakeven_points"])
+    if not close(breakevens, sorted(reference_breakevens(option_legs, underlying_portfolio))):
+        failures.append("breakeven_points")
+    elif breakevens:
+        scale = max(1.0, float(np.abs(result["total_p_l"]).max()))
+        if not np.all(np.abs(reference_payoff(option_legs, underlying_portfolio, breakevens)) <= TOLERANCE * scale * 10):
+            failures.append("breakeven_points (payoff != 0)")
+
+    #* arbitrary prices through the binary-search evaluator: strikes, points in between and far in both tails
+    rng = np.random.default_rng(len(option_legs))
+    prices = np.concatenate([strikes, rng.uniform(0.5 * strikes.min(), 1.5 * strikes.max() + 1.0, 64)])
+    if not close(result["payoff_evaluator"].evaluate(prices), reference_payoff(option_legs, underlying_portfolio, prices)):
+        failures.append("payoff_evaluator")
+
+    #* tail metrics: maximum profit / loss and the slopes beyond the extreme strikes
+    engine_tails = result["tail_metrics"]
+    for key, expected in reference_tail_metrics(option_legs, underlying_portfolio).items():
+        if isinstance(expected, bool):
+            if bool(engine_tails[key]) != expected:
+                failures.append(f"tail_metrics[{key}]")
+        elif not (engine_tails[key] == expected or close(engine_tails[key], expected)):
+            failures.append(f"tail_metrics[{key}]")
+
+    return failures
+
+
+def random_case(rng, max_legs, max_strikes):
+    seed = int(rng.integers(2**31))
+    if rng.random() < 0.25:
+        return {"generator": "templates", "seed": seed, "n_templates": int(rng.integers(1, 6))}
+
+    n_legs = int(rng.integers(1, max_legs + 1))
+    return {
+        "generator": "random",
+        "seed": seed,
+        "n_legs": n_legs,
+        "n_strikes": int(rng.integers(1, min(n_legs, max_strikes) + 1)),
+        "n_underlyings": int(rng.integers(0, 4)) if rng.random() < 0.5 else 0,
+    }
+
+
+def case_book(case):
+    if case["generator"] == "templates":
+        return mixed_template_book(case["n_templates"], seed=case["seed"])
+    return random_book(case["n_legs"], case["n_strikes"], case["n_underlyings"], seed=case["seed"])
+
+
+###! ------------------ Throughput of the Reference Path ------------------ ###
+
+def reference_throughput(legs, prices, repeats=5, seed=0):
+    call_portfolio, put_portfolio, underlying_portfolio = book_frames(random_book(legs, max(1, legs // 4), 2, seed=seed))
+    option_legs = pd.concat([call_portfolio, put_portfolio], ignore_index=True)
+    grid = np.linspace(50.0, 150.0, prices)
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        reference_payoff(option_legs, underlying_portfolio, grid)
+        samples.append(time.perf_counter() - start)
+
+    #* same prices through the evaluator built from the engine's vertices
+    evaluator = evaluate_portfolio(*book_frames(random_book(legs, max(1, legs // 4), 2, seed=seed)))["payoff_evaluator"]
+    buffer = np.empty_like(grid)
+    evaluator_samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        evaluator.evaluate(grid, out=buffer)
+        evaluator_samples.append(time.perf_counter() - start)
+
+    best = min(samples)
+    return {
+        "legs": legs,
+        "prices": prices,
+        "seconds": best,
+        "prices_per_second": prices / best,
+        "leg_evaluations_per_second": prices * (legs + len(underlying_portfolio)) / best,
+        "evaluator_seconds": min(evaluator_samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the payoff engine against the brute-force reference evaluator")
+    parser.add_argument("--books", type=int, default=300, help="number of random books to check")
+    parser.add_argument("--max-legs", type=int, default=40, help="maximum number of option legs per random book")
+    parser.add_argument("--max-strikes", type=int, default=12, help="maximum number of distinct strikes per random book")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--throughput-legs", type=int, nargs="*", default=[10, 100, 1000])
+    parser.add_argument("--throughput-prices", type=int, default=10_000)
+    parser.add_argument("--output", default=None, help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    failed_cases = []
+
+    start = time.perf_counter()
+    for _ in range(args.books):
+        case = random_case(rng, args.max_legs, args.max_strikes)
+        failures = check_book(case_book(case))
+        if failures:
+            failed_cases.append({**case, "failures": failures})
+    elapsed = time.perf_counter() - start
+
+    print(f"Checked {args.books} books in {elapsed:.1f}s: {len(failed_cases)} failing")
+    for case in failed_cases[:10]:
+        print("  FAIL", case)
+
+    throughput = [reference_throughput(legs, args.throughput_prices) for legs in args.throughput_legs]
+    for row in throughput:
+        print(f"Reference evaluator: {row['legs']:>5} legs x {row['prices']} prices in {1000 * row['seconds']:.2f} ms "
+              f"({row['leg_evaluations_per_second']:.3g} leg evaluations/s), evaluator {1000 * row['evaluator_seconds']:.2f} ms")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"books": args.books, "failed_cases": failed_cases, "throughput": throughput}, file, indent=2)
+
+    sys.exit(1 if failed_cases else 0)
+
+
+if __name__ == "__main__":
+    main()
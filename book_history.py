@@ -0,0 +1,91 @@
+### ------------------ Undo / Redo History of the Books ------------------ ###
+#* Every change of the Call / Put / Underlying inputs (add, reset last, swap, reset, loaded candidate...) is 1 entry of
+#* an operation log: (label, snapshot of the 3 books). Snapshots are immutable tuples that share structure:
+#* an unchanged book is the same tuple object as in the previous entry and unchanged legs are the same leg tuples,
+#* so an entry only costs the legs that actually changed (+ 1 tuple of references for a changed book).
+#* Undo / redo only move a cursor over the log; the log keeps at most `max_entries` entries (oldest dropped first).
+#* The payoff pipeline results of a snapshot are kept on its entry, so undoing / redoing to a book that was already
+#* evaluated reuses its result instead of recomputing it, and a result lives exactly as long as its entry.
+
+### ------------------ Import Libraries ------------------ ###
+import collections
+
+
+HISTORY_MAX_ENTRIES = 200
+
+#* results: payoff pipeline results of the snapshot, by view (e.g. the underlying shown), filled by store_result
+HistoryEntry = collections.namedtuple("HistoryEntry", ["label", "snapshot", "results"])
+
+
+###! ------------------ Immutable Snapshots with Structural Sharing ------------------ ###
+
+def share_legs(previous_legs, rows):
+    #* tuple of leg tuples for `rows`, reusing the leg tuples (or the whole book tuple) of the previous snapshot when equal
+    legs = tuple(previous_legs[i] if i < len(previous_legs) and previous_legs[i] == leg else leg
+                 for i, leg in enumerate(tuple(row) for row in rows))
+    return previous_legs if legs == previous_legs else legs
+
+
+def take_snapshot(books, keys, previous=None):
+    #* books: mapping session key -> list of [Type, Strike, Quantity, Action, Cost] rows (e.g. st.session_state)
+    previous = previous if previous is not None else tuple(() for _ in keys)
+    return tuple(share_legs(previous_books, books.get(key, [])) for key, previous_books in zip(keys, previous))
+
+
+def restore_snapshot(snapshot, keys):
+    #* fresh mutable lists for the session state (the snapshots themselves are never mutated)
+    return {key: [list(leg) for leg in legs] for key, legs in zip(keys, snapshot)}
+
+
+###! ------------------ Operation Log with a Cursor ------------------ ###
+
+class BookHistory:
+    def __init__(self, keys, max_entries=HISTORY_MAX_ENTRIES):
+        self.keys = tuple(keys)
+        self.max_entries = max_entries
+        self.entries = [HistoryEntry("Empty books", tuple(() for _ in self.keys), {})]
+        self.cursor = 0
+
+    @property
+    def current(self):
+        return self.entries[self.cursor]
+
+    def record(self, books, label):
+        #* appends an entry if the books differ from the entry under the cursor; returns the current snapshot
+        snapshot = take_snapshot(books, self.keys, self.current.snapshot)
+        if snapshot == self.current.snapshot: #cheap: the shared legs compare by identity first
+            return self.current.snapshot
+
+        del self.entries[self.cursor + 1:] #a new operation after an undo drops the redo branch (and its results)
+        self.entries.append(HistoryEntry(label, snapshot, {}))
+        if len(self.entries) > self.max_entries:
+            del self.entries[:len(self.entries) - self.max_entries]
+        self.cursor = len(self.entries) - 1
+        return snapshot
+
+    def can_undo(self):
+        return self.cursor > 0
+
+    def can_redo(self):
+        return self.cursor < len(self.entries) - 1
+
+    def undo(self):
+        #* returns the label of the undone operation
+        label = self.current.label
+        self.cursor -= 1
+        return label
+
+    def redo(self):
+        self.cursor += 1
+        return self.current.label
+
+    def restore(self):
+        return restore_snapshot(self.current.snapshot, self.keys)
+
+    #* payoff results of the entry under the cursor (dropped with the entry when the log is trimmed)
+
+    def cached_result(self, view=None):
+        return self.current.results.get(view)
+
+    def store_result(self, view, result):
+        self.current.results[view] = result
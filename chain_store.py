@@ -0,0 +1,210 @@
+### ------------------ Memory-Mapped Option-Chain Store ------------------ ###
+#* Columnar archive of option quotes sorted by (quote date, expiry, type, strike):
+#*  - NumPy layout: one .npy file per column, opened with mmap_mode="r" (always available)
+#*  - Arrow layout: a single uncompressed Arrow IPC file opened with pyarrow.memory_map (if pyarrow is installed)
+#* Opening an archive only maps the files, nothing is read until a chain is sliced.
+#* Every (quote date, expiry, type) chain is a contiguous row range, found with a binary search on the group keys;
+#* a strike inside a chain is found with a second binary search, and whole chains are zero-copy views.
+#* Build an archive: python chain_store.py quotes.csv [more.csv ...] --out chain_archive [--arrow]
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError: #optional, only needed for the Arrow layout
+    pa = None
+
+
+OPTION_TYPES = ("Call", "Put") #stored as 0 / 1
+STORE_COLUMNS = ("quote_date", "expiry", "type", "strike", "bid", "ask")
+ARROW_FILE = "chain.arrow"
+META_FILE = "meta.json"
+
+#* group key = (quote date, expiry, type) packed in 1 int64 (dates are days since 1970, well below 2**21)
+_EXPIRY_BITS = 22
+
+
+def _group_keys(quote_date, expiry, option_type):
+    quote_date = np.asarray(quote_date, dtype=np.int64)
+    expiry = np.asarray(expiry, dtype=np.int64)
+    return (quote_date << (_EXPIRY_BITS + 1)) | (expiry << 1) | np.asarray(option_type, dtype=np.int64)
+
+
+def _days(values):
+    #* dates, strings or datetime64 -> int64 days since 1970-01-01
+    return pd.to_datetime(pd.Series(values)).to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+
+def _day(value):
+    #* scalar fast path for lookups (no pandas round trip)
+    return int(np.datetime64(value, "D").astype(np.int64))
+
+
+def _type_codes(values):
+    first_letter = pd.Series(values).astype(str).str.strip().str[0].str.upper()
+    if not first_letter.isin(["C", "P"]).all():
+        raise ValueError("Option types must be Call / Put (or C / P)")
+    return (first_letter == "P").to_numpy(dtype=np.int8)
+
+
+###! ------------------ Build an Archive ------------------ ###
+
+def normalize_quotes(frame):
+    #* expiry, strike, type and bid / ask (or a single price / mid column) | quote_date is optional (a single snapshot)
+    columns = {name.strip().lower(): name for name in frame.columns}
+
+    def column(*names):
+        return next((frame[columns[name]] for name in names if name in columns), None)
+
+    expiry, strike, option_type = column("expiry", "expiration"), column("strike"), column("type", "option_type", "right")
+    if expiry is None or strike is None or option_type is None:
+        raise ValueError("The quotes need expiry, strike and type columns")
+
+    bid, ask = column("bid"), column("ask")
+    if bid is None or ask is None:
+        price = column("price", "mid", "last")
+        if price is None:
+            raise ValueError("The quotes need bid and ask columns (or a price / mid column)")
+        bid = ask = price
+
+    quote_date = column("quote_date", "date")
+    return pd.DataFrame({
+        "quote_date": _days(quote_date) if quote_date is not None else np.zeros(len(frame), dtype=np.int64),
+        "expiry": _days(expiry),
+        "type": _type_codes(option_type),
+        "strike": strike.to_numpy(dtype=float),
+        "bid": bid.to_numpy(dtype=float),
+        "ask": ask.to_numpy(dtype=float),
+    })
+
+
+def build_chain_store(quotes, directory, arrow=False):
+    quotes = normalize_quotes(quotes)
+
+    #* sort once at build time: group keys first, strikes inside each group
+    keys = _group_keys(quotes["quote_date"], quotes["expiry"], quotes["type"])
+    order = np.lexsort((quotes["strike"].to_numpy(), keys))
+    quotes = quotes.iloc[order].reset_index(drop=True)
+    keys = keys[order]
+
+    #* 1 quote per strike in every chain: the strike lookups and the call / put pairing rely on it
+    repeated = (keys[1:] == keys[:-1]) & (quotes["strike"].to_numpy()[1:] == quotes["strike"].to_numpy()[:-1])
+    if repeated.any():
+        row = quotes.iloc[int(np.argmax(repeated))]
+        raise ValueError(f"Strike {row['strike']:g} is quoted more than once for the {OPTION_TYPES[int(row['type'])]} chain expiring "
+                         f"{np.datetime64(int(row['expiry']), 'D')} (quote date {np.datetime64(int(row['quote_date']), 'D')})")
+
+    group_keys, group_starts = np.unique(keys, return_index=True)
+    group_stops = np.append(group_starts[1:], len(keys))
+
+    os.makedirs(directory, exist_ok=True)
+    if arrow:
+        if pa is None:
+            raise ImportError("The Arrow layout needs pyarrow (pip install pyarrow), or build the NumPy layout instead")
+        table = pa.Table.from_pandas(quotes, preserve_index=False)
+        with pa.OSFile(os.path.join(directory, ARROW_FILE), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=max(len(quotes), 1)) #1 record batch -> every column is 1 zero-copy buffer
+    else:
+        for name in STORE_COLUMNS:
+            np.save(os.path.join(directory, f"{name}.npy"), quotes[name].to_numpy())
+
+    np.save(os.path.join(directory, "group_keys.npy"), group_keys)
+    np.save(os.path.join(directory, "group_bounds.npy"), np.column_stack([group_starts, group_stops]).astype(np.int64))
+    with open(os.path.join(directory, META_FILE), "w") as file:
+        json.dump({"rows": len(quotes), "groups": len(group_keys), "layout": "arrow" if arrow else "numpy"}, file)
+
+    return ChainStore(directory)
+
+
+###! ------------------ Open an Archive & Look Up Quotes ------------------ ###
+
+class ChainStore:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE)) as file:
+            self.meta = json.load(file)
+
+        if self.meta["layout"] == "arrow":
+            if pa is None:
+                raise ImportError(f"{directory} is an Arrow archive, reading it needs pyarrow (pip install pyarrow)")
+            self._arrow_source = pa.memory_map(os.path.join(directory, ARROW_FILE), "r")
+            table = pa.ipc.open_file(self._arrow_source).read_all()
+            self.columns = {name: table.column(name).chunk(0).to_numpy(zero_copy_only=True) if table.num_rows else np.empty(0)
+                            for name in STORE_COLUMNS}
+        else:
+            self.columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in STORE_COLUMNS}
+
+        #* the group index is tiny (1 row per chain), it is read into memory
+        self.group_keys = np.load(os.path.join(directory, "group_keys.npy"))
+        self.group_bounds = np.load(os.path.join(directory, "group_bounds.npy"))
+        self.latest_quote_date = self.quote_dates()[-1] if len(self.group_keys) else np.datetime64(0, "D")
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def _rows(self, quote_date, expiry, option_type):
+        key = _group_keys(_day(quote_date), _day(expiry), OPTION_TYPES.index(option_type))
+        position = np.searchsorted(self.group_keys, key)
+        if position == len(self.group_keys) or self.group_keys[position] != key:
+            return slice(0, 0)
+        start, stop = self.group_bounds[position]
+        return slice(int(start), int(stop))
+
+    def quote_dates(self):
+        days = np.unique(self.group_keys >> (_EXPIRY_BITS + 1))
+        return days.astype("datetime64[D]")
+
+    def expiries(self, quote_date=None):
+        quote_date = self.latest_quote_date if quote_date is None else quote_date
+        keys = self.group_keys[(self.group_keys >> (_EXPIRY_BITS + 1)) == _day(quote_date)]
+        return np.unique((keys >> 1) & ((1 << _EXPIRY_BITS) - 1)).astype("datetime64[D]")
+
+    def chain(self, expiry, option_type, quote_date=None):
+        #* zero-copy views of one chain: strikes (sorted), bids and asks
+        quote_date = self.latest_quote_date if quote_date is None else quote_date
+        rows = self._rows(quote_date, expiry, option_type)
+        return self.columns["strike"][rows], self.columns["bid"][rows], self.columns["ask"][rows]
+
+    def quote(self, expiry, strike, option_type, quote_date=None):
+        #* 2 binary searches: the chain among the groups, then the strike inside the chain | None if not quoted
+        strikes, bids, asks = self.chain(expiry, option_type, quote_date)
+        position = np.searchsorted(strikes, strike)
+        if position == len(strikes) or not np.isclose(strikes[position], strike):
+            return None
+        bid, ask = float(bids[position]), float(asks[position])
+        return {"bid": bid, "ask": ask, "mid": (bid + ask) / 2}
+
+    def chain_frame(self, expiry, quote_date=None):
+        #* call & put mids on the strikes quoted for both, in the layout of strategy_scanner.load_chain
+        call_strikes, call_bids, call_asks = self.chain(expiry, "Call", quote_date)
+        put_strikes, put_bids, put_asks = self.chain(expiry, "Put", quote_date)
+        #* no assume_unique: an archive written before duplicates were rejected must not pair the wrong quotes
+        strikes, call_index, put_index = np.intersect1d(call_strikes, put_strikes, return_indices=True)
+        return pd.DataFrame({
+            "Strike": strikes,
+            "Call": (call_bids[call_index] + call_asks[call_index]) / 2,
+            "Put": (put_bids[put_index] + put_asks[put_index]) / 2,
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a memory-mapped option chain archive from CSV quote files")
+    parser.add_argument("paths", nargs="+", help="CSV files with [quote_date,] expiry, strike, type and bid / ask (or price) columns")
+    parser.add_argument("--out", required=True, help="archive directory")
+    parser.add_argument("--arrow", action="store_true", help="write a single Arrow IPC file instead of .npy columns (needs pyarrow)")
+    args = parser.parse_args()
+
+    quotes = pd.concat([pd.read_csv(path) for path in args.paths], ignore_index=True)
+    store = build_chain_store(quotes, args.out, arrow=args.arrow)
+    print(f"{len(store):,} quotes in {len(store.group_keys):,} chains -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
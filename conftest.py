@@ -0,0 +1 @@
+#* pytest: puts the repository root on sys.path so the tests import the app modules and benchmarks like the scripts do
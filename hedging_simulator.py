@@ -0,0 +1,128 @@
+### ------------------ Delta Hedging Simulator ------------------ ###
+#* "What would it cost to hedge the book's delta with the underlying?"
+#* Simulates geometric Brownian motion paths of the spot up to expiration, rebalances an underlying hedge to the
+#* Black-Scholes delta of the option legs every `rebalance_every` steps and pays a proportional transaction cost on
+#* every trade. At expiration the book pays its expiration payoff (payoff_engine.PayoffEvaluator) and the hedge its P&L.
+#* Paths are processed in chunks and every chunk only keeps the current step: memory is (chunk x legs), not (paths x steps),
+#* so 100k paths x 250 steps run in a few MB.
+#* Run from the repository root: python hedging_simulator.py --paths 100000 --days 250 --spot 100 --vol 0.2
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from payoff_engine import evaluate_portfolio
+from backtest import outcome_summary
+from pricing import TRADING_DAYS, book_legs, normal_cdf
+
+
+###! ------------------ Black-Scholes Delta of the Legs ------------------ ###
+
+def book_delta(spots, leg_strikes, leg_calls, leg_positions, time_left, vol, rate):
+    #* Σ position · N(d1) for calls, Σ position · (N(d1) - 1) for puts, (paths,) spots -> (paths,) deltas
+    sqrt_time = vol * np.sqrt(time_left)
+    d1 = (np.log(spots[:, None] / leg_strikes[None, :]) + (rate + 0.5 * vol ** 2) * time_left) / sqrt_time
+    leg_deltas = normal_cdf(d1) - (~leg_calls)[None, :]
+    return leg_deltas @ leg_positions
+
+
+###! ------------------ Simulate the Hedge (chunks of paths, 1 step at a time) ------------------ ###
+
+def simulate_hedge(portfolio_result, spot, vol, days, drift=0.0, rate=0.0, steps_per_day=1, rebalance_every=1,
+                   cost_bps=0.0, n_paths=10_000, chunk_size=20_000, seed=0):
+    #* returns 1 row per path: hedged / unhedged P&L at expiration, hedge turnover (underlying units traded),
+    #* transaction costs and the final spot
+    if portfolio_result["total_portfolio"].empty:
+        raise ValueError("The book has no open option position to hedge")
+
+    leg_strikes, leg_calls, leg_positions, underlying_position = book_legs(portfolio_result)
+    evaluator = portfolio_result["payoff_evaluator"]
+
+    n_steps = int(round(days * steps_per_day))
+    dt = 1.0 / (TRADING_DAYS * steps_per_day)
+    step_drift = (drift - 0.5 * vol ** 2) * dt
+    step_vol = vol * np.sqrt(dt)
+    cost_rate = cost_bps / 10_000
+    growth = np.exp(rate * dt) #cash account of the hedge
+
+    columns = {name: np.empty(n_paths) for name in ("Hedged P&L", "Unhedged P&L", "Turnover", "Transaction Costs", "Final Spot")}
+    for chunk, start in enumerate(range(0, n_paths, chunk_size)):
+        n = min(chunk_size, n_paths - start)
+        rng = np.random.default_rng([seed, chunk]) #reproducible whatever the chunk size of the other chunks
+        spots = np.full(n, float(spot))
+        hedge = np.zeros(n) #underlying units held against the book
+        cash = np.zeros(n)
+        turnover = np.zeros(n)
+        costs = np.zeros(n)
+
+        for step in range(n_steps):
+            if step % rebalance_every == 0:
+                #* target: total delta (options + underlying legs of the book + hedge) of 0
+                target = -(book_delta(spots, leg_strikes, leg_calls, leg_positions, (n_steps - step) * dt, vol, rate) + underlying_position)
+                trade = target - hedge
+                trade_cost = cost_rate * np.abs(trade) * spots
+                cash -= trade * spots + trade_cost
+                turnover += np.abs(trade)
+                costs += trade_cost
+                hedge = target
+
+            cash *= growth
+            spots *= np.exp(step_drift + step_vol * rng.standard_normal(n))
+
+        book_p_l = evaluator.evaluate(spots)
+        #* the hedge is unwound at the final spot (no cost: it is settled against the expiring legs)
+        columns["Hedged P&L"][start:start + n] = book_p_l + cash + hedge * spots
+        columns["Unhedged P&L"][start:start + n] = book_p_l
+        columns["Turnover"][start:start + n] = turnover
+        columns["Transaction Costs"][start:start + n] = costs
+        columns["Final Spot"][start:start + n] = spots
+
+    return pd.DataFrame(columns)
+
+
+def hedge_summary(paths):
+    #* P&L distribution of the hedged and the unhedged book + the averages of the hedge itself
+    summary = outcome_summary(paths[["Hedged P&L", "Unhedged P&L"]]).rename(columns={"Entries": "Paths"})
+    hedge = {
+        "Mean Turnover": paths["Turnover"].mean(),
+        "Mean Transaction Costs": paths["Transaction Costs"].mean(),
+        "P95 Transaction Costs": paths["Transaction Costs"].quantile(0.95),
+    }
+    return summary, hedge
+
+
+def main():
+    from benchmarks.synthetic_books import book_frames, template_book
+
+    parser = argparse.ArgumentParser(description="Simulate delta hedging a template book with the underlying")
+    parser.add_argument("--template", default="call_ratio", help="strategy template of benchmarks.synthetic_books (straddle, call_ratio...)")
+    parser.add_argument("--spot", type=float, default=100.0)
+    parser.add_argument("--vol", type=float, default=0.2, help="annualized volatility of the simulated paths and the deltas")
+    parser.add_argument("--drift", type=float, default=0.0)
+    parser.add_argument("--rate", type=float, default=0.0)
+    parser.add_argument("--days", type=int, default=250, help="trading days to expiration")
+    parser.add_argument("--rebalance-every", type=int, default=1, help="steps between rebalances")
+    parser.add_argument("--cost-bps", type=float, default=5.0, help="transaction cost, bps of the traded notional")
+    parser.add_argument("--paths", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=20_000)
+    args = parser.parse_args()
+
+    portfolio_result = evaluate_portfolio(*book_frames(template_book(args.template, center=args.spot, spot=args.spot)))
+
+    start = time.perf_counter()
+    paths = simulate_hedge(portfolio_result, args.spot, args.vol, args.days, drift=args.drift, rate=args.rate,
+                           rebalance_every=args.rebalance_every, cost_bps=args.cost_bps, n_paths=args.paths, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    summary, hedge = hedge_summary(paths)
+    print(f"{args.template}: {args.paths:,} paths x {args.days} steps in {elapsed:.2f}s")
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(summary.round(3))
+    print(", ".join(f"{name} {value:.3f}" for name, value in hedge.items()))
+
+
+if __name__ == "__main__":
+    main()
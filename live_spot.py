@@ -0,0 +1,161 @@
+### ------------------ Live (or Replayed) Spot Price Feed ------------------ ###
+#* Tick sources for the streaming mode of the app:
+#*  - replay_ticks(): replays a local CSV / text file of prices at a fixed rate
+#*  - socket_ticks(): reads newline separated prices from a local TCP socket (None heartbeats while it is quiet)
+#* A LiveSpotFeed consumes any tick iterator on a background thread into a bounded buffer,
+#* so the page only drains the new ticks and evaluates them with the cached PayoffEvaluator.
+#* Stand-in socket server: python live_spot.py prices.csv --port 9009 --rate 200
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import collections
+import csv
+import itertools
+import socket
+import threading
+import time
+
+import numpy as np
+
+
+SOCKET_POLL_SECONDS = 0.25 #a quiet socket still hands control back this often, so a feed can be stopped
+
+###! ------------------ Tick Sources ------------------ ###
+
+def read_prices(path):
+    #* a CSV with a "price" (or "close") column, or a plain file with one price per line
+    with open(path, newline="") as file:
+        sample = file.readline()
+        file.seek(0)
+
+        if any(character.isalpha() for character in sample):
+            reader = csv.DictReader(file)
+            column = next((name for name in reader.fieldnames or [] if name.strip().lower() in ("price", "close", "last", "spot")), None)
+            if column is None:
+                raise ValueError(f"{path} has no price, close, last or spot column")
+            return [float(row[column]) for row in reader if row[column]]
+
+        return [float(line.split(",")[-1]) for line in file if line.strip()]
+
+
+def replay_ticks(path, ticks_per_second=200.0, loop=True):
+    prices = read_prices(path)
+    source = itertools.cycle(prices) if loop else iter(prices)
+    interval = 1.0 / ticks_per_second if ticks_per_second else 0.0
+
+    next_tick = time.perf_counter()
+    for price in source:
+        if interval:
+            #* pace against a schedule (not a fixed sleep) so the rate does not drift
+            next_tick += interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        yield time.time(), price
+
+
+def socket_ticks(host="127.0.0.1", port=9009, timeout=5.0, poll=SOCKET_POLL_SECONDS):
+    #* raw recv with a finite timeout (a makefile reader can't be used again after a timeout): every quiet `poll`
+    #* seconds a None heartbeat is yielded instead of a tick, so the consumer can check whether it should stop
+    with socket.create_connection((host, port), timeout=timeout) as connection:
+        connection.settimeout(poll)
+        pending = b""
+        while True:
+            try:
+                chunk = connection.recv(1 << 16)
+            except socket.timeout:
+                yield None
+                continue
+            if not chunk: #closed by the server
+                break
+            *lines, pending = (pending + chunk).split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield time.time(), float(line)
+        if pending.strip():
+            yield time.time(), float(pending)
+
+
+def serve_ticks(path, port=9009, ticks_per_second=200.0, host="127.0.0.1"):
+    #* local stand-in for a market data socket: every client gets its own replay of the file
+    server = socket.create_server((host, port))
+
+    def stream(connection):
+        with connection, connection.makefile("w") as output:
+            try:
+                for _, price in replay_ticks(path, ticks_per_second=ticks_per_second):
+                    output.write(f"{price}\n")
+                    output.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    with server:
+        while True:
+            connection, _ = server.accept()
+            threading.Thread(target=stream, args=(connection,), daemon=True).start()
+
+
+###! ------------------ Background Feed with a Bounded Tick Buffer ------------------ ###
+
+class LiveSpotFeed:
+    def __init__(self, ticks, max_ticks=10_000):
+        self.ticks = ticks
+        self.buffer = collections.deque(maxlen=max_ticks) #(timestamp, price); old ticks drop off when the page falls behind
+        self.error = None
+        self.received = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="live-spot-feed", daemon=True)
+
+    def _run(self):
+        try:
+            for tick in self.ticks:
+                if self._stop.is_set():
+                    break
+                if tick is None: #heartbeat of a quiet source
+                    continue
+                self.buffer.append(tick) #deque.append is atomic, no lock needed
+                self.received += 1
+        except Exception as exc: #any failure of the source must reach the page, a dead thread alone is silent
+            self.error = exc
+        finally:
+            close = getattr(self.ticks, "close", None)
+            if close is not None: #a generator source closes its socket / file now, not when it is garbage collected
+                close()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def drain(self):
+        #* take every tick received since the last call (popleft is atomic as well)
+        ticks = []
+        while True:
+            try:
+                ticks.append(self.buffer.popleft())
+            except IndexError:
+                break
+
+        if not ticks:
+            return np.empty(0), np.empty(0)
+        timestamps, prices = zip(*ticks)
+        return np.asarray(timestamps, dtype=float), np.asarray(prices, dtype=float)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a replay of a local price file over TCP (one price per line)")
+    parser.add_argument("path", help="CSV with a price/close column, or one price per line")
+    parser.add_argument("--port", type=int, default=9009)
+    parser.add_argument("--rate", type=float, default=200.0, help="ticks per second")
+    args = parser.parse_args()
+    serve_ticks(args.path, port=args.port, ticks_per_second=args.rate)
+
+
+if __name__ == "__main__":
+    main()
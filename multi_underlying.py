@@ -0,0 +1,188 @@
+### ------------------ Multi-Underlying Books (sharded by underlying) ------------------ ###
+#* Every leg row of the session state books can carry its underlying as a 6th field:
+#*   [Type, Strike, Quantity, Action, Cost, Underlying]   (rows without it belong to DEFAULT_UNDERLYING)
+#* The payoff pipeline (payoff_engine.evaluate_portfolio) works on 1 underlying / 1 x-axis, so a book is split into
+#* 1 shard per underlying and every shard is evaluated on its own: payoff, breakevens and tail risk.
+#* Shards are evaluated in parallel worker processes (1 persistent pool of at most SHARD_MAX_WORKERS, spawned on first
+#* use and shut down at exit) and cached by their legs, so a rerun only evaluates the shards whose legs changed.
+#* A handful of shards (fewer than SHARD_PARALLEL_MIN to evaluate) are evaluated in-process: spawning the workers and
+#* pickling the legs would cost more than the shards themselves. Portfolio-level metrics are aggregated from the shard summaries.
+#* Run from the repository root: python multi_underlying.py --underlyings 8 --legs 2000 --workers 4
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import atexit
+import collections
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from payoff_engine import LEG_COLUMNS, evaluate_portfolio
+from what_if import BOOK_KEYS, result_piecewise, variant_metrics
+
+
+UNDERLYING_COLUMN = "Underlying"
+DEFAULT_UNDERLYING = "Main"
+BOOK_COLUMNS = LEG_COLUMNS + [UNDERLYING_COLUMN]
+SHARD_MAX_WORKERS = 4 #every spawned worker imports pandas and the payoff engine on its own
+SHARD_WORKERS = min(os.cpu_count() or 1, SHARD_MAX_WORKERS)
+SHARD_PARALLEL_MIN = 4 #shards to evaluate before the pool is used
+SHARD_CACHE_SIZE = 64
+
+
+###! ------------------ Underlying of the Legs ------------------ ###
+
+def leg_underlying(row):
+    underlying = str(row[5]).strip() if len(row) > 5 and row[5] is not None else ""
+    return underlying or DEFAULT_UNDERLYING
+
+
+def tag_legs(rows, underlying):
+    #* copies of 5-field rows (scanner candidates, hedges, what-if legs...) with their underlying
+    return [list(row[:5]) + [underlying] for row in rows]
+
+
+def book_frame(rows):
+    #* session state rows -> DataFrame with the Underlying column (rows without one get DEFAULT_UNDERLYING)
+    return pd.DataFrame([list(row[:5]) + [leg_underlying(row)] for row in rows], columns=BOOK_COLUMNS)
+
+
+def book_underlyings(books):
+    #* distinct underlyings of the 3 books in order of first appearance (DEFAULT_UNDERLYING for an empty book)
+    underlyings = dict.fromkeys(leg_underlying(row) for key in BOOK_KEYS for row in books.get(key, []))
+    return list(underlyings) or [DEFAULT_UNDERLYING]
+
+
+def shard_frames(frames, underlying):
+    #* (call, put, underlying contract) frames of 1 underlying in the 5 pipeline columns
+    return tuple(frame.loc[frame[UNDERLYING_COLUMN] == underlying, LEG_COLUMNS].reset_index(drop=True) for frame in frames)
+
+
+def shard_books(books):
+    #* underlying -> frozen (call rows, put rows, underlying rows) of its legs, hashable for the shard cache
+    shards = {}
+    for position, key in enumerate(BOOK_KEYS):
+        for row in books.get(key, []):
+            shard = shards.setdefault(leg_underlying(row), ([], [], []))
+            shard[position].append(tuple(row[:5]))
+    return {underlying: tuple(tuple(rows) for rows in shard) for underlying, shard in shards.items()}
+
+
+###! ------------------ Evaluate 1 Shard (runs in a worker process) ------------------ ###
+
+def evaluate_shard(frozen_shard):
+    #* payoff pipeline of 1 underlying -> small picklable summary (no DataFrames back through the pool)
+    frames = [pd.DataFrame([list(row) for row in rows], columns=LEG_COLUMNS) for rows in frozen_shard]
+    portfolio_result = evaluate_portfolio(*frames)
+    piecewise = result_piecewise(portfolio_result)
+    metrics = variant_metrics(piecewise)
+
+    call_position = portfolio_result["call_stats"].get("net_assets", 0)
+    put_position = portfolio_result["put_stats"].get("net_assets", 0)
+    underlying_position = portfolio_result["underlying_stats"].get("net_assets", 0)
+    return {
+        "Legs": sum(len(rows) for rows in frozen_shard),
+        "Cost": float(metrics["Cost"]),
+        "Max Profit": float(metrics["Max Profit"]),
+        "Max Loss": float(metrics["Max Loss"]),
+        "Breakevens": ", ".join(f"{point:.2f}" for point in metrics["Breakevens"]) or "None",
+        "Slope Below": float(piecewise.slopes[0]),
+        "Slope Above": float(piecewise.slopes[-1]),
+        "Δ Upside": float(underlying_position + call_position),
+        "Δ Downside": float(underlying_position + put_position),
+        "Κ Vega": float(call_position + put_position),
+    }
+
+
+###! ------------------ Sharded Evaluation (persistent process pool + cache) ------------------ ###
+
+_shard_pool = None
+_shard_cache = collections.OrderedDict() #frozen shard -> summary, least recently used first
+
+
+def shard_pool(workers=SHARD_WORKERS):
+    #* spawned workers: the caller may be a threaded server (Streamlit), forking it is not safe
+    global _shard_pool
+    if _shard_pool is None:
+        _shard_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        atexit.register(shutdown_shard_pool)
+    return _shard_pool
+
+
+def shutdown_shard_pool():
+    #* stop the workers (at exit, or to free them while the app is idle); the next sharded evaluation spawns a new pool
+    global _shard_pool
+    pool, _shard_pool = _shard_pool, None
+    if pool is not None:
+        atexit.unregister(shutdown_shard_pool)
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def evaluate_shards(books, workers=SHARD_WORKERS):
+    #* 1 summary row per underlying (index), shards not in the cache are evaluated in parallel
+    shards = shard_books(books)
+    pending = [shard for shard in dict.fromkeys(shards.values()) if shard not in _shard_cache]
+
+    if len(pending) >= SHARD_PARALLEL_MIN and workers > 1:
+        summaries = shard_pool(workers).map(evaluate_shard, pending, chunksize=max(len(pending) // (4 * workers), 1))
+    else: #a handful of shards (or 1 core): in-process, no spawn or pickling round trip
+        summaries = map(evaluate_shard, pending)
+    for shard, summary in zip(pending, summaries):
+        _shard_cache[shard] = summary
+
+    rows = {}
+    for underlying, shard in shards.items():
+        _shard_cache.move_to_end(shard)
+        rows[underlying] = _shard_cache[shard]
+    while len(_shard_cache) > max(SHARD_CACHE_SIZE, len(shards)):
+        _shard_cache.popitem(last=False)
+
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis(UNDERLYING_COLUMN)
+
+
+def aggregate_shards(summary):
+    #* portfolio-level metrics: the underlyings are treated as independent, so the worst case is every shard at its worst
+    unlimited = (summary["Slope Below"] > 0) | (summary["Slope Above"] < 0)
+    return {
+        "Underlyings": len(summary),
+        "Legs": int(summary["Legs"].sum()),
+        "Cost": float(summary["Cost"].sum()),
+        "Max Profit": float(summary["Max Profit"].sum()),
+        "Max Loss": float(summary["Max Loss"].sum()),
+        "Unlimited Loss Underlyings": int(unlimited.sum()),
+    }
+
+
+def main():
+    from benchmarks.synthetic_books import random_book
+
+    parser = argparse.ArgumentParser(description="Time the sharded evaluation of a random multi-underlying book")
+    parser.add_argument("--underlyings", type=int, default=8)
+    parser.add_argument("--legs", type=int, default=2000, help="legs per underlying")
+    parser.add_argument("--workers", type=int, default=SHARD_WORKERS)
+    args = parser.parse_args()
+
+    books = {key: [] for key in BOOK_KEYS}
+    for shard in range(args.underlyings):
+        book = random_book(args.legs, 40, n_underlyings=2, seed=shard, spot=50.0 + 25.0 * shard)
+        for key in BOOK_KEYS:
+            books[key] += tag_legs(book[key], f"U{shard}")
+
+    start = time.perf_counter()
+    summary = evaluate_shards(books, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    cached_start = time.perf_counter()
+    evaluate_shards(books, workers=args.workers)
+    cached = time.perf_counter() - cached_start
+
+    print(f"{args.underlyings} underlyings x {args.legs} legs, {args.workers} workers: {elapsed:.2f}s (cached rerun {1000 * cached:.1f} ms)")
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(summary.round(2))
+    print(", ".join(f"{name} {value:,.2f}" if isinstance(value, float) else f"{name} {value}" for name, value in aggregate_shards(summary).items()))
+
+
+if __name__ == "__main__":
+    main()
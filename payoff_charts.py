@@ -0,0 +1,236 @@
+### ------------------ Import Libraries ------------------ ###
+#* Charts are explicit Figure / Axes objects rendered to PNG with Agg (no pyplot state), so they can be drawn
+#* concurrently in a small thread pool and are released as soon as their PNG is encoded
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator #? to set y axis only to integers in the bar chart
+
+
+RENDER_WORKERS = 4 #pie, contracts per strike, payoff graph and the PNG download of the payoff graph
+DISPLAY_SAVEFIG = {"bbox_inches": "tight", "dpi": 200} #same PNG as st.pyplot() would encode
+
+_render_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="chart-render")
+
+
+###! ------------------ Asset Breakdown Pie Chart ------------------ ###
+
+def autopct_format(pct, allvals): #? function to show both numbers and percentages
+    absolute = int(round(pct/100.*sum(allvals)))
+    return f"{pct:.1f}%\n({absolute})"
+
+
+def plot_asset_breakdown(sizes, labels, colors):
+    fig = Figure(figsize=(15, 4))
+    ax = fig.subplots()
+    ax.pie(
+        sizes,
+        labels=labels,
+        autopct=lambda pct: autopct_format(pct, sizes),
+        startangle=90,
+        colors=colors,
+        textprops={'fontweight': 'bold'}  #This makes both labels and autopct bold
+    )
+
+    ax.legend(loc="upper left")
+    ax.axis('equal') #makes the pie chart a circle
+    fig.tight_layout()
+    return fig
+
+
+###! ------------------ Contracts per Strike Bar Chart ------------------ ###
+
+def plot_contracts_per_strike(pivot_table_quantities, strikes):
+    pivot_table_quantities = pivot_table_quantities.copy() #rendered on a worker thread, don't touch the caller's table
+    for col in ["Call", "Put"]:
+        if col not in pivot_table_quantities: #ensure both columns exist otherwise set to 0
+            pivot_table_quantities[col] = 0
+
+    fig = Figure(figsize=(15, 4))
+    ax = fig.subplots()
+    x = range(len(strikes))
+
+    bar_width = 0.1
+    call_bars = ax.bar([i - bar_width/2 for i in x], pivot_table_quantities['Call'], width=bar_width, label='Calls', color='cornflowerblue')
+    put_bars = ax.bar([i + bar_width/2 for i in x], pivot_table_quantities['Put'], width=bar_width, label='Puts', color='lightcoral')
+
+    #* add quantities in bars
+    for bar in list(call_bars) + list(put_bars):
+        height = bar.get_height()
+        if height > 0:
+            ax.text(bar.get_x() + bar.get_width()/2, height/2, int(height),
+                    ha='center', va='center', fontsize=10, fontweight='bold', color='black')
+
+    ax.set_xticks(x)
+    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+    ax.set_xticklabels(strikes, fontweight='bold') #? rotation=45 if we want them to be side labels
+    ax.set_ylabel("Number of Contracts", fontweight='bold')
+    ax.set_xlabel("Strike Price", fontweight='bold')
+    ax.set_title("Contracts per Strike", fontweight='bold')
+
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+###! ------------------ X-axis Range (Simulate stock prices) ------------------ ###
+
+def payoff_x_axis(strikes, number_of_ticks=1000):
+    #* Set x-axis range
+    if len(strikes) > 1:
+        distance = (strikes.max() - strikes.min()) * 3 #set distance equal to 2*range for the x-axis prices
+    else:
+        distance = strikes.iloc[0] / 1.5
+
+    min_point = strikes.min() - distance
+    max_point = strikes.max() + distance
+
+    return np.linspace(min_point, max_point, number_of_ticks ) #Simulate stock prices x-axis
+
+
+###! ------------------ Y-axis Range ------------------ ###
+
+def payoff_y_limits(total_p_l):
+    #* set y-axis limits
+    if len(total_p_l) > 1:
+        max_y_lim = 1.2*(abs(total_p_l.max()) + abs(total_p_l.min())) #set maximum range on y so that the graph is symmetrical around y=0
+        min_y_lim = -1.2*(abs(total_p_l.max()) + abs(total_p_l.min())) #set minimum range on y so that the graph is symmetrical around y=0
+    else: #if we only have 1 number in our total P&L set different limits (e.g 1 Option or Straddle)
+        max_y_lim = abs(total_p_l.max()) * 3
+        min_y_lim = abs(total_p_l.max()) * -3
+
+    return min_y_lim, max_y_lim
+
+
+###! ------------------ Plot Expiration Payoff Graph ------------------ ###
+
+def plot_payoff_graph(strikes, total_p_l, total_slopes, breakeven_points, flags, position_text_box):
+    #* Plot
+    fig = Figure(figsize = (20,6)) #set the size of the figure
+    ax = fig.subplots()
+    draw_payoff_graph(ax, strikes, total_p_l, total_slopes, breakeven_points, flags, position_text_box)
+    return fig, ax
+
+
+def draw_payoff_graph(ax, strikes, total_p_l, total_slopes, breakeven_points, flags, position_text_box):
+    #* draws on any Axes: the app's own figure above or a reused report page template (payoff_reports.py)
+    stock_prices = payoff_x_axis(strikes)
+    min_y_lim, max_y_lim = payoff_y_limits(total_p_l)
+
+    #* plot the line below minimum strike
+    x_axis_below = stock_prices[stock_prices <= strikes.min()]
+    line_below_min_strike = total_slopes.iloc[0] * (x_axis_below - strikes.min()) + total_p_l.iloc[0]
+
+    ax.plot(x_axis_below, line_below_min_strike, label = f"Below {strikes.min()}, Slope:{total_slopes.iloc[0]}", c="black", linewidth=1.5)
+
+    #* Plot for each segment between strikes prices we calculate the line
+    for i in range(len(strikes) - 1):
+        condition = (stock_prices >= strikes.iloc[i]) & (stock_prices <= strikes.iloc[i+1])
+        x_range = stock_prices[condition]
+        line = total_slopes.iloc[i+1] * (stock_prices[condition] - strikes[i]) + total_p_l.iloc[i]
+
+        ax.plot(x_range, line, label=f"{strikes.iloc[i]} - {strikes.iloc[i+1]}, Slope:{total_slopes.iloc[i+1]}", c="black", linewidth=1.5)
+
+    #*plot the line above max strike
+    x_axis_above = stock_prices[stock_prices >= strikes.max()]
+    line_above_max_strike = total_slopes.iloc[-1] * (x_axis_above - strikes.max()) + total_p_l.iloc[-1]
+    ax.plot(x_axis_above, line_above_max_strike, label = f"Above {strikes.max()}, Slope:{total_slopes.iloc[-1]}", c="black", linewidth=1.5)
+
+    ax.set_ylim(min_y_lim, max_y_lim) #set the range on y axis so that it is symmetrical around y=0
+
+    #*Place the x-axis in the middle of the graph
+    ax.spines['bottom'].set_position(('data', 0)) #set the bottom spine (x-axis) to the point y=0
+    ax.spines["bottom"].set_linestyle("dashed") #make the x-axis dashed
+    ax.xaxis.set_ticks([]) #remove values from the x-axis
+    ax.spines["left"].set_linestyle("dashed") #make the y-axis dashed
+    ax.yaxis.set_ticks([0]) #show only the 0 as value in the y-axis
+    ax.spines["top"].set_visible(False) #hide the top border
+    ax.spines["right"].set_visible(False) #hide the right border
+
+    #!plot the breakeven points
+    if flags["single_call_flag"] or flags["single_put_flag"] or flags["straddle_flag"] or flags["strangle_flag"] or flags["butterfly_flag"]:
+        for i in range(len(breakeven_points)):
+            ax.plot(breakeven_points[i], 0, marker = "o", color="black")
+            ax.annotate(f"BE Point: \n{round(breakeven_points[i],2)}", [breakeven_points[i],0], [breakeven_points[i], max_y_lim/8], weight='bold', fontsize=8, horizontalalignment="center", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3"))
+    elif flags["condor_flag"]:
+        for i in range(len(breakeven_points)):
+            ax.plot(breakeven_points[i], 0, marker = "o", color="black")
+            ax.annotate(f"BE Point: \n{round(breakeven_points[i],2)}", [breakeven_points[i],0], [breakeven_points[i], max_y_lim/8], weight='bold', fontsize=8, horizontalalignment="center", color="black", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3"))
+    elif flags["call_ratio_flag"] or flags["put_ratio_flag"] or flags["call_christmass_tree_flag"] or flags["put_christmass_tree_flag"]:
+        for i in range(len(breakeven_points)):
+            ax.plot(breakeven_points[i], 0, marker = "o", color="black")
+            ax.annotate(f"BE Point: \n{round(breakeven_points[i],2)}", [breakeven_points[i],0], [breakeven_points[i], max_y_lim/10], weight='bold', fontsize=8, horizontalalignment="center", color="black", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3"))
+    else:
+        for i in range(len(breakeven_points)):
+            ax.plot(breakeven_points[i], 0, marker = "o", color="black")
+            ax.annotate(f"BE Point at: \n{round(breakeven_points[i],2)}", [breakeven_points[i],0], [breakeven_points[i], 3], arrowprops = dict(width=0.03, color="black", shrink=0.1), weight='bold', fontsize=8)
+
+    #* Plot P&L at Strike Prices
+    for i in range(len(strikes)):
+        if total_p_l.iloc[i] < 0: #negative P&L
+            ax.text(strikes.iloc[i], total_p_l.iloc[i] + max_y_lim/10, f"{round(total_p_l.iloc[i],2)}€", weight="bold", horizontalalignment = "center", color="firebrick", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3")) # if P&L is negative, give a red color
+        elif total_p_l.iloc[i] > 0: #positive P&L
+            ax.text(strikes.iloc[i], total_p_l.iloc[i] + max_y_lim/10, f"{round(total_p_l.iloc[i],2)}€", weight="bold", horizontalalignment = "center", color="green", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3")) #if P&L is positive, give a green color
+        else: #0 P&L
+            ax.text(strikes.iloc[i], total_p_l.iloc[i], f"{round(total_p_l.iloc[i],2)}€", weight="bold", horizontalalignment = "center", color="dimgray", bbox=dict(facecolor="white", edgecolor="none", alpha=0.7, boxstyle="round,pad=0.3")) #if P&L is positive, give a green color
+
+    #* Plot the option position text in the top left of the graph
+    ax.text(stock_prices.min(), max_y_lim, position_text_box, horizontalalignment="left", verticalalignment="top", fontsize=12)
+
+    #* add graph title and axis titles
+    if flags["option_position"] != "":
+        ax.set_title(f"Option Position Parity Graph ({flags['option_position']})", c="black", weight="bold")
+    else:
+        ax.set_title("Option Position Parity Graph", c="black", weight="bold")
+    ax.set_xlabel("Stock Price", loc = "right", c="black", weight="bold")
+    ax.set_ylabel("Payoff at Expiration", c="black", weight="bold")
+
+    #* plot dashed vertical lines at the strike prices and the strike prices at the bottom of the graph
+    for i in strikes:
+        ax.axvline(i, min_y_lim, max_y_lim, ls="dashed", color="gray", linewidth = 0.7)
+        ax.text(i, min_y_lim, i, horizontalalignment = "center", weight="bold")
+
+    return ax
+
+
+###! ------------------ Render to PNG (Thread Pool) ------------------ ###
+
+def render_png(fig, clear=True, **savefig_kwargs):
+    #* encode and release the figure right away: nothing keeps a reference to it (no pyplot figure manager)
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", **savefig_kwargs)
+    if clear:
+        fig.clear()
+    return buf.getvalue()
+
+
+def asset_breakdown_png(sizes, labels, colors):
+    return render_png(plot_asset_breakdown(sizes, labels, colors), **DISPLAY_SAVEFIG)
+
+
+def contracts_per_strike_png(pivot_table_quantities, strikes):
+    return render_png(plot_contracts_per_strike(pivot_table_quantities, strikes), **DISPLAY_SAVEFIG)
+
+
+def payoff_graph_png(strikes, total_p_l, total_slopes, breakeven_points, flags, position_text_box):
+    fig, ax = plot_payoff_graph(strikes, total_p_l, total_slopes, breakeven_points, flags, position_text_box)
+    ax.legend(loc="upper right")
+    fig.tight_layout()
+    return render_png(fig, **DISPLAY_SAVEFIG)
+
+
+def payoff_graph_pngs(strikes, total_p_l, total_slopes, breakeven_points, flags, position_text_box):
+    #* (display PNG, download PNG) from 1 drawing: the download is the plain graph, saved before the slopes legend is added
+    fig, ax = plot_payoff_graph(strikes, total_p_l, total_slopes, breakeven_points, flags, position_text_box)
+    download = render_png(fig, clear=False)
+    ax.legend(loc="upper right")
+    fig.tight_layout()
+    return render_png(fig, **DISPLAY_SAVEFIG), download
+
+
+def submit_render(function, *args, **kwargs):
+    #* every job builds its own Figure, so the jobs share no matplotlib state
+    return _render_pool.submit(function, *args, **kwargs)
@@ -0,0 +1,493 @@
+### ------------------ Import Libraries ------------------ ###
+import numpy as np
+import pandas as pd
+
+from performance import StageTimer
+from payoff_kernels import strike_profit_loss, strike_interval_slopes, breakeven_scan, evaluate_piecewise
+
+
+#* Columns of every leg DataFrame built from the session state inputs
+LEG_COLUMNS = ["Type", "Strike", "Quantity", "Action", "Cost"]
+
+#* P&L values closer to 0 than this are treated as exactly 0 (float noise from summing prices with 2 decimals)
+PNL_TOLERANCE = 1e-9
+
+
+###! ------------------ Portfolio Summaries of every Asset Type in 1 Pass ------------------ ###
+
+def asset_statistics(*portfolios):
+    #* 1 pass over all the legs of the given portfolios: quantity weighted bought / sold / net and cash flows per asset type
+    #* (amount paid / received = Σ quantity · cost of the bought / sold legs), {} for asset types without legs
+    portfolios = [portfolio for portfolio in portfolios if not portfolio.empty]
+    if not portfolios:
+        return {}
+
+    asset_types, type_index = np.unique(np.concatenate([portfolio["Type"].to_numpy(dtype=str) for portfolio in portfolios]), return_inverse=True)
+    quantity = np.concatenate([portfolio["Quantity"].to_numpy() for portfolio in portfolios])
+    cost = np.concatenate([portfolio["Cost"].to_numpy(dtype=float) for portfolio in portfolios])
+    bought = np.concatenate([(portfolio["Action"] == "Buy").to_numpy() for portfolio in portfolios])
+
+    #* bins: (asset type, bought) -> 2 * type + bought
+    bins = 2 * type_index + bought
+    size = 2 * len(asset_types)
+    quantities = np.bincount(bins, weights=quantity, minlength=size).reshape(-1, 2)
+    amounts = np.bincount(bins, weights=quantity * cost, minlength=size).reshape(-1, 2)
+    if np.issubdtype(quantity.dtype, np.integer): #keep whole contracts as integers for the summaries
+        quantities = quantities.astype(quantity.dtype)
+
+    statistics = {}
+    for row, asset_type in enumerate(asset_types):
+        assets_sold, assets_bought = quantities[row]
+        amount_received, amount_paid = amounts[row]
+        statistics[str(asset_type)] = {
+            "assets_bought": assets_bought,
+            "assets_sold": assets_sold,
+            "net_assets": assets_bought - assets_sold,
+            "amount_paid": amount_paid,
+            "amount_received": amount_received,
+            "net_amount": amount_received - amount_paid,
+            "asset_type": str(asset_type),
+        }
+    return statistics
+
+
+def portfolio_statistics(portfolio):
+    #* summary of a single asset type portfolio (all its legs have the same type)
+    return asset_statistics(portfolio).get(portfolio["Type"].iloc[0], {}) if not portfolio.empty else {}
+
+
+###! ------------------ Net the Legs before any Payoff Calculation ------------------ ###
+
+def compress_legs(portfolio):
+    #* net every (type, strike) into 1 leg: position = Σ ±quantity, cost = position weighted average of the costs
+    #* Σ position_i · (payoff - cost_i) = position · (payoff - cost) so the expiration payoff is unchanged
+    if portfolio.empty:
+        return portfolio.copy(), 0.0
+
+    position = portfolio["Quantity"] * portfolio["Action"].map({"Buy":1, "Sell":-1})
+    legs = pd.DataFrame({
+        "Type": portfolio["Type"],
+        "Strike": portfolio["Strike"],
+        "Position": position,
+        "Cash": position * portfolio["Cost"], #premium paid (+) or received (-)
+    })
+    netted = legs.groupby(["Type", "Strike"], as_index=False, sort=True)[["Position", "Cash"]].sum()
+
+    #* legs that cancel out (net position 0) leave only the premium difference as a locked-in P&L
+    closed = netted["Position"] == 0
+    locked_p_l = -float(netted.loc[closed, "Cash"].sum())
+    netted = netted[~closed]
+
+    compressed = pd.DataFrame({
+        "Type": netted["Type"].to_numpy(),
+        "Strike": netted["Strike"].to_numpy(),
+        "Quantity": netted["Position"].abs().to_numpy(),
+        "Action": np.where(netted["Position"] > 0, "Buy", "Sell"),
+        "Cost": (netted["Cash"] / netted["Position"]).to_numpy(),
+    }, columns=LEG_COLUMNS)
+
+    return compressed, locked_p_l
+
+
+def compression_report(raw_portfolios, netted_portfolios, locked_p_l):
+    raw_legs = sum(len(portfolio) for portfolio in raw_portfolios)
+    netted_legs = sum(len(portfolio) for portfolio in netted_portfolios)
+
+    return {
+        "raw_legs": raw_legs,
+        "netted_legs": netted_legs,
+        "ratio": raw_legs / netted_legs if netted_legs else (np.inf if raw_legs else 1.0),
+        "locked_p_l": locked_p_l,
+    }
+
+
+###! ------------------ Define Total Portfolio ------------------ ###
+
+def build_total_portfolio(call_portfolio, put_portfolio):
+    total_portfolio = pd.DataFrame(columns=call_portfolio.columns)
+
+    if not call_portfolio.empty:
+        total_portfolio = pd.concat([total_portfolio, call_portfolio], ignore_index=True)
+
+    if not put_portfolio.empty:
+        total_portfolio = pd.concat([total_portfolio, put_portfolio], ignore_index=True)
+
+    return total_portfolio
+
+
+###! ------------------ Calculate Total Option Portfolio Metrics ------------------ ###
+
+def add_positions(total_portfolio):
+    #* Change Buy / Sell to 1 / -1
+    mapped_action = total_portfolio["Action"].map({"Buy":1, "Sell":-1}) #map Buy to 1 and Sell to -1
+    mapped_type = total_portfolio["Type"].map({"Call":1, "Put":-1}) #map Call to 1 and Put to -1
+
+    #* Create Total Position for each option position
+    total_portfolio["Position"] = total_portfolio["Quantity"] * mapped_action
+    total_portfolio["Position_Slope"] = total_portfolio["Position"] * mapped_type
+
+    #Get the different strike prices
+    strikes = total_portfolio["Strike"].sort_values().unique()
+    strikes = pd.Series(strikes)
+
+    return strikes
+
+
+###! ------------------ New Columns for the DataFrame based on strike price intervals  ------------------ ###
+
+def interval_columns(strikes):
+    columns = [] #we will (add number of strike prices + 1) columns | Below 95, 95-105, Above 105
+
+    if len(strikes) > 0:
+        columns.append(f"Below {min(strikes)}") #below minimum strike
+        for i in range(1, len(strikes)):
+            columns.append(f"{strikes[i-1]} - {strikes[i]}") #e.g 95 - 105
+        columns.append(f"Above {max(strikes)}") #above max strike
+
+    return columns
+
+
+###! ------------------ Slopes in the strike intervals (options ITM / OTM) ------------------ ###
+
+def leg_arrays(total_portfolio):
+    #* plain float arrays of the legs for the payoff kernels
+    return (
+        total_portfolio["Strike"].to_numpy(dtype=float),
+        (total_portfolio["Type"] == "Call").to_numpy(),
+        total_portfolio["Position"].to_numpy(dtype=float),
+    )
+
+
+def interval_slopes(total_portfolio, strikes, underlying_position=0):
+    #* a call adds its position to the slope of every interval above its strike, a put subtracts it below its strike,
+    #* and the underlying position adds its slope to every interval
+    leg_strikes, leg_calls, leg_positions = leg_arrays(total_portfolio)
+    slopes = strike_interval_slopes(leg_strikes, leg_calls, leg_positions, strikes.to_numpy(dtype=float), underlying_position)
+    return pd.Series(slopes, index=interval_columns(strikes))
+
+
+###! ------------------ Calculate Total Option P&Ls at each strike price ------------------ ###
+
+def option_profit_loss(total_portfolio, strikes):
+    #* P&L of every leg at every strike price: (ITM amount - cost) * position, the ITM amount is 0 when the option is OTM
+    leg_strikes, leg_calls, leg_positions = leg_arrays(total_portfolio)
+    p_l = strike_profit_loss(leg_strikes, leg_calls, leg_positions, total_portfolio["Cost"].to_numpy(dtype=float), strikes.to_numpy(dtype=float))
+    return pd.Series(p_l, index=strikes)
+
+
+###! ------------------ Calculate Underlying Portfolio P&L at the Strike Prices ------------------ ###
+
+def underlying_profit_loss(underlying_portfolio, strikes):
+    #* P&L of every underlying leg at every strike price: (strike - cost) * position, summed over the legs
+    #!!! WE ASSUME THAT THE STRIKE PRICE WILL BE THE UNDERLYING PRICE AT MATURITY !!!#
+    if underlying_portfolio.empty:
+        return pd.Series(0.0, index = strikes)
+
+    positions = (underlying_portfolio["Quantity"] * underlying_portfolio["Action"].map({"Buy":1, "Sell":-1})).to_numpy(dtype=float)
+    costs = underlying_portfolio["Cost"].to_numpy(dtype=float)
+    strike_prices = strikes.to_numpy(dtype=float)
+
+    #* (strikes, legs) matrix in 1 broadcast, no column per strike
+    return pd.Series(((strike_prices[:, None] - costs[None, :]) * positions[None, :]).sum(axis=1), index = strikes)
+
+
+###! ------------------ Break-even Points & Check for Option Position Type ------------------ ###
+
+def count_sign_changes(total_p_l):
+    #np.sign() will give +- 1 depending if the value is positive or negative
+    signs = np.sign(total_p_l)
+
+    #np.diff() will take the difference of i+1 - i each time. We have a sign change when the difference is different from 0 --> If the difference is 0 it means both P&Ls were the same sign
+    sign_changes = np.diff(signs)
+
+    return np.count_nonzero(sign_changes)
+
+
+def quantities_pivot(total_portfolio):
+    #* create pivot table to calculate call and put quantities per strike
+    return total_portfolio.pivot_table(
+            index="Strike", columns="Type", values="Quantity", aggfunc="sum", fill_value=0
+            )
+
+
+##! ------------------ Check for Options Position Types ------------------ ###
+
+def classify_position(total_portfolio, strikes, pivot_table_quantities, call_stats, put_stats, underlying_empty):
+    #* Volatility Spread Flags
+    flags = {
+        "option_position": "",
+        "single_call_flag": False,
+        "single_put_flag": False,
+        "straddle_flag": False,
+        "strangle_flag": False,
+        "butterfly_flag": False,
+        "condor_flag": False,
+        "call_ratio_flag": False,
+        "put_ratio_flag": False,
+        "call_christmass_tree_flag": False,
+        "put_christmass_tree_flag": False,
+        "equally_spaced_strikes_flag": False, #Flag to check if all strike prices are equally spaced between them
+    }
+
+    options_bought = 0
+    options_sold = 0
+
+    if "Call" in total_portfolio["Type"].values:
+        total_call_quantity = pivot_table_quantities["Call"].sum() #this returns a scalar with the total quantity of calls
+        options_bought += call_stats["assets_bought"]
+        options_sold += call_stats["assets_sold"]
+
+    if "Put" in total_portfolio["Type"].values:
+        total_put_quantity = pivot_table_quantities["Put"].sum() #this returns a scalar with the total quantity of puts
+        options_bought += put_stats["assets_bought"]
+        options_sold += put_stats["assets_sold"]
+
+    if len(strikes) > 1:
+        strike_differences = pivot_table_quantities.index.sort_values().diff()[1:]
+        flags["equally_spaced_strikes_flag"] = (strike_differences == strike_differences[0]).all()
+
+    if not underlying_empty:
+        return flags
+
+    number_of_types = total_portfolio["Type"].nunique()
+    first_type = total_portfolio["Type"].iloc[0] #we only have Call / Put in our "Type" column. So we only need to check the first element
+
+    #* 1 strike price - Both Calls and Puts
+    if len(strikes) == 1: #If we have only 1 strike price
+        if number_of_types == 2: # and both calls and puts in our total portfolio
+            #* Check for Straddle
+            if total_call_quantity == total_put_quantity:
+                flags["straddle_flag"] = True
+                flags["option_position"] = "Straddle"
+
+        elif number_of_types == 1: #If we only have 1 type of option (single option)
+            #* Check for naked call
+            if first_type == "Call" and (options_bought == 0 or options_sold == 0):
+                flags["single_call_flag"] = True
+                flags["option_position"] = "Naked Call"
+            elif first_type == "Put" and (options_bought == 0 or options_sold == 0):
+                #* check for naked put
+                flags["single_put_flag"] = True
+                flags["option_position"] = "Naked Put"
+
+    #* 2 Strikes
+    if len(strikes) == 2: #If we have 2 strikes
+        if number_of_types == 2: #And both calls and puts in our total portfolio
+            #* Check for Strangle
+            if options_bought != options_sold and (options_bought == 0 or options_sold == 0):
+                flags["strangle_flag"] = True
+                flags["option_position"] = "Strangle"
+
+        elif number_of_types == 1: #If we have only calls or only puts (ratio spreads)
+            if  options_bought != options_sold:
+                if first_type == "Call":
+                    flags["call_ratio_flag"] = True
+                    flags["option_position"] = "Call Ratio"
+                else:
+                    flags["put_ratio_flag"] = True
+                    flags["option_position"] = "Put Ratio"
+
+    #* 3 Strikes - only Calls or only Puts - equally spaced strikes
+    if len(strikes) == 3 and number_of_types == 1:
+        #* Check for Butterfly
+        if (options_bought == options_sold) and flags["equally_spaced_strikes_flag"]:
+            flags["butterfly_flag"] = True
+            flags["option_position"] = "Butterfly"
+
+        #*check for christmass tree
+        elif options_bought != options_sold and options_bought > 0 and (options_sold / options_bought == 2 or options_sold / options_bought == 0.5): #we buy (sell) 1 at lower strike price and sell(buy) 2 at 2 higher strike prices
+            if first_type == "Call":
+                flags["call_christmass_tree_flag"] = True
+                flags["option_position"] = "Call Christmass Tree"
+            else:
+                flags["put_christmass_tree_flag"] = True
+                flags["option_position"] = "Put Christmass Tree"
+
+    #* 4 Strikes - only Calls or Puts - equally spaced strikes
+    if len(strikes) == 4 and number_of_types == 1:
+        #* Check for Condor
+        if options_bought == options_sold and strike_differences[0] == strike_differences[-1]:
+            flags["condor_flag"] = True
+
+    return flags
+
+
+###! ------------------ Calculate Breakeven Points (BE Points) ------------------ ###
+
+def compute_breakeven_points(strikes, total_p_l, total_slopes):
+    #* The expiration payoff is piecewise linear: it is known at every strike (total_p_l) and has slope
+    #* total_slopes.iloc[i] on the interval left of strikes[i] (iloc[0] below the min strike, iloc[-1] above the max strike):
+    #* roots in the 2 tails, at strikes with a 0 P&L and between 2 strikes where the P&L changes sign
+    return [float(point) for point in breakeven_scan(strikes, total_p_l, total_slopes)]
+
+
+###! ------------------ Maximum Profit / Loss of the Payoff ------------------ ###
+
+def tail_metrics(strikes, total_p_l, total_slopes):
+    p_l = np.asarray(total_p_l, dtype=float)
+    downside_slope = float(total_slopes.iloc[0]) #slope below the minimum strike
+    upside_slope = float(total_slopes.iloc[-1]) #slope above the maximum strike
+
+    #* a piecewise linear payoff has its extremes at the strikes unless a tail slope keeps going
+    max_profit = np.inf if (upside_slope > 0 or downside_slope < 0) else float(p_l.max())
+    max_loss = -np.inf if (upside_slope < 0 or downside_slope > 0) else float(p_l.min())
+
+    return {
+        "max_profit": max_profit,
+        "max_loss": max_loss,
+        "downside_slope": downside_slope,
+        "upside_slope": upside_slope,
+        "unlimited_downside_risk": downside_slope > 0, #losing money without limit as the price falls
+        "unlimited_upside_risk": upside_slope < 0, #losing money without limit as the price rises
+    }
+
+
+###! ------------------ Payoff at Arbitrary Prices ------------------ ###
+
+class PayoffEvaluator:
+    #* Piecewise linear payoff prepared once from the strike vertices so that any array of prices
+    #* (tick data, simulated paths...) is evaluated with a binary search + 1 multiply-add per price
+
+    def __init__(self, strikes, total_p_l, total_slopes):
+        self.strikes = np.ascontiguousarray(strikes, dtype=float) #S sorted strike prices (vertices)
+        p_l = np.asarray(total_p_l, dtype=float)
+        self.slopes = np.ascontiguousarray(total_slopes, dtype=float) #S + 1 slopes, one per strike interval
+
+        #* searchsorted(strikes, price, "right") gives the interval k of each price (0 = below the min strike)
+        #* interval k is anchored at vertex k - 1 (vertex 0 for the lowest interval): P&L = intercept[k] + slope[k] * price
+        anchor = np.maximum(np.arange(len(self.strikes) + 1) - 1, 0)
+        self.intercepts = p_l[anchor] - self.slopes * self.strikes[anchor]
+
+    @classmethod
+    def from_result(cls, portfolio_result):
+        return cls(portfolio_result["strikes"], portfolio_result["total_p_l"], portfolio_result["total_slopes"])
+
+    def interval(self, prices):
+        return np.searchsorted(self.strikes, prices, side="right")
+
+    def evaluate(self, prices, out=None):
+        #* out = slope[k] * price + intercept[k], written into the caller's buffer when one is given
+        return evaluate_piecewise(self.strikes, self.slopes, self.intercepts, prices, out=out)
+
+    def __call__(self, price):
+        #* single price: no array allocation at all
+        k = int(np.searchsorted(self.strikes, price, side="right"))
+        return float(self.intercepts[k] + self.slopes[k] * price)
+
+
+###! ------------------ Consolidate DataFrames to remove duplicate entries and use for Position Text Box ------------------ ###
+
+def group_options(total_portfolio):
+    options = total_portfolio.copy()
+
+    options_group_cols = ["Type", "Strike", "Cost"] #*assign the columns based on which we will group by
+    #as_index = False to return the dataframe with the columns it had instead of a Multiindex
+    options_grouped = options.groupby(options_group_cols, as_index=False)
+    # .agg() applies sum() in the position column
+    options_grouped = options_grouped.agg({"Position" : "sum"})
+    #remove any canceled out positions (net position 0) from opposite user inputs
+    return options_grouped[options_grouped["Position"] != 0]
+
+
+def position_text(options_grouped):
+    #* Create Text Box with the full Position to Plot on the top left of the Graph
+    position_text_box = ""
+
+    for index, row in options_grouped.iterrows(): #? iterrows returns a tuple (index, row). Index is the rows index value and row a Series with the columns and their values for that row
+        pos = row["Position"]
+        strike  = row["Strike"]
+        opt_type = row["Type"]
+        cost = row["Cost"]
+
+        if pos > 0:
+            position_text_box += f"+{pos} {strike:.1f} {opt_type} -{cost:.2f}  \n"
+        else:
+            position_text_box += f"{pos} {strike:.1f} {opt_type} {cost:.2f}  \n"
+
+    return position_text_box
+
+
+###! ------------------ Run the Full Payoff Pipeline ------------------ ###
+
+def evaluate_portfolio(call_portfolio, put_portfolio, underlying_portfolio, timer=None):
+    timer = StageTimer() if timer is None else timer #disabled timer by default
+
+    with timer.stage("Portfolio statistics"):
+        statistics = asset_statistics(call_portfolio, put_portfolio, underlying_portfolio)
+        call_stats = statistics.get("Call", {})
+        put_stats = statistics.get("Put", {})
+        underlying_stats = statistics.get("Underlying Contract", {})
+
+    #* net the raw fills first so that every stage below scales with the distinct (type, strike) legs
+    with timer.stage("Leg netting"):
+        netted_calls, call_locked_p_l = compress_legs(call_portfolio)
+        netted_puts, put_locked_p_l = compress_legs(put_portfolio)
+        netted_underlyings, underlying_locked_p_l = compress_legs(underlying_portfolio)
+        compression = compression_report(
+            [call_portfolio, put_portfolio, underlying_portfolio],
+            [netted_calls, netted_puts, netted_underlyings],
+            call_locked_p_l + put_locked_p_l + underlying_locked_p_l,
+        )
+
+    total_portfolio = build_total_portfolio(netted_calls, netted_puts)
+
+    result = {
+        "call_stats": call_stats,
+        "put_stats": put_stats,
+        "underlying_stats": underlying_stats,
+        "compression": compression,
+        "total_portfolio": total_portfolio,
+    }
+
+    if total_portfolio.empty:
+        return result
+
+    with timer.stage("Slope table"):
+        strikes = add_positions(total_portfolio)
+
+        #* Total Slopes for each strike price interval adjusted by the underlying position
+        total_slopes = interval_slopes(total_portfolio, strikes, underlying_stats.get("net_assets", 0))
+
+    with timer.stage("Strike P&L"):
+        #* legs that netted to a 0 position still locked in the premium difference
+        option_p_l = option_profit_loss(total_portfolio, strikes) + call_locked_p_l + put_locked_p_l
+
+    with timer.stage("Underlying P&L"):
+        if not netted_underlyings.empty:
+            total_p_l = option_p_l + underlying_profit_loss(netted_underlyings, strikes) + underlying_locked_p_l
+        else:
+            total_p_l = option_p_l + underlying_locked_p_l
+
+    with timer.stage("Pivot table"):
+        pivot_table_quantities = quantities_pivot(total_portfolio)
+
+    with timer.stage("Classification"):
+        #* classify the netted position (a bought and a sold leg at the same strike are no position at all)
+        netted_stats = asset_statistics(netted_calls, netted_puts)
+        flags = classify_position(total_portfolio, strikes, pivot_table_quantities, netted_stats.get("Call", {}), netted_stats.get("Put", {}), netted_underlyings.empty)
+
+    with timer.stage("Breakevens"):
+        p_l_sign_changes = count_sign_changes(total_p_l)
+        breakeven_points = compute_breakeven_points(strikes, total_p_l, total_slopes)
+        tails = tail_metrics(strikes, total_p_l, total_slopes)
+
+    with timer.stage("Netting & position text"):
+        options_grouped = group_options(total_portfolio)
+        position_text_box = position_text(options_grouped)
+
+    result.update({
+        "total_portfolio": total_portfolio,
+        "strikes": strikes,
+        "total_slopes": total_slopes,
+        "option_p_l": option_p_l,
+        "total_p_l": total_p_l,
+        "pivot_table_quantities": pivot_table_quantities,
+        "flags": flags,
+        "p_l_sign_changes": p_l_sign_changes,
+        "breakeven_points": breakeven_points,
+        "tail_metrics": tails,
+        "payoff_evaluator": PayoffEvaluator(strikes, total_p_l, total_slopes),
+        "options_grouped": options_grouped,
+        "position_text_box": position_text_box,
+    })
+    return result
@@ -0,0 +1,148 @@
+### ------------------ Payoff Data Export (Parquet / Arrow / CSV) ------------------ ###
+#* The numbers behind the payoff graph for downstream risk systems, taken from the cached payoff pipeline result:
+#*  - vertices:    strike vertices and the P&L at each of them (strikes, total_p_l)
+#*  - slopes:      the S + 1 strike intervals with their slope and intercept (P&L = intercept + slope · price)
+#*  - breakevens:  breakeven prices
+#*  - netted legs: the netted option legs (options_grouped)
+#* + any scenario table of the app (simulated hedge paths, backtest outcomes...).
+#* Parquet and Arrow IPC need pyarrow (optional); their bytes are cached with the tables they were built from (1 export
+#* group per source object, kept by the caller), so a second download of an unchanged book never re-encodes it. CSV is always available and streamed in chunks of rows
+#* into an unbuffered temporary file, so a large scenario table is never converted to 1 CSV string in memory.
+#* Run from the repository root: python payoff_export.py --template iron_condor --table slopes --format csv --out slopes.csv
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import io
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: #optional, only CSV exports without it
+    pa = pq = None
+
+
+CSV_CHUNK_ROWS = 50_000
+EXPORT_MIMES = {"Parquet": "application/vnd.apache.parquet", "Arrow": "application/vnd.apache.arrow.file", "CSV": "text/csv"}
+EXPORT_EXTENSIONS = {"Parquet": "parquet", "Arrow": "arrow", "CSV": "csv"}
+
+
+def export_formats():
+    #* the formats this environment can write, columnar first
+    return ("Parquet", "Arrow", "CSV") if pa is not None else ("CSV",)
+
+
+###! ------------------ Tables of the Payoff Pipeline Result ------------------ ###
+
+def payoff_tables(portfolio_result):
+    #* name -> DataFrame of the pipeline result (the result itself is left untouched, it may be shared)
+    evaluator = portfolio_result["payoff_evaluator"]
+    strikes = evaluator.strikes
+    tables = {
+        "vertices": pd.DataFrame({"Strike": strikes, "P&L": np.asarray(portfolio_result["total_p_l"], dtype=float)}),
+        "slopes": pd.DataFrame({
+            "From": np.concatenate([[-np.inf], strikes]), #interval k covers [strike k - 1, strike k)
+            "To": np.concatenate([strikes, [np.inf]]),
+            "Slope": evaluator.slopes,
+            "Intercept": evaluator.intercepts,
+        }),
+        "breakevens": pd.DataFrame({"Breakeven": np.asarray(portfolio_result["breakeven_points"], dtype=float)}),
+        "netted legs": portfolio_result["options_grouped"].reset_index(drop=True),
+    }
+    return tables
+
+
+def export_group(groups, group, source, build_tables):
+    #* the tables of 1 source object (a pipeline result, a scenario result...) and their encoded files, kept in `groups`
+    #* the tables are built once per source object: a new source replaces them and drops the files of the previous one
+    entry = groups.get(group)
+    if entry is None or entry["source"] is not source:
+        entry = groups[group] = {"source": source, "tables": build_tables(source), "files": {}}
+    return entry
+
+
+###! ------------------ Encoders ------------------ ###
+
+def columnar_bytes(frame, file_format):
+    #* Parquet or Arrow IPC (file format) bytes of a DataFrame
+    if pa is None:
+        raise ImportError(f"{file_format} exports need pyarrow (pip install pyarrow), use CSV instead")
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = io.BytesIO()
+    if file_format == "Parquet":
+        pq.write_table(table, sink)
+    else:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue()
+
+
+def iter_csv(frame, chunk_rows=CSV_CHUNK_ROWS):
+    #* CSV bytes in chunks of rows (the header with the first chunk)
+    for start in range(0, max(len(frame), 1), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows].to_csv(index=False, header=start == 0).encode()
+
+
+def csv_file(frame, chunk_rows=CSV_CHUNK_ROWS):
+    #* rewound temporary file with the CSV of the frame (raw file: st.download_button reads it like any io.RawIOBase)
+    file = tempfile.TemporaryFile(buffering=0)
+    for chunk in iter_csv(frame, chunk_rows):
+        file.write(chunk)
+    file.seek(0)
+    return file
+
+
+def cached_export(entry, name, file_format):
+    #* data of the table `name` of an export group in `file_format`; columnar bytes are cached in the group
+    frame = entry["tables"][name]
+    if file_format == "CSV":
+        return csv_file(frame)
+
+    files = entry["files"]
+    if (name, file_format) not in files:
+        files[(name, file_format)] = columnar_bytes(frame, file_format)
+    return files[(name, file_format)]
+
+
+def export_file_name(name, file_format):
+    return f"payoff_{name.lower().replace(' ', '_')}.{EXPORT_EXTENSIONS[file_format]}"
+
+
+def main():
+    from benchmarks.synthetic_books import book_frames, template_book
+    from payoff_engine import evaluate_portfolio
+
+    parser = argparse.ArgumentParser(description="Export the payoff tables of a template book")
+    parser.add_argument("--template", default="iron_condor", help="strategy template of benchmarks.synthetic_books")
+    parser.add_argument("--table", default="vertices", help="vertices, slopes, breakevens or netted legs")
+    parser.add_argument("--format", default="csv", choices=[name.lower() for name in EXPORT_MIMES])
+    parser.add_argument("--out", default=None, help="output file (CSV goes to stdout without it)")
+    args = parser.parse_args()
+
+    file_format = {name.lower(): name for name in EXPORT_MIMES}[args.format]
+    entry = export_group({}, "payoff", evaluate_portfolio(*book_frames(template_book(args.template))), payoff_tables)
+    frame = entry["tables"][args.table]
+    data = cached_export(entry, args.table, file_format)
+
+    if args.out is None:
+        if file_format != "CSV":
+            parser.error(f"{file_format} is binary, please give an --out file")
+        shutil.copyfileobj(data, sys.stdout.buffer)
+        return
+
+    with open(args.out, "wb") as file:
+        if file_format == "CSV":
+            shutil.copyfileobj(data, file)
+        else:
+            file.write(data)
+    print(f"{args.table}: {len(frame)} rows -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+### ------------------ Payoff Kernels (NumPy, or Numba when installed) ------------------ ###
+#* The inner loops of the payoff engine on plain float arrays:
+#*  - strike_profit_loss(): option P&L at every strike
+#*  - strike_interval_slopes(): slope of every strike interval (below the min strike ... above the max strike)
+#*  - breakeven_scan(): roots of the piecewise linear payoff
+#*  - evaluate_piecewise(): payoff at arbitrary prices from the strikes, slopes and intercepts
+#* Both backends add the legs in the same order, so they give bit-identical results.
+#* Numba is picked automatically when it is installed; OPTION_PAYOFF_KERNELS=numpy forces the NumPy fallback.
+#* Compiled kernels are cached on disk (cache=True), so only the very first run pays the compilation.
+
+### ------------------ Import Libraries ------------------ ###
+import os
+import warnings
+
+import numpy as np
+
+try:
+    import numba
+except ImportError: #optional, the NumPy kernels are used instead
+    numba = None
+
+
+KERNEL_ENV_VAR = "OPTION_PAYOFF_KERNELS" #"numpy" or "numba" (default: numba if installed)
+
+#* P&L values closer to 0 than this are treated as exactly 0 (same tolerance as payoff_engine.PNL_TOLERANCE)
+ZERO_TOLERANCE = 1e-9
+
+
+###! ------------------ NumPy Kernels ------------------ ###
+
+def _strike_profit_loss_numpy(leg_strikes, leg_calls, leg_positions, leg_costs, strikes):
+    p_l = np.zeros(len(strikes))
+    for j in range(len(leg_strikes)): #1 vector operation per leg (over all strikes), legs added in order
+        if leg_calls[j]:
+            intrinsic = np.maximum(strikes - leg_strikes[j], 0.0)
+        else:
+            intrinsic = np.maximum(leg_strikes[j] - strikes, 0.0)
+        p_l += (intrinsic - leg_costs[j]) * leg_positions[j]
+    return p_l
+
+
+def _strike_interval_slopes_numpy(leg_strikes, leg_calls, leg_positions, strikes, underlying_position):
+    #* a call adds its position to every interval above its strike, a put subtracts it from every interval up to its strike
+    #* 2 updates per leg, scattered in leg order: (call: right of its strike, +0 at 0) | (put: -position at 0, +position right of its strike)
+    right_of_strike = np.searchsorted(strikes, leg_strikes) + 1
+    indices = np.column_stack([np.where(leg_calls, right_of_strike, 0), np.where(leg_calls, 0, right_of_strike)]).ravel()
+    updates = np.column_stack([np.where(leg_calls, leg_positions, -leg_positions), np.where(leg_calls, 0.0, leg_positions)]).ravel()
+
+    changes = np.zeros(len(strikes) + 2)
+    np.add.at(changes, indices, updates)
+    return np.cumsum(changes[:-1]) + underlying_position
+
+
+def _breakeven_scan_numpy(strikes, p_l, slopes):
+    p_l = np.where(np.abs(p_l) <= ZERO_TOLERANCE, 0.0, p_l)
+    n = len(strikes)
+
+    #* every root gets an order key: left tail -1, zero at strike i 2i, crossing between i and i + 1 2i + 1, right tail 2n
+    zero = np.flatnonzero(p_l == 0)
+    crossing = np.flatnonzero(p_l[:-1] * p_l[1:] < 0)
+    keys = [2 * zero, 2 * crossing + 1]
+    roots = [strikes[zero], strikes[crossing] - p_l[crossing] / slopes[crossing + 1]]
+
+    if p_l[0] != 0 and slopes[0] != 0 and np.sign(p_l[0]) == np.sign(slopes[0]):
+        keys.append(np.array([-1]))
+        roots.append(np.array([strikes[0] - p_l[0] / slopes[0]]))
+    if p_l[-1] != 0 and slopes[-1] != 0 and np.sign(p_l[-1]) != np.sign(slopes[-1]):
+        keys.append(np.array([2 * n]))
+        roots.append(np.array([strikes[-1] - p_l[-1] / slopes[-1]]))
+
+    return np.concatenate(roots)[np.argsort(np.concatenate(keys), kind="stable")]
+
+
+def _evaluate_piecewise_numpy(strikes, slopes, intercepts, prices, out):
+    interval = np.searchsorted(strikes, prices, side="right")
+    np.take(slopes, interval, out=out)
+    out *= prices
+    out += np.take(intercepts, interval)
+    return out
+
+
+###! ------------------ Numba Kernels (plain loops, compiled) ------------------ ###
+
+def _strike_profit_loss_loops(leg_strikes, leg_calls, leg_positions, leg_costs, strikes):
+    p_l = np.zeros(len(strikes))
+    for j in range(len(leg_strikes)):
+        for i in range(len(strikes)):
+            if leg_calls[j]:
+                intrinsic = max(strikes[i] - leg_strikes[j], 0.0)
+            else:
+                intrinsic = max(leg_strikes[j] - strikes[i], 0.0)
+            p_l[i] += (intrinsic - leg_costs[j]) * leg_positions[j]
+    return p_l
+
+
+def _strike_interval_slopes_loops(leg_strikes, leg_calls, leg_positions, strikes, underlying_position):
+    changes = np.zeros(len(strikes) + 2)
+    for j in range(len(leg_strikes)):
+        k = np.searchsorted(strikes, leg_strikes[j])
+        if leg_calls[j]:
+            changes[k + 1] += leg_positions[j]
+        else:
+            changes[0] -= leg_positions[j]
+            changes[k + 1] += leg_positions[j]
+
+    slopes = np.empty(len(strikes) + 1)
+    running = 0.0
+    for k in range(len(strikes) + 1):
+        running += changes[k]
+        slopes[k] = running + underlying_position
+    return slopes
+
+
+def _breakeven_scan_loops(strikes, p_l, slopes):
+    n = len(strikes)
+    values = np.empty(n)
+    for i in range(n):
+        values[i] = 0.0 if abs(p_l[i]) <= ZERO_TOLERANCE else p_l[i]
+
+    roots = np.empty(2 * n + 1)
+    count = 0
+    if values[0] != 0 and slopes[0] != 0 and np.sign(values[0]) == np.sign(slopes[0]):
+        roots[count] = strikes[0] - values[0] / slopes[0]
+        count += 1
+    for i in range(n):
+        if values[i] == 0:
+            roots[count] = strikes[i]
+            count += 1
+        if i < n - 1 and values[i] * values[i+1] < 0:
+            roots[count] = strikes[i] - values[i] / slopes[i+1]
+            count += 1
+    if values[-1] != 0 and slopes[-1] != 0 and np.sign(values[-1]) != np.sign(slopes[-1]):
+        roots[count] = strikes[-1] - values[-1] / slopes[-1]
+        count += 1
+    return roots[:count].copy()
+
+
+def _evaluate_piecewise_loops(strikes, slopes, intercepts, prices, out):
+    for i in range(len(prices)):
+        #* binary search for the interval (same as searchsorted side="right")
+        low, high = 0, len(strikes)
+        while low < high:
+            middle = (low + high) // 2
+            if strikes[middle] <= prices[i]:
+                low = middle + 1
+            else:
+                high = middle
+        out[i] = slopes[low] * prices[i]
+        out[i] += intercepts[low]
+    return out
+
+
+###! ------------------ Backend Selection ------------------ ###
+
+KERNELS = {
+    "numpy": {
+        "strike_profit_loss": _strike_profit_loss_numpy,
+        "strike_interval_slopes": _strike_interval_slopes_numpy,
+        "breakeven_scan": _breakeven_scan_numpy,
+        "evaluate_piecewise": _evaluate_piecewise_numpy,
+    },
+}
+
+if numba is not None:
+    KERNELS["numba"] = {
+        "strike_profit_loss": numba.njit(cache=True)(_strike_profit_loss_loops),
+        "strike_interval_slopes": numba.njit(cache=True)(_strike_interval_slopes_loops),
+        "breakeven_scan": numba.njit(cache=True)(_breakeven_scan_loops),
+        "evaluate_piecewise": numba.njit(cache=True)(_evaluate_piecewise_loops),
+    }
+
+
+def select_backend(name=None):
+    name = (name or os.environ.get(KERNEL_ENV_VAR, "")).lower() or ("numba" if "numba" in KERNELS else "numpy")
+    if name not in KERNELS:
+        #* e.g. OPTION_PAYOFF_KERNELS=numba without Numba installed: keep running on the NumPy kernels
+        warnings.warn(f"Kernel backend {name!r} is not available ({', '.join(KERNELS)} are), using numpy")
+        return "numpy"
+    return name
+
+
+KERNEL_BACKEND = select_backend()
+
+
+###! ------------------ Public Kernels (float arrays in, float arrays out) ------------------ ###
+
+def _floats(values):
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def strike_profit_loss(leg_strikes, leg_calls, leg_positions, leg_costs, strikes, backend=None):
+    kernel = KERNELS[backend or KERNEL_BACKEND]["strike_profit_loss"]
+    return kernel(_floats(leg_strikes), np.ascontiguousarray(leg_calls, dtype=np.bool_), _floats(leg_positions), _floats(leg_costs), _floats(strikes))
+
+
+def strike_interval_slopes(leg_strikes, leg_calls, leg_positions, strikes, underlying_position=0.0, backend=None):
+    kernel = KERNELS[backend or KERNEL_BACKEND]["strike_interval_slopes"]
+    return kernel(_floats(leg_strikes), np.ascontiguousarray(leg_calls, dtype=np.bool_), _floats(leg_positions), _floats(strikes), float(underlying_position))
+
+
+def breakeven_scan(strikes, p_l, slopes, backend=None):
+    kernel = KERNELS[backend or KERNEL_BACKEND]["breakeven_scan"]
+    return kernel(_floats(strikes), _floats(p_l), _floats(slopes))
+
+
+def evaluate_piecewise(strikes, slopes, intercepts, prices, out=None, backend=None):
+    #* any shape of prices: the kernels work on the flat (contiguous) view, out keeps the shape of the prices
+    kernel = KERNELS[backend or KERNEL_BACKEND]["evaluate_piecewise"]
+    prices = _floats(prices)
+    if out is None:
+        out = np.empty_like(prices)
+    elif not (isinstance(out, np.ndarray) and out.dtype == np.float64 and out.shape == prices.shape and out.flags.c_contiguous):
+        #* reshape(-1) of a sliced or transposed view is a copy: the kernel would fill the copy and leave out untouched
+        raise ValueError(f"out must be a C-contiguous float64 array of shape {prices.shape}")
+    kernel(strikes, slopes, intercepts, prices.reshape(-1), out.reshape(-1))
+    return out
@@ -0,0 +1,146 @@
+### ------------------ Reference (Brute-Force) Payoff Evaluator ------------------ ###
+#* First-principles expiration payoff used to check the payoff engine:
+#* P&L(S) = Σ position · (max(S − K, 0) for calls or max(K − S, 0) for puts − cost) + Σ underlying position · (S − cost)
+#* It never looks at the slope table, the strike P&L loop or the breakeven scan of payoff_engine (not even its
+#* tolerance), so it can be used as an oracle for them: breakevens are found by sign changes on a dense price grid
+#* refined by bisection, the tail metrics by evaluating the payoff far beyond the strikes.
+
+### ------------------ Import Libraries ------------------ ###
+import numpy as np
+
+
+ACTION_SIGN = {"Buy": 1, "Sell": -1}
+REFERENCE_TOLERANCE = 1e-7 #|P&L| below this is a 0 (prices and costs have 2 decimals, float noise is far smaller)
+GRID_POINTS = 4001 #dense grid between the lowest and the highest strike
+BISECTION_STEPS = 80 #halvings: far below float resolution for any bracket
+FAR_DISTANCE = 1e6 #tail slopes are measured this far (x the price scale) beyond the extreme strikes
+
+
+###! ------------------ Payoff at Arbitrary Prices ------------------ ###
+
+def reference_payoff(option_legs, underlying_legs, prices):
+    prices = np.asarray(prices, dtype=float)
+    payoff = np.zeros_like(prices)
+
+    #* one leg at a time, straight from the definition of each contract
+    for leg in option_legs.itertuples(index=False):
+        position = leg.Quantity * ACTION_SIGN[leg.Action]
+        if leg.Type == "Call":
+            intrinsic = np.maximum(prices - leg.Strike, 0.0)
+        else:
+            intrinsic = np.maximum(leg.Strike - prices, 0.0)
+        payoff += position * (intrinsic - leg.Cost)
+
+    for leg in underlying_legs.itertuples(index=False):
+        position = leg.Quantity * ACTION_SIGN[leg.Action]
+        payoff += position * (prices - leg.Cost)
+
+    return payoff
+
+
+def reference_strikes(option_legs):
+    return np.unique(option_legs["Strike"].to_numpy(dtype=float))
+
+
+###! ------------------ Slopes from Finite Differences of the Payoff ------------------ ###
+
+def reference_slopes(option_legs, underlying_legs, strikes):
+    strikes = np.asarray(strikes, dtype=float)
+    at_strikes = reference_payoff(option_legs, underlying_legs, strikes)
+
+    #* the payoff is linear between strikes, so a single difference gives the exact slope of every interval
+    below = at_strikes[0] - reference_payoff(option_legs, underlying_legs, [strikes[0] - 1.0])[0]
+    above = reference_payoff(option_legs, underlying_legs, [strikes[-1] + 1.0])[0] - at_strikes[-1]
+    inner = np.diff(at_strikes) / np.diff(strikes)
+
+    slopes = np.concatenate([[below], inner, [above]])
+    return np.where(np.abs(slopes) <= REFERENCE_TOLERANCE, 0.0, slopes) #differences of prices with 2 decimals leave float noise
+
+
+###! ------------------ Breakevens by Brute Force (dense grid + bisection) ------------------ ###
+
+def zero_snapped(values):
+    return np.where(np.abs(values) <= REFERENCE_TOLERANCE, 0.0, values)
+
+
+def bisect_roots(option_legs, underlying_legs, lows, highs):
+    #* 1 root per [low, high] bracket (the payoff has opposite signs at its ends), all brackets refined together
+    lows, highs = np.asarray(lows, dtype=float), np.asarray(highs, dtype=float)
+    low_values = reference_payoff(option_legs, underlying_legs, lows)
+    for _ in range(BISECTION_STEPS):
+        middles = 0.5 * (lows + highs)
+        middle_values = reference_payoff(option_legs, underlying_legs, middles)
+        same_side = np.sign(middle_values) == np.sign(low_values)
+        lows, low_values = np.where(same_side, middles, lows), np.where(same_side, middle_values, low_values)
+        highs = np.where(same_side, highs, middles)
+    return 0.5 * (lows + highs)
+
+
+def tail_bracket(option_legs, underlying_legs, edge, direction):
+    #* beyond the extreme strikes every contract is linear in the price: walk outwards, doubling the distance, until the
+    #* payoff changes sign (bracket found) or moves away from 0 (no root in this tail)
+    edge_value = zero_snapped(reference_payoff(option_legs, underlying_legs, [edge]))[0]
+    if edge_value == 0:
+        return None
+    distance = 1.0 + abs(edge)
+    for _ in range(BISECTION_STEPS):
+        far = edge + direction * distance
+        far_value = zero_snapped(reference_payoff(option_legs, underlying_legs, [far]))[0]
+        if far_value == 0:
+            return far, far
+        if np.sign(far_value) != np.sign(edge_value):
+            return (far, edge) if direction < 0 else (edge, far)
+        if abs(far_value) >= abs(edge_value):
+            return None
+        distance *= 2
+    return None
+
+
+def reference_breakevens(option_legs, underlying_legs):
+    #* a strike with a 0 payoff is a breakeven, and so is every point where the payoff strictly changes sign
+    strikes = reference_strikes(option_legs)
+    grid = np.union1d(np.linspace(strikes[0], strikes[-1], GRID_POINTS), strikes)
+    values = zero_snapped(reference_payoff(option_legs, underlying_legs, grid))
+
+    roots = list(strikes[zero_snapped(reference_payoff(option_legs, underlying_legs, strikes)) == 0])
+
+    #* grid points between 2 strikes that land on a 0 are left out, so the sign change around them is still bracketed
+    kept = (values != 0) | np.isin(grid, strikes)
+    grid, values = grid[kept], values[kept]
+    crossing = np.flatnonzero(values[:-1] * values[1:] < 0)
+    if len(crossing):
+        roots += list(bisect_roots(option_legs, underlying_legs, grid[crossing], grid[crossing + 1]))
+
+    for edge, direction in ((strikes[0], -1), (strikes[-1], 1)):
+        bracket = tail_bracket(option_legs, underlying_legs, edge, direction)
+        if bracket is not None:
+            roots += [bracket[0]] if bracket[0] == bracket[1] else list(bisect_roots(option_legs, underlying_legs, [bracket[0]], [bracket[1]]))
+
+    return [float(root) for root in sorted(roots)]
+
+
+###! ------------------ Tail Metrics from Far-Out Evaluations ------------------ ###
+
+def reference_tail_metrics(option_legs, underlying_legs):
+    strikes = reference_strikes(option_legs)
+    distance = FAR_DISTANCE * (1.0 + np.abs(strikes).max())
+
+    #* 2 points far in each tail: the payoff is linear there, so their difference is the exact tail slope
+    far = reference_payoff(option_legs, underlying_legs, [strikes[0] - 2 * distance, strikes[0] - distance,
+                                                          strikes[-1] + distance, strikes[-1] + 2 * distance])
+    downside_slope = (far[1] - far[0]) / distance
+    upside_slope = (far[3] - far[2]) / distance
+    downside_slope, upside_slope = (0.0 if abs(slope) <= REFERENCE_TOLERANCE else float(slope) for slope in (downside_slope, upside_slope))
+
+    #* with bounded tails the extremes are on the dense grid (it holds every strike, the only kinks of the payoff)
+    grid = np.union1d(np.linspace(strikes[0], strikes[-1], GRID_POINTS), strikes)
+    values = reference_payoff(option_legs, underlying_legs, grid)
+
+    return {
+        "max_profit": np.inf if (upside_slope > 0 or downside_slope < 0) else float(values.max()),
+        "max_loss": -np.inf if (upside_slope < 0 or downside_slope > 0) else float(values.min()),
+        "downside_slope": downside_slope,
+        "upside_slope": upside_slope,
+        "unlimited_downside_risk": downside_slope > 0,
+        "unlimited_upside_risk": upside_slope < 0,
+    }
@@ -0,0 +1,291 @@
+### ------------------ Batch Payoff Reports (PDF / PNG) ------------------ ###
+#* 1 report page per book: expiration payoff graph, netted position text, summary statistics and risk profile.
+#* Books are read lazily from a folder of JSON files (1 book per file, the file name is the book name) or from a JSON
+#* Lines file ({"name": ..., "call_inputs": [...], "put_inputs": [...], "underlying_inputs": [...]} per line).
+#* A book with legs on several underlyings (6th row field, see multi_underlying.py) gets 1 page per underlying: each
+#* payoff is drawn on the x-axis of its own underlying, never merged with the others.
+#* Pages are rendered in a process pool with the Agg backend: every worker builds 1 page template (Figure + Axes) once
+#* and clears and redraws it for every book, so a page never allocates a new Figure.
+#*  - PNG folder: every worker writes its pages itself, only the file names come back
+#*  - PDF: workers send compressed PNG pages back, the parent embeds them in 1 multi-page PDF in book order
+#* At most `window` pages are in flight at once, so memory stays bounded whatever the number of books.
+#* Run from the repository root: python payoff_reports.py books/ --pdf month_end.pdf --workers 4
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import collections
+import io
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+from matplotlib.image import imread
+
+from payoff_charts import draw_payoff_graph
+from multi_underlying import DEFAULT_UNDERLYING, shard_books
+from payoff_engine import LEG_COLUMNS, evaluate_portfolio
+from what_if import BOOK_KEYS
+
+
+REPORT_PAGE_SIZE = (16.5, 11.7) #A3 landscape (inches): the payoff graph is wide
+REPORT_DPI = 120
+REPORT_WORKERS = os.cpu_count() or 1
+REPORT_POSITION_LINES = 20 #netted legs listed on the page, the rest is counted
+
+
+###! ------------------ Read the Books Lazily ------------------ ###
+
+def iter_books(source):
+    #* (name, book, error) triples, 1 at a time: a file or line that is not a JSON object gives (name, None, error)
+    if os.path.isdir(source):
+        for file_name in sorted(os.listdir(source)):
+            if file_name.endswith(".json"):
+                name = os.path.splitext(file_name)[0]
+                try:
+                    with open(os.path.join(source, file_name)) as file:
+                        yield (name, *checked_book(json.load(file)))
+                except (OSError, UnicodeDecodeError, json.JSONDecodeError) as exc:
+                    yield name, None, f"{type(exc).__name__}: {exc}"
+        return
+
+    with open(source) as file:
+        for line_number, line in enumerate(file, start=1):
+            if line.strip():
+                try:
+                    book, error = checked_book(json.loads(line))
+                except json.JSONDecodeError as exc:
+                    book, error = None, f"{type(exc).__name__}: {exc}"
+                yield str((book or {}).get("name", f"book_{line_number}")), book, error
+
+
+def checked_book(book):
+    return (book, None) if isinstance(book, dict) else (None, "The book is not a JSON object")
+
+
+def underlying_books(name, book):
+    #* (page name, book) per underlying of the book, in the session state layout
+    shards = shard_books({key: book.get(key) or [] for key in BOOK_KEYS})
+    if not shards:
+        return [(name, book)]
+    return [(name if list(shards) == [DEFAULT_UNDERLYING] else f"{name} ({underlying})",
+             {key: [list(row) for row in rows] for key, rows in zip(BOOK_KEYS, shard)})
+            for underlying, shard in shards.items()]
+
+
+def book_frames(book):
+    #* session state layout (1 underlying) -> the 3 pipeline frames
+    return [pd.DataFrame([list(row[:5]) for row in book.get(key) or []], columns=LEG_COLUMNS) for key in BOOK_KEYS]
+
+
+###! ------------------ Report Text ------------------ ###
+
+def money(value):
+    return "Unlimited" if np.isinf(value) else f"€{value:.2f}"
+
+
+def summary_lines(portfolio_result):
+    lines = []
+    for key in ("call_stats", "put_stats", "underlying_stats"):
+        stats = portfolio_result[key]
+        if stats:
+            lines += [f"{stats['asset_type']}s: bought {stats['assets_bought']}, sold {stats['assets_sold']}, net {stats['net_assets']}",
+                      f"  paid €{stats['amount_paid']:.2f}, received €{stats['amount_received']:.2f}"]
+
+    if not portfolio_result["total_portfolio"].empty:
+        tails = portfolio_result["tail_metrics"]
+        breakevens = ", ".join(f"{point:.2f}" for point in portfolio_result["breakeven_points"]) or "None"
+        lines += [
+            "",
+            f"Max Profit: {money(tails['max_profit'])}",
+            f"Max Loss: {money(tails['max_loss'])}",
+            f"Breakevens: {breakevens}",
+        ]
+
+    compression = portfolio_result["compression"]
+    if compression["raw_legs"] > compression["netted_legs"]:
+        lines.append(f"Netted {compression['raw_legs']} legs into {compression['netted_legs']}")
+        if compression["locked_p_l"] != 0:
+            lines.append(f"Locked-in P&L: €{compression['locked_p_l']:.2f}")
+    return lines
+
+
+def position_lines(position_text_box, max_lines=REPORT_POSITION_LINES):
+    lines = [line.strip() for line in position_text_box.splitlines() if line.strip()]
+    if len(lines) > max_lines:
+        lines = lines[:max_lines - 1] + [f"... and {len(lines) - max_lines + 1} more legs"]
+    return lines
+
+
+def risk_lines(portfolio_result):
+    #* same approximate risk profile as the Portfolio Summary Metrics of the app
+    call_position = portfolio_result["call_stats"].get("net_assets", 0)
+    put_position = portfolio_result["put_stats"].get("net_assets", 0)
+    underlying_position = portfolio_result["underlying_stats"].get("net_assets", 0)
+    upside, downside, vega = underlying_position + call_position, underlying_position + put_position, call_position + put_position
+
+    lines = [
+        f"Δ Upside Risk: {upside:.1f} ({'Limited' if upside >= 0 else 'Unlimited'})",
+        f"Δ Downside Risk: {downside:.1f} ({'Limited' if downside <= 0 else 'Unlimited'})",
+        f"Κ Vega Risk: {vega:.1f} ({'Potentially only limited' if vega >= 0 else 'Unlimited'})",
+    ]
+    if not portfolio_result["total_portfolio"].empty and portfolio_result["flags"]["option_position"]:
+        lines.insert(0, f"Position: {portfolio_result['flags']['option_position']}")
+    return lines
+
+
+###! ------------------ Page Template (1 per worker process) ------------------ ###
+
+_template = None
+
+
+def page_template():
+    #* title + payoff graph on top, 3 text panels below; built once per process and redrawn for every book
+    global _template
+    if _template is None:
+        fig = Figure(figsize=REPORT_PAGE_SIZE)
+        grid = fig.add_gridspec(2, 3, height_ratios=[3, 1.3], width_ratios=[1, 1.2, 1.1], hspace=0.25, wspace=0.1)
+        graph = fig.add_subplot(grid[0, :])
+        panels = [fig.add_subplot(grid[1, column]) for column in range(3)]
+        _template = (fig, graph, panels)
+    return _template
+
+
+def draw_page(name, book):
+    fig, graph, panels = page_template()
+    for ax in (graph, *panels):
+        ax.cla()
+    for text in list(fig.texts): #the previous book's title
+        text.remove()
+
+    portfolio_result = evaluate_portfolio(*book_frames(book))
+    fig.suptitle(f"Payoff Report: {name}", fontsize=18, weight="bold")
+
+    if portfolio_result["total_portfolio"].empty:
+        graph.set_axis_off()
+        graph.text(0.5, 0.5, "No open option position", horizontalalignment="center", fontsize=16, transform=graph.transAxes)
+        position_text_box = ""
+    else:
+        graph.set_axis_on()
+        position_text_box = portfolio_result["position_text_box"]
+        draw_payoff_graph(graph, portfolio_result["strikes"], portfolio_result["total_p_l"], portfolio_result["total_slopes"],
+                          portfolio_result["breakeven_points"], portfolio_result["flags"], "")
+
+    for ax, title, lines in zip(panels, ("Netted Position", "Summary", "Risk Profile"),
+                                (position_lines(position_text_box), summary_lines(portfolio_result), risk_lines(portfolio_result))):
+        ax.set_axis_off()
+        ax.set_title(title, loc="left", weight="bold")
+        ax.text(0, 1, "\n".join(lines) or "-", verticalalignment="top", fontsize=10, family="monospace", transform=ax.transAxes)
+    return fig
+
+
+def render_page_png(name, book, dpi, path=None):
+    #* PNG of 1 page, written to `path` (PNG folder) or returned as bytes (PDF pages); errors are reported, not raised
+    try:
+        fig = draw_page(name, book)
+        target = path if path is not None else io.BytesIO()
+        fig.savefig(target, format="png", dpi=dpi)
+        return name, (path if path is not None else target.getvalue()), None
+    except Exception as exc: #1 broken book must not stop the month-end run
+        return name, None, f"{type(exc).__name__}: {exc}"
+
+
+###! ------------------ Batch Generation ------------------ ###
+
+def bounded_map(pool, function, argument_lists, window):
+    #* pool.map in input order with at most `window` tasks submitted but not consumed (pool.map would submit them all)
+    pending = collections.deque()
+    for arguments in argument_lists:
+        pending.append(pool.submit(function, *arguments))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def file_stem(name, used):
+    #* file name of a page, unique within the run ("a b" and "a_b" would both give a_b): _2, _3... on a clash
+    stem = re.sub(r"[^\w.-]+", "_", name).strip("_") or "book"
+    unique, copy = stem, 1
+    while unique.lower() in used: #case-insensitive file systems
+        copy += 1
+        unique = f"{stem}_{copy}"
+    used.add(unique.lower())
+    return unique
+
+
+def generate_reports(source, pdf_path=None, png_dir=None, workers=REPORT_WORKERS, dpi=REPORT_DPI, window=None):
+    #* returns (pages written, {book name: error}) | exactly 1 of pdf_path / png_dir
+    if (pdf_path is None) == (png_dir is None):
+        raise ValueError("Give either a PDF path or a PNG folder")
+    window = window or 2 * workers
+    if png_dir is not None:
+        os.makedirs(png_dir, exist_ok=True)
+
+    pages, errors, stems = 0, {}, set()
+
+    def tasks():
+        for name, book, error in iter_books(source):
+            if error is None:
+                try:
+                    pages_of_book = underlying_books(name, book)
+                except Exception as exc: #rows the sharding cannot read
+                    error = f"{type(exc).__name__}: {exc}"
+            if error is not None:
+                errors[name] = error
+                continue
+            for page_name, page_book in pages_of_book:
+                yield page_name, page_book, dpi, os.path.join(png_dir, f"{file_stem(page_name, stems)}.png") if png_dir is not None else None
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = bounded_map(pool, render_page_png, tasks(), window)
+        if png_dir is not None:
+            for name, _, error in results:
+                if error is None:
+                    pages += 1
+                else:
+                    errors[name] = error
+            return pages, errors
+
+        #* PDF: 1 reused page Figure in the parent as well, the worker PNG fills it pixel for pixel
+        page = Figure(figsize=REPORT_PAGE_SIZE, dpi=dpi)
+        with PdfPages(pdf_path) as pdf:
+            for name, png, error in results:
+                if error is not None:
+                    errors[name] = error
+                    continue
+                page.images.clear()
+                page.figimage(imread(io.BytesIO(png), format="png"), resize=False)
+                pdf.savefig(page, dpi=dpi)
+                pages += 1
+    return pages, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render 1 payoff report page per book, in parallel")
+    parser.add_argument("source", help="folder of .json books or a .jsonl file with 1 book per line")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--pdf", help="multi-page PDF to write")
+    output.add_argument("--png-dir", help="folder for 1 PNG per book")
+    parser.add_argument("--workers", type=int, default=REPORT_WORKERS)
+    parser.add_argument("--dpi", type=int, default=REPORT_DPI)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    pages, errors = generate_reports(args.source, args.pdf, args.png_dir, args.workers, args.dpi)
+    elapsed = time.perf_counter() - start
+
+    print(f"{pages} pages -> {args.pdf or args.png_dir} in {elapsed:.1f}s ({args.workers} workers)")
+    for name, error in errors.items():
+        print(f"  skipped {name}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+### ------------------ Local Payoff HTTP Service (asyncio, micro-batched) ------------------ ###
+#* The payoff numbers of the app (strike vertices, P&L, slopes, breakevens, max profit / loss) over HTTP/JSON
+#* for other local tools, without going through Streamlit. Standard library only (asyncio streams), no web framework.
+#*  - POST /payoff  body: a book in the session state layout + optional prices to evaluate the payoff at
+#*        {"call_inputs": [["Call", 100, 1, "Buy", 2.5]], "put_inputs": [], "underlying_inputs": [], "prices": [95, 105]}
+#*  - GET /health   counters of the batcher (requests, batches, deduplicated books, timeouts)
+#* Concurrent requests are coalesced into micro-batches: a batch closes when it is full or `max_wait_ms` after its
+#* first request arrived, identical books (after leg netting) are evaluated once and the whole batch is 1 vectorized call.
+#* Every request has a latency deadline: a request still waiting for its batch after `deadline_ms` gets a 504.
+#* Run from the repository root: python payoff_service.py --port 8765 --max-batch 256 --max-wait-ms 2 --deadline-ms 250
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import asyncio
+import json
+import logging
+from http import HTTPStatus
+
+import numpy as np
+
+from multi_underlying import leg_underlying
+from payoff_engine import PNL_TOLERANCE
+from payoff_kernels import breakeven_scan, evaluate_piecewise
+
+
+logger = logging.getLogger("option_payoff.service")
+
+BOOK_KEYS = ("call_inputs", "put_inputs", "underlying_inputs")
+ACTION_SIGNS = {"Buy": 1, "Sell": -1}
+MAX_BODY_BYTES = 1 << 20
+MAX_PRICES = 100_000
+
+
+class BookError(ValueError):
+    #* the request body is not a valid book (400)
+    pass
+
+
+###! ------------------ Parse & Net a Book ------------------ ###
+
+def parse_book(payload):
+    #* net the legs the same way as payoff_engine.compress_legs: (type, strike) -> position, cash (premium paid +)
+    #* the netted legs are also the dedupe key, so 2 books that only differ in how their fills were entered are 1 book
+    if not isinstance(payload, dict):
+        raise BookError("The body must be a JSON object")
+
+    options = {}
+    underlying_position = 0.0
+    underlying_cash = 0.0
+    underlyings = set()
+    for key in BOOK_KEYS:
+        rows = payload.get(key)
+        if rows is None:
+            continue
+        if not isinstance(rows, list) or not all(isinstance(row, list) for row in rows):
+            raise BookError(f"{key} must be a list of [Type, Strike, Quantity, Buy/Sell, Cost(, Underlying)] rows")
+        for row in rows:
+            try:
+                asset_type, strike, quantity, action, cost = row[:5] if len(row) == 6 else row #optional 6th field: the underlying
+                position = float(quantity) * ACTION_SIGNS[action]
+                cash = position * float(cost)
+                strike = float(strike)
+            except (TypeError, ValueError, KeyError):
+                raise BookError(f"Invalid {key} row {row!r}: expected [Type, Strike, Quantity, Buy/Sell, Cost(, Underlying)]") from None
+            if len(row) == 6 and row[5] is not None and not isinstance(row[5], str):
+                raise BookError(f"Invalid {key} row {row!r}: the underlying must be a string")
+            underlyings.add(leg_underlying(row)) #rows without an underlying belong to the default one, as in the app
+
+            if key == "underlying_inputs":
+                underlying_position += position
+                underlying_cash += cash
+            elif asset_type in ("Call", "Put"):
+                net = options.setdefault((asset_type == "Call", strike), [0.0, 0.0])
+                net[0] += position
+                net[1] += cash
+            else:
+                raise BookError(f"Invalid option type {asset_type!r} in {key}")
+
+    if len(underlyings) > 1:
+        raise BookError("The book has legs on several underlyings, send 1 request per underlying")
+
+    #* closed legs (net position 0) only leave their premium difference
+    locked_cash = sum(cash for position, cash in options.values() if position == 0)
+    legs = tuple(sorted((is_call, strike, position, cash) for (is_call, strike), (position, cash) in options.items() if position != 0))
+    if not legs:
+        raise BookError("The book has no open option position")
+
+    return legs + (("underlying", underlying_position, underlying_cash, locked_cash),)
+
+
+def parse_prices(payload):
+    prices = payload.get("prices")
+    if prices is None:
+        return None
+    try:
+        prices = np.asarray(prices, dtype=float).reshape(-1)
+    except (TypeError, ValueError):
+        raise BookError("prices must be a list of numbers") from None
+    if len(prices) > MAX_PRICES:
+        raise BookError(f"At most {MAX_PRICES:,} prices per request")
+    return prices
+
+
+###! ------------------ Evaluate a Batch of Books in 1 Vectorized Call ------------------ ###
+
+def evaluate_books(books):
+    #* books: netted legs from parse_book. All books are padded to the same number of legs / vertices:
+    #* padded legs have a 0 position, padded vertices repeat the highest strike of their book (and are dropped at the end)
+    n_books = len(books)
+    n_legs = max(len(book) - 1 for book in books)
+
+    leg_calls = np.zeros((n_books, n_legs), dtype=bool)
+    leg_strikes = np.zeros((n_books, n_legs))
+    leg_positions = np.zeros((n_books, n_legs))
+    premium = np.zeros(n_books) #net option premium paid (+) or received (-), closed legs included
+    cash = np.zeros(n_books) #premium + underlying cost
+    underlying_position = np.zeros(n_books)
+    vertex_lists = []
+    for row, book in enumerate(books):
+        legs, (_, position, underlying_cash, locked_cash) = book[:-1], book[-1]
+        leg_calls[row, :len(legs)] = [leg[0] for leg in legs]
+        leg_strikes[row, :len(legs)] = [leg[1] for leg in legs]
+        leg_positions[row, :len(legs)] = [leg[2] for leg in legs]
+        premium[row] = sum(leg[3] for leg in legs) + locked_cash
+        cash[row] = premium[row] + underlying_cash
+        underlying_position[row] = position
+        vertex_lists.append(np.unique(leg_strikes[row, :len(legs)]))
+
+    n_vertices = np.array([len(vertices) for vertices in vertex_lists])
+    vertices = np.empty((n_books, n_vertices.max()))
+    for row, row_vertices in enumerate(vertex_lists):
+        vertices[row, :len(row_vertices)] = row_vertices
+        vertices[row, len(row_vertices):] = row_vertices[-1]
+
+    #* P&L at every vertex (books x vertices), 1 leg column at a time; the underlying is linear in the price
+    p_l = underlying_position[:, None] * vertices - cash[:, None]
+    for leg in range(n_legs):
+        intrinsic = np.where(
+            leg_calls[:, leg:leg+1],
+            np.maximum(vertices - leg_strikes[:, leg:leg+1], 0.0),
+            np.maximum(leg_strikes[:, leg:leg+1] - vertices, 0.0),
+        )
+        p_l += leg_positions[:, leg:leg+1] * intrinsic
+    p_l[np.abs(p_l) <= PNL_TOLERANCE] = 0.0
+
+    #* slope right of every vertex: calls at or below it count, puts above it count negatively (books x vertices x legs)
+    at_or_below = leg_strikes[:, None, :] <= vertices[:, :, None]
+    call_positions = np.where(leg_calls, leg_positions, 0.0)[:, None, :]
+    put_positions = np.where(leg_calls, 0.0, leg_positions)[:, None, :]
+    slope_right = (call_positions * at_or_below).sum(axis=2) - (put_positions * ~at_or_below).sum(axis=2)
+    slope_below = -put_positions[:, 0, :].sum(axis=1)
+    slopes = np.column_stack([slope_below, slope_right]) + underlying_position[:, None]
+
+    #* extremes: at the vertices unless a tail slope keeps going (padded vertices repeat a real one, so they're harmless)
+    slope_above = slopes[np.arange(n_books), n_vertices]
+    max_profit = np.where((slope_above > 0) | (slopes[:, 0] < 0), np.inf, p_l.max(axis=1))
+    max_loss = np.where((slope_above < 0) | (slopes[:, 0] > 0), -np.inf, p_l.min(axis=1))
+
+    results = []
+    for row, n in enumerate(n_vertices):
+        strikes, row_p_l, row_slopes = vertices[row, :n], p_l[row, :n], slopes[row, :n+1]
+        anchor = np.maximum(np.arange(n + 1) - 1, 0)
+        results.append({
+            "strikes": strikes,
+            "p_l": row_p_l,
+            "slopes": row_slopes,
+            "intercepts": row_p_l[anchor] - row_slopes * strikes[anchor], #same construction as PayoffEvaluator
+            "breakevens": breakeven_scan(strikes, row_p_l, row_slopes),
+            "premium": float(premium[row]),
+            "max_profit": float(max_profit[row]),
+            "max_loss": float(max_loss[row]),
+        })
+    return results
+
+
+def response_body(result, prices):
+    #* unlimited profit / loss is null (JSON has no infinity)
+    body = {
+        "strikes": result["strikes"].tolist(),
+        "p_l": result["p_l"].tolist(),
+        "slopes": result["slopes"].tolist(),
+        "breakevens": result["breakevens"].tolist(),
+        "premium": result["premium"],
+        "max_profit": result["max_profit"] if np.isfinite(result["max_profit"]) else None,
+        "max_loss": result["max_loss"] if np.isfinite(result["max_loss"]) else None,
+    }
+    if prices is not None:
+        body["values"] = evaluate_piecewise(result["strikes"], result["slopes"], result["intercepts"], prices).tolist()
+    return body
+
+
+###! ------------------ Micro-Batcher ------------------ ###
+
+class PayoffBatcher:
+    def __init__(self, max_batch=256, max_wait_ms=2.0, deadline_ms=250.0):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.deadline = deadline_ms / 1000
+        self.queue = asyncio.Queue()
+        self.stats = {"requests": 0, "batches": 0, "books_evaluated": 0, "deduplicated": 0, "timeouts": 0, "errors": 0}
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._collect())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def evaluate(self, book):
+        #* raises TimeoutError when the book's batch isn't done within the deadline (wait_for cancels the future,
+        #* and the collector skips cancelled requests, so a late request is never evaluated for nothing)
+        self.stats["requests"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((book, future))
+        try:
+            return await asyncio.wait_for(future, self.deadline)
+        except TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            closes = loop.time() + self.max_wait
+
+            #* take what is already queued, then wait for more until the batch is full or its window closes
+            while len(batch) < self.max_batch:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                remaining = closes - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except TimeoutError:
+                    break
+
+            batch = [(book, future) for book, future in batch if not future.done()]
+            if batch:
+                await self._run_batch(batch)
+
+    async def _run_batch(self, batch):
+        #* identical books are evaluated once; the batch runs in a worker thread so the loop keeps reading requests
+        #* (and the next batch fills up meanwhile)
+        unique = {}
+        for book, _ in batch:
+            unique.setdefault(book, len(unique))
+
+        self.stats["batches"] += 1
+        self.stats["books_evaluated"] += len(unique)
+        self.stats["deduplicated"] += len(batch) - len(unique)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(None, evaluate_books, list(unique))
+        except Exception as exc: #a broken batch fails its requests, not the service
+            logger.exception("Batch of %d books failed", len(unique))
+            self.stats["errors"] += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for book, future in batch:
+            if not future.done():
+                future.set_result(results[unique[book]])
+
+    def health(self):
+        batches = max(self.stats["batches"], 1)
+        return {**self.stats, "mean_batch_size": (self.stats["books_evaluated"] + self.stats["deduplicated"]) / batches,
+                "queued": self.queue.qsize()}
+
+
+###! ------------------ Minimal HTTP/1.1 over asyncio Streams ------------------ ###
+
+async def read_request(reader):
+    #* returns (method, path, headers, body) or None when the client closed the connection
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_BYTES:
+        raise BookError(f"The body is larger than {MAX_BODY_BYTES:,} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method, path.split("?", 1)[0], headers, body
+
+
+def write_response(writer, status, payload, keep_alive):
+    body = json.dumps(payload).encode()
+    writer.write(
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+    )
+
+
+async def handle_request(batcher, method, path, body):
+    if path == "/health" and method == "GET":
+        return HTTPStatus.OK, batcher.health()
+    if path != "/payoff":
+        return HTTPStatus.NOT_FOUND, {"error": f"Unknown path {path}"}
+    if method != "POST":
+        return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use POST /payoff"}
+
+    try:
+        payload = json.loads(body)
+        book, prices = parse_book(payload), parse_prices(payload)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return HTTPStatus.BAD_REQUEST, {"error": "The body is not valid JSON"}
+    except BookError as exc:
+        return HTTPStatus.BAD_REQUEST, {"error": str(exc)}
+    except Exception as exc: #a body the parser did not anticipate still gets an answer, never a dropped connection
+        logger.exception("Unexpected error while parsing a request")
+        return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(exc).__name__}: {exc}"}
+
+    try:
+        result = await batcher.evaluate(book)
+    except TimeoutError:
+        return HTTPStatus.GATEWAY_TIMEOUT, {"error": f"Not evaluated within the {1000 * batcher.deadline:.0f} ms deadline"}
+    except Exception as exc:
+        return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(exc).__name__}: {exc}"}
+    return HTTPStatus.OK, response_body(result, prices)
+
+
+async def serve_connection(batcher, reader, writer):
+    #* keep-alive connection: requests are answered in order until the client closes it
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except (BookError, ValueError) as exc:
+                write_response(writer, HTTPStatus.BAD_REQUEST, {"error": str(exc)}, keep_alive=False)
+                break
+            if request is None:
+                break
+
+            method, path, headers, body = request
+            keep_alive = headers.get("connection", "").lower() != "close"
+            status, payload = await handle_request(batcher, method, path, body)
+            write_response(writer, status, payload, keep_alive)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run_service(host="127.0.0.1", port=8765, max_batch=256, max_wait_ms=2.0, deadline_ms=250.0, ready=None):
+    #* warm up the kernels (Numba loads / compiles them on the first call) so the first batch doesn't miss its deadline
+    evaluate_books([parse_book({"call_inputs": [["Call", 100.0, 1, "Buy", 1.0]], "put_inputs": [["Put", 90.0, 1, "Sell", 1.0]]})])
+
+    batcher = PayoffBatcher(max_batch, max_wait_ms, deadline_ms)
+    batcher.start()
+    server = await asyncio.start_server(lambda reader, writer: serve_connection(batcher, reader, writer), host, port)
+    logger.info("Payoff service on http://%s:%d (batches of up to %d, %.1f ms window, %.0f ms deadline)",
+                host, port, max_batch, max_wait_ms, deadline_ms)
+    if ready is not None: #e.g. an asyncio.Event for callers that run the service in-process
+        ready.set()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON payoff service with micro-batched evaluation")
+    parser.add_argument("--host", default="127.0.0.1", help="bind address (local only by default)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=256, help="books per vectorized evaluation")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="how long a batch stays open after its first request")
+    parser.add_argument("--deadline-ms", type=float, default=250.0, help="requests not answered within this get a 504")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(run_service(args.host, args.port, args.max_batch, args.max_wait_ms, args.deadline_ms))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
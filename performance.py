@@ -0,0 +1,98 @@
+### ------------------ Import Libraries ------------------ ###
+import contextlib
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+
+import pandas as pd
+
+
+logger = logging.getLogger("option_payoff.performance")
+
+PERFORMANCE_ENV_VAR = "OPTION_PAYOFF_PERF" #set to 1 to show the performance panel and log the timings of every rerun
+
+_NULL_STAGE = contextlib.nullcontext() #shared no-op context so disabled timers don't allocate anything
+
+
+###! ------------------ Check if Instrumentation is Enabled ------------------ ###
+
+def performance_enabled():
+    if os.environ.get(PERFORMANCE_ENV_VAR, "").lower() in ("1", "true", "yes", "on"):
+        return True
+    return logger.isEnabledFor(logging.DEBUG) #also enabled if someone turned on debug logging for this logger
+
+
+###! ------------------ Stage Timer ------------------ ###
+
+class _TimedStage:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.start
+        #* a stage that runs more than once in a rerun (e.g. the 3 input sections) accumulates its time
+        self.timer.timings[self.name] = self.timer.timings.get(self.name, 0.0) + elapsed
+        return False #never swallow exceptions (st.rerun() raises one to stop the script)
+
+
+class StageTimer:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.timings = {} #stage name -> seconds, in the order the stages ran
+        self.started = time.perf_counter()
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _TimedStage(self, name)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def as_frame(self):
+        frame = pd.DataFrame({"Stage": list(self.timings), "Time (ms)": [1000 * seconds for seconds in self.timings.values()]})
+        total = 1000 * self.elapsed()
+        frame["Share of Rerun (%)"] = 100 * frame["Time (ms)"] / total if total > 0 else 0.0
+        return frame
+
+    def log(self, label="rerun"):
+        if not self.enabled:
+            return
+        stages = ", ".join(f"{name}={1000 * seconds:.2f}ms" for name, seconds in self.timings.items())
+        logger.info("%s total=%.2fms %s", label, 1000 * self.elapsed(), stages)
+
+
+###! ------------------ Profile a Single Rerun ------------------ ###
+
+def start_profiler():
+    #* use pyinstrument if it is installed (call tree), otherwise the standard library cProfile
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = Profiler()
+        profiler.start()
+    return profiler
+
+
+def stop_profiler(profiler, limit=40):
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(limit)
+        return output.getvalue()
+
+    profiler.stop()
+    return profiler.output_text(unicode=True, color=False)
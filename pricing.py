@@ -0,0 +1,42 @@
+### ------------------ Shared Pricing Helpers ------------------ ###
+#* Used by the pre-expiry models (hedging_simulator.py, greeks_ladder.py, american_pricer.py, vol_surface.py):
+#*  - TRADING_DAYS: trading days per year, "days to expiration" inputs are trading days
+#*  - normal_cdf(): standard normal CDF (SciPy's ndtr when installed, else a rational approximation)
+#*  - book_legs(): strike, type and signed position arrays of the open option legs of a pipeline result
+
+### ------------------ Import Libraries ------------------ ###
+import numpy as np
+
+try:
+    from scipy.special import ndtr
+except ImportError: #optional, a rational approximation of the normal CDF is used instead
+    ndtr = None
+
+
+TRADING_DAYS = 252
+
+
+###! ------------------ Normal CDF ------------------ ###
+
+def normal_cdf(x):
+    if ndtr is not None:
+        return ndtr(x)
+    #* Abramowitz & Stegun 7.1.26 for erf (|error| < 1.5e-7, far below what a delta hedge can tell apart)
+    z = np.abs(x) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-z * z)
+    return 0.5 * (1.0 + np.sign(x) * erf)
+
+
+###! ------------------ Option Legs of a Book ------------------ ###
+
+def book_legs(portfolio_result):
+    #* (strikes, calls, positions) of the open option legs (payoff_engine.evaluate_portfolio result) + the net underlying position
+    total_portfolio = portfolio_result["total_portfolio"]
+    return (
+        total_portfolio["Strike"].to_numpy(dtype=float),
+        (total_portfolio["Type"] == "Call").to_numpy(),
+        total_portfolio["Position"].to_numpy(dtype=float),
+        float(portfolio_result["underlying_stats"].get("net_assets", 0)),
+    )
@@ -0,0 +1,222 @@
+### ------------------ Option-Chain Strategy Scanner ------------------ ###
+#* Enumerates every instance of a volatility spread template across a local option-chain snapshot
+#* and scores all candidates at once with array math (no per-candidate run of the page logic).
+#* Every candidate's legs sit on chain strikes, so its payoff is linear between consecutive chain strikes:
+#* the P&L at the chain strikes plus the 2 tail slopes describe it exactly.
+
+### ------------------ Import Libraries ------------------ ###
+import numpy as np
+import pandas as pd
+
+from payoff_engine import PNL_TOLERANCE
+
+
+###! ------------------ Load an Option Chain Snapshot ------------------ ###
+
+CHAIN_COLUMN_NAMES = {
+    "Strike": ("strike", "k"),
+    "Call": ("call", "call_price", "call_mid", "c"),
+    "Put": ("put", "put_price", "put_mid", "p"),
+}
+
+
+def load_chain(path_or_buffer):
+    #* CSV with a strike column and call / put prices, either as a price column or as bid & ask (mid is used)
+    raw = pd.read_csv(path_or_buffer)
+    columns = {name.strip().lower(): name for name in raw.columns}
+
+    chain = pd.DataFrame()
+    for target, candidates in CHAIN_COLUMN_NAMES.items():
+        match = next((columns[name] for name in candidates if name in columns), None)
+        if match is None and target != "Strike":
+            bid, ask = columns.get(f"{target.lower()}_bid"), columns.get(f"{target.lower()}_ask")
+            if bid is None or ask is None:
+                raise ValueError(f"The option chain needs a {target.lower()} price column (or {target.lower()}_bid and {target.lower()}_ask)")
+            chain[target] = (raw[bid] + raw[ask]) / 2
+        elif match is None:
+            raise ValueError("The option chain needs a strike column")
+        else:
+            chain[target] = raw[match]
+
+    chain = chain.dropna().astype(float)
+    chain = chain.groupby("Strike", as_index=False).mean() #1 row per strike
+    return chain.sort_values("Strike", ignore_index=True)
+
+
+###! ------------------ Strategy Templates ------------------ ###
+
+#* legs: (type, strike slot, quantity, action) | slots are strictly increasing chain strikes
+#* equal_width: all consecutive slots must be the same distance apart (butterfly)
+SCAN_TEMPLATES = {
+    "Straddle": {"slots": 1, "legs": [("Call", 0, 1, "Buy"), ("Put", 0, 1, "Buy")]},
+    "Strangle": {"slots": 2, "legs": [("Put", 0, 1, "Buy"), ("Call", 1, 1, "Buy")]},
+    "Butterfly Spread": {"slots": 3, "equal_width": True, "legs": [("Call", 0, 1, "Buy"), ("Call", 1, 2, "Sell"), ("Call", 2, 1, "Buy")]},
+    "Iron Condor": {"slots": 4, "legs": [("Put", 0, 1, "Buy"), ("Put", 1, 1, "Sell"), ("Call", 2, 1, "Sell"), ("Call", 3, 1, "Buy")]},
+    "Call Ratio Spread": {"slots": 2, "legs": [("Call", 0, 1, "Buy"), ("Call", 1, 2, "Sell")]},
+    "Put Ratio Spread": {"slots": 2, "legs": [("Put", 0, 2, "Sell"), ("Put", 1, 1, "Buy")]},
+    "Call Christmas Tree": {"slots": 3, "legs": [("Call", 0, 1, "Buy"), ("Call", 1, 1, "Sell"), ("Call", 2, 1, "Sell")]},
+    "Put Christmas Tree": {"slots": 3, "legs": [("Put", 0, 1, "Sell"), ("Put", 1, 1, "Sell"), ("Put", 2, 1, "Buy")]},
+}
+
+
+def enumerate_slots(n_strikes, n_slots, max_span):
+    #* all strictly increasing index tuples where neighbouring slots are at most max_span strikes apart
+    combos = np.arange(n_strikes).reshape(-1, 1)
+    for _ in range(n_slots - 1):
+        offsets = np.arange(1, max_span + 1)
+        last = combos[:, -1:] + offsets #every way to place the next slot
+        keep = last < n_strikes
+        rows = np.repeat(combos, len(offsets), axis=0)[keep.ravel()]
+        combos = np.column_stack([rows, last[keep]])
+    return combos
+
+
+def template_positions(template, direction="Long"):
+    sign = 1 if direction == "Long" else -1
+    types = np.array([leg_type for leg_type, _, _, _ in template["legs"]])
+    slots = np.array([slot for _, slot, _, _ in template["legs"]])
+    positions = np.array([quantity * (1 if action == "Buy" else -1) * sign for _, _, quantity, action in template["legs"]], dtype=float)
+    return types, slots, positions
+
+
+###! ------------------ Batched Scoring ------------------ ###
+
+def score_candidates(chain, leg_strike_index, types, positions):
+    strikes = chain["Strike"].to_numpy()
+    premiums = np.where(types == "Call", chain["Call"].to_numpy()[leg_strike_index], chain["Put"].to_numpy()[leg_strike_index]) #(N, L)
+    leg_strikes = strikes[leg_strike_index] #(N, L)
+
+    #* net premium paid (+) or received (-) for every candidate
+    cost = (premiums * positions).sum(axis=1)
+
+    #* P&L at every chain strike: (N, S) accumulated one leg at a time to keep a single (N, S) buffer
+    p_l = np.broadcast_to(-cost[:, None], (len(cost), len(strikes))).copy()
+    for leg in range(len(types)):
+        if types[leg] == "Call":
+            intrinsic = np.maximum(strikes[None, :] - leg_strikes[:, leg:leg+1], 0.0)
+        else:
+            intrinsic = np.maximum(leg_strikes[:, leg:leg+1] - strikes[None, :], 0.0)
+        p_l += positions[leg] * intrinsic
+    p_l[np.abs(p_l) <= PNL_TOLERANCE] = 0.0 #premiums with 2 decimals leave float noise around the breakevens
+
+    #* tail slopes: below the lowest strike only puts are ITM, above the highest strike only calls
+    slope_below = np.full(len(cost), -positions[types == "Put"].sum())
+    slope_above = np.full(len(cost), positions[types == "Call"].sum())
+
+    max_profit = np.where((slope_above > 0) | (slope_below < 0), np.inf, p_l.max(axis=1))
+    max_loss = np.where((slope_above < 0) | (slope_below > 0), -np.inf, p_l.min(axis=1))
+
+    lower_breakeven, upper_breakeven, breakeven_count = batched_breakevens(strikes, p_l, slope_below, slope_above, leg_strike_index)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        reward_risk = np.where(max_loss < 0, max_profit / -max_loss, np.inf)
+
+    return pd.DataFrame({
+        "Cost": cost,
+        "Max Profit": max_profit,
+        "Max Loss": max_loss,
+        "Lower Breakeven": lower_breakeven,
+        "Upper Breakeven": upper_breakeven,
+        "Breakevens": breakeven_count,
+        "Reward/Risk": reward_risk,
+    })
+
+
+def batched_breakevens(strikes, p_l, slope_below, slope_above, leg_strike_index):
+    n = len(p_l)
+    roots_low = np.full(n, np.nan)
+    roots_high = np.full(n, np.nan)
+    count = np.zeros(n, dtype=int)
+
+    def record(mask, roots):
+        #* roots arrive from the lowest price to the highest: the first one per row is the lower breakeven
+        nonlocal count
+        first = mask & np.isnan(roots_low)
+        roots_low[first] = roots[first]
+        roots_high[mask] = roots[mask]
+        count += mask
+
+    #* below the lowest strike
+    with np.errstate(divide="ignore", invalid="ignore"):
+        left = strikes[0] - p_l[:, 0] / slope_below
+    record((slope_below != 0) & (p_l[:, 0] != 0) & (np.sign(p_l[:, 0]) == np.sign(slope_below)), left)
+
+    #* every chain strike interval (the payoff is linear between chain strikes)
+    for s in range(len(strikes)):
+        #* a zero on a chain strike that is not one of the candidate's own strikes is either a crossing
+        #* or part of a flat zero stretch, which only counts at the candidate's strikes (same as the engine)
+        is_vertex = (leg_strike_index == s).any(axis=1)
+        flat_after = (p_l[:, s+1] == 0) if s + 1 < len(strikes) else (slope_above == 0)
+        record((p_l[:, s] == 0) & (is_vertex | ~flat_after), np.full(n, strikes[s]))
+        if s + 1 < len(strikes):
+            crossing = p_l[:, s] * p_l[:, s+1] < 0
+            with np.errstate(divide="ignore", invalid="ignore"):
+                roots = strikes[s] + p_l[:, s] / (p_l[:, s] - p_l[:, s+1]) * (strikes[s+1] - strikes[s])
+            record(crossing, roots)
+
+    #* above the highest strike
+    with np.errstate(divide="ignore", invalid="ignore"):
+        right = strikes[-1] - p_l[:, -1] / slope_above
+    record((slope_above != 0) & (p_l[:, -1] != 0) & (np.sign(p_l[:, -1]) != np.sign(slope_above)), right)
+
+    return roots_low, roots_high, count
+
+
+###! ------------------ Scan a Chain ------------------ ###
+
+def scan_chain(chain, template_name, direction="Long", max_span=10, chunk_size=20_000, rank_by="Reward/Risk", top=None):
+    template = SCAN_TEMPLATES[template_name]
+    types, slots, positions = template_positions(template, direction)
+    strikes = chain["Strike"].to_numpy()
+
+    combos = enumerate_slots(len(strikes), template["slots"], max_span)
+    if template.get("equal_width") and template["slots"] > 2:
+        widths = np.diff(strikes[combos], axis=1)
+        combos = combos[np.isclose(widths, widths[:, :1]).all(axis=1)]
+
+    leg_strike_index = combos[:, slots] #(N, L) chain row of every leg
+
+    #* score in chunks so the (candidates x strikes) P&L matrix stays bounded in memory
+    scored = [score_candidates(chain, leg_strike_index[start:start + chunk_size], types, positions)
+              for start in range(0, len(leg_strike_index), chunk_size)]
+    if not scored:
+        return pd.DataFrame()
+    results = pd.concat(scored, ignore_index=True)
+
+    #* describe the legs of every candidate, e.g. "+1 95.0 Call | -2 100.0 Call | +1 105.0 Call"
+    #* + the numeric legs (chain row, call?, position) that candidate_book turns into a book: labels are for display only
+    for leg, (leg_type, position) in enumerate(zip(types, positions)):
+        results.insert(leg, f"Leg {leg + 1}", [f"{position:+.0f} {strike:.10g} {leg_type}" for strike in strikes[leg_strike_index[:, leg]]])
+        for column, values in zip(leg_data_columns(leg + 1), (leg_strike_index[:, leg], leg_type == "Call", position)):
+            results[column] = values
+
+    #* best first: highest reward/risk, profit or (least negative) loss, cheapest cost
+    results = results.sort_values([rank_by, "Cost"], ascending=[rank_by == "Cost", True], kind="stable", ignore_index=True)
+    return results.head(top) if top else results
+
+
+def leg_data_columns(leg):
+    #* numeric columns of leg n (from 1) of a candidate: chain row of its strike, call (True) or put, signed position
+    return f"Leg {leg} Row", f"Leg {leg} Call", f"Leg {leg} Position"
+
+
+def candidates_display(candidates):
+    #* the candidates without their numeric leg columns (the Leg n labels describe the same legs)
+    return candidates.drop(columns=[column for column in candidates.columns if column.split()[-1] in ("Row", "Call", "Position") and column.startswith("Leg ")])
+
+
+def candidate_book(candidate, chain):
+    #* convert a candidate row (scanner or tail-hedge optimizer) into the session state rows of the app, priced from the
+    #* chain it was scored on; a leg with no chain row (NaN) is a leg this candidate does not use
+    book = {"call_inputs": [], "put_inputs": []}
+    leg = 1
+    while leg_data_columns(leg)[0] in candidate.index:
+        row, is_call, position = (candidate[column] for column in leg_data_columns(leg))
+        leg += 1
+        if pd.isna(row):
+            continue
+        leg_type = "Call" if is_call else "Put"
+        key = "call_inputs" if is_call else "put_inputs"
+        book[key].append([leg_type, float(chain["Strike"].iloc[int(row)]), int(abs(position)), "Buy" if position > 0 else "Sell",
+                          float(chain[leg_type].iloc[int(row)])])
+    return book
@@ -0,0 +1,221 @@
+### ------------------ Tail-Hedge Optimizer ------------------ ###
+#* Cheapest set of option legs from a local chain that, added to the current book, caps its unbounded tails:
+#*  - slope below the lowest strike <= max_tail_slope (no unlimited loss if the stock falls),
+#*  - slope above the highest strike >= -max_tail_slope (no unlimited loss if the stock rises),
+#*  - and, optionally, a max loss no worse than -max_loss.
+#* The pool of hedge legs is every out-of-the-money chain option (calls above the spot, puts below it) x (Buy, Sell) x
+#* quantity 1..max_quantity: sold legs finance bought ones, and in-the-money legs are left out because trading them
+#* mostly swaps premium for intrinsic value (a "cheap" hedge that only sells deep ITM options is no hedge). Combinations of 1..max_legs legs are enumerated smallest first and scored in batches by payoff
+#* superposition on 1 price grid (chain strikes + book strikes, exact for piecewise linear payoffs):
+#*   book P&L at the grid + Σ leg P&L at the grid, tail slopes = book tails + Σ leg tails.
+#* The tail slopes are checked first (1 add per leg), only combinations that cap both tails get their P&L evaluated.
+#* Candidates are ranked by hedge cost + the worst-case loss the hedge legs add beyond their cost (their own P&L on the
+#* grid and in the tails): a hedge that pays for the cap by selling risk elsewhere (e.g. a credit put spread) is charged
+#* for that risk instead of being rewarded for its credit.
+#* The search stops at the end of the time budget and returns the best candidates found so far, best first.
+#* Run from the repository root: python tail_hedge.py chain.csv --template call_ratio --max-loss 5 --budget 2
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+from strategy_scanner import leg_data_columns
+from what_if import evaluate
+
+
+TAIL_HEDGE_MAX_LEGS = 3
+TAIL_HEDGE_MAX_QUANTITY = 3
+TAIL_HEDGE_BUDGET_SECONDS = 2.0
+TAIL_HEDGE_BATCH = 20_000
+TAIL_HEDGE_TOP = 25
+
+
+###! ------------------ Pool of Hedge Legs ------------------ ###
+
+def chain_spot(chain):
+    #* spot implied by put-call parity at the strike where call and put prices are closest (rates ignored)
+    gap = (chain["Call"] - chain["Put"]).to_numpy(dtype=float)
+    atm = int(np.argmin(np.abs(gap)))
+    return float(chain["Strike"].iloc[atm] + gap[atm])
+
+
+def hedge_pool(chain, spot=None, max_quantity=TAIL_HEDGE_MAX_QUANTITY):
+    #* every out-of-the-money (type, strike, signed quantity) leg the chain offers, priced at its chain price
+    #* (Row: position of its strike in the chain, for strategy_scanner.candidate_book)
+    spot = chain_spot(chain) if spot is None else spot
+    quantities = np.concatenate([np.arange(1, max_quantity + 1), -np.arange(1, max_quantity + 1)]).astype(float)
+    rows = []
+    for leg_type in ("Call", "Put"):
+        otm = np.flatnonzero(chain["Strike"] >= spot) if leg_type == "Call" else np.flatnonzero(chain["Strike"] <= spot)
+        strikes, prices = chain["Strike"].to_numpy(dtype=float)[otm], chain[leg_type].to_numpy(dtype=float)[otm]
+        rows.append(pd.DataFrame({
+            "Row": np.repeat(otm, len(quantities)),
+            "Type": leg_type,
+            "Strike": np.repeat(strikes, len(quantities)),
+            "Position": np.tile(quantities, len(strikes)),
+            "Price": np.repeat(prices, len(quantities)),
+        }))
+    pool = pd.concat(rows, ignore_index=True)
+    return pool[pool["Price"] > 0].reset_index(drop=True) #no quote, no leg
+
+
+def pool_arrays(pool, grid):
+    #* per pool leg: P&L at the grid (legs, G), tail slopes and cost; key of its (type, strike) to forbid 2 legs on 1 option
+    calls = (pool["Type"] == "Call").to_numpy()
+    strikes = pool["Strike"].to_numpy(dtype=float)
+    positions = pool["Position"].to_numpy(dtype=float)
+    cost = positions * pool["Price"].to_numpy(dtype=float) #paid (+) or received (-)
+
+    intrinsic = np.where(calls[:, None], np.maximum(grid[None, :] - strikes[:, None], 0.0), np.maximum(strikes[:, None] - grid[None, :], 0.0))
+    p_l = positions[:, None] * intrinsic - cost[:, None]
+    slope_below = np.where(calls, 0.0, -positions)
+    slope_above = np.where(calls, positions, 0.0)
+    option_key = pd.factorize(pool["Type"] + "|" + pool["Strike"].astype(str))[0]
+    return p_l, slope_below, slope_above, cost, option_key
+
+
+###! ------------------ Batched Search ------------------ ###
+
+def combination_batches(n_pool, n_legs, batch_size):
+    #* (batch, n_legs) index arrays of the combinations of n_legs pool legs, in lexicographic order
+    combinations = itertools.combinations(range(n_pool), n_legs)
+    while True:
+        flat = np.fromiter(itertools.chain.from_iterable(itertools.islice(combinations, batch_size)), dtype=np.int32)
+        if not len(flat):
+            return
+        yield flat.reshape(-1, n_legs)
+
+
+def optimize_tail_hedge(base, chain, max_tail_slope=0.0, max_loss=None, spot=None, max_legs=TAIL_HEDGE_MAX_LEGS,
+                        max_quantity=TAIL_HEDGE_MAX_QUANTITY, time_budget=TAIL_HEDGE_BUDGET_SECONDS,
+                        batch_size=TAIL_HEDGE_BATCH, top=TAIL_HEDGE_TOP):
+    #* base: what_if.Piecewise of the current book, chain: strategy_scanner.load_chain frame, spot: parity-implied if None
+    #* returns the ranked candidates (lowest cost + added loss first) and the search statistics
+    start = time.perf_counter()
+    grid = np.union1d(chain["Strike"].to_numpy(dtype=float), base.strikes)
+    base_p_l = evaluate(base, grid)
+    base_below, base_above = float(base.slopes[0]), float(base.slopes[-1])
+
+    pool = hedge_pool(chain, spot, max_quantity)
+    pool_p_l, pool_below, pool_above, pool_cost, option_key = pool_arrays(pool, grid)
+
+    found_index, found_cost, found_loss, found_added = [], [], [], []
+    stats = {"Evaluated": 0, "Feasible": 0, "Exhausted": True, "Seconds": 0.0}
+
+    for n_legs in range(1, max_legs + 1):
+        for batch in combination_batches(len(pool), n_legs, batch_size):
+            if time.perf_counter() - start > time_budget:
+                stats["Exhausted"] = False
+                break
+            stats["Evaluated"] += len(batch)
+
+            #* tails first: only candidates that cap both tails get their P&L on the grid
+            slope_below = base_below + pool_below[batch].sum(axis=1)
+            slope_above = base_above + pool_above[batch].sum(axis=1)
+            keep = (slope_below <= max_tail_slope) & (slope_above >= -max_tail_slope)
+            if n_legs > 1: #1 leg per option (type, strike)
+                keys = np.sort(option_key[batch], axis=1)
+                keep &= (np.diff(keys, axis=1) != 0).all(axis=1)
+            batch = batch[keep]
+            if not len(batch):
+                continue
+
+            hedge_p_l = pool_p_l[batch].sum(axis=1) #(candidates, G)
+            worst = (base_p_l + hedge_p_l).min(axis=1)
+            losing_tail = (slope_below[keep] > 0) | (slope_above[keep] < 0)
+            worst[losing_tail] = -np.inf
+            if max_loss is not None:
+                within = worst >= -max_loss
+                batch, worst, hedge_p_l = batch[within], worst[within], hedge_p_l[within]
+
+            #* the hedge legs on their own: worst P&L on the grid, or unlimited if their own tails lose
+            cost = pool_cost[batch].sum(axis=1)
+            hedge_worst = hedge_p_l.min(axis=1)
+            hedge_worst[(pool_below[batch].sum(axis=1) > 0) | (pool_above[batch].sum(axis=1) < 0)] = -np.inf
+
+            found_index.extend(batch.tolist())
+            found_cost.append(cost)
+            found_loss.append(worst)
+            found_added.append(np.maximum(-hedge_worst - cost, 0.0)) #bought options lose at most their cost: 0
+            stats["Feasible"] += len(batch)
+
+            #* keep only the best `top` so far (bounded memory whatever the budget)
+            if len(found_index) > 4 * top:
+                found_index, found_cost, found_loss, found_added = best_candidates(found_index, found_cost, found_loss, found_added, top)
+        if not stats["Exhausted"]:
+            break
+
+    stats["Seconds"] = time.perf_counter() - start
+    found_index, found_cost, found_loss, found_added = best_candidates(found_index, found_cost, found_loss, found_added, top)
+    return candidates_frame(pool, found_index, *(found[0] if found else np.empty(0) for found in (found_cost, found_loss, found_added)), base), stats
+
+
+def best_candidates(found_index, found_cost, found_loss, found_added, top):
+    if not found_index:
+        return [], [], [], []
+    cost, loss, added = np.concatenate(found_cost), np.concatenate(found_loss), np.concatenate(found_added)
+    legs = np.array([len(index) for index in found_index])
+    order = np.lexsort((legs, -loss, cost + added))[:top] #lowest cost + added loss, then the smallest max loss, then the fewest legs
+    return [found_index[i] for i in order], [cost[order]], [loss[order]], [added[order]]
+
+
+def candidates_frame(pool, found_index, cost, loss, added, base):
+    #* the Hedge label is for display, the numeric leg columns (strategy_scanner.leg_data_columns, NaN for the legs a
+    #* shorter hedge doesn't have) are what strategy_scanner.candidate_book turns into a book
+    labels = (pool["Position"].map("{:+.0f}".format) + " " + pool["Strike"].map("{:.10g}".format) + " " + pool["Type"]).to_numpy()
+    frame = pd.DataFrame({
+        "Hedge": [" | ".join(labels[index]) for index in found_index],
+        "Hedge Cost": cost,
+        "Added Loss": added,
+        "Total Cost": base.cost + cost,
+        "Max Loss": loss,
+        "Legs": [len(index) for index in found_index],
+    }, columns=["Hedge", "Hedge Cost", "Added Loss", "Total Cost", "Max Loss", "Legs"])
+
+    n_legs = max((len(index) for index in found_index), default=0)
+    padded = np.full((len(found_index), n_legs), -1)
+    for candidate, index in enumerate(found_index):
+        padded[candidate, :len(index)] = index
+    missing = padded < 0
+    for leg in range(n_legs):
+        legs = pool.iloc[padded[:, leg]]
+        for column, values in zip(leg_data_columns(leg + 1), (legs["Row"], legs["Type"] == "Call", legs["Position"])):
+            frame[column] = np.where(missing[:, leg], np.nan, values.to_numpy(dtype=float))
+    return frame
+
+
+def main():
+    from benchmarks.synthetic_books import book_frames, template_book
+    from payoff_engine import evaluate_portfolio
+    from strategy_scanner import candidates_display, load_chain
+    from what_if import result_piecewise
+
+    parser = argparse.ArgumentParser(description="Cheapest chain legs that cap the unbounded tails of a template book")
+    parser.add_argument("chain", help="CSV option chain (strategy_scanner.load_chain layout)")
+    parser.add_argument("--template", default="call_ratio", help="strategy template of benchmarks.synthetic_books")
+    parser.add_argument("--max-loss", type=float, default=None, help="max loss allowed after the hedge")
+    parser.add_argument("--max-tail-slope", type=float, default=0.0)
+    parser.add_argument("--spot", type=float, default=None, help="out-of-the-money split of the chain (put-call parity if not given)")
+    parser.add_argument("--max-legs", type=int, default=TAIL_HEDGE_MAX_LEGS)
+    parser.add_argument("--max-quantity", type=int, default=TAIL_HEDGE_MAX_QUANTITY)
+    parser.add_argument("--budget", type=float, default=TAIL_HEDGE_BUDGET_SECONDS, help="time budget in seconds")
+    args = parser.parse_args()
+
+    chain = load_chain(args.chain)
+    center = float(chain["Strike"].median())
+    base = result_piecewise(evaluate_portfolio(*book_frames(template_book(args.template, center=center))))
+    ranked, stats = optimize_tail_hedge(base, chain, args.max_tail_slope, args.max_loss, args.spot, args.max_legs, args.max_quantity, args.budget)
+
+    print(f"tails of the book: {base.slopes[0]:+g} below, {base.slopes[-1]:+g} above | "
+          f"{stats['Evaluated']:,} combinations, {stats['Feasible']:,} feasible in {stats['Seconds']:.2f}s"
+          f"{'' if stats['Exhausted'] else ' (time budget reached)'}")
+    with pd.option_context("display.width", 200, "display.max_colwidth", 80):
+        print(candidates_display(ranked).round(2).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
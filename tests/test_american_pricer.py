@@ -0,0 +1,46 @@
+### ------------------ American Lattice Pricer ------------------ ###
+#* Without dividends an American call is never exercised early: the lattice must give the Black-Scholes value.
+
+import numpy as np
+import pytest
+
+from american_pricer import LATTICE_TOLERANCE, american_prices, black_scholes
+
+
+SPOTS = np.linspace(60.0, 140.0, 17)
+STRIKES = np.array([80.0, 100.0, 120.0])
+
+
+@pytest.mark.parametrize("time_to_expiry, vol, rate", [(30 / 252, 0.25, 0.0), (0.5, 0.3, 0.04), (1.0, 0.5, 0.02)])
+def test_calls_without_dividend_match_black_scholes(time_to_expiry, vol, rate):
+    values, deltas, steps, converged = american_prices(SPOTS, STRIKES, np.ones(3, dtype=bool), time_to_expiry, vol, rate)
+    assert converged and steps <= 1024
+    expected = black_scholes(SPOTS[:, None], STRIKES[None, :], 1.0, time_to_expiry, vol, rate, 0.0)
+    assert np.allclose(values, expected, atol=2 * LATTICE_TOLERANCE)
+
+    #* delta vs a central difference of the closed form
+    bump = 1e-4 * SPOTS[:, None]
+    expected_delta = (black_scholes(SPOTS[:, None] + bump, STRIKES[None, :], 1.0, time_to_expiry, vol, rate, 0.0)
+                      - black_scholes(SPOTS[:, None] - bump, STRIKES[None, :], 1.0, time_to_expiry, vol, rate, 0.0)) / (2 * bump)
+    assert np.allclose(deltas, expected_delta, atol=1e-2)
+
+
+def test_puts_are_worth_at_least_their_european_value_and_intrinsic():
+    values, _, _, converged = american_prices(SPOTS, STRIKES, np.zeros(3, dtype=bool), 0.5, 0.3, 0.05)
+    assert converged
+    european = black_scholes(SPOTS[:, None], STRIKES[None, :], -1.0, 0.5, 0.3, 0.05, 0.0)
+    assert (values >= european - LATTICE_TOLERANCE).all()
+    assert (values >= np.maximum(STRIKES[None, :] - SPOTS[:, None], 0.0) - 1e-9).all()
+    assert values[0, 1] > european[0, 1] + 0.1 #deep in the money: early exercise is worth something
+
+
+def test_expired_legs_are_intrinsic():
+    values, deltas, steps, converged = american_prices([90.0, 110.0], [100.0, 100.0], [True, False], 0.0, 0.3)
+    assert np.array_equal(values, [[0.0, 10.0], [10.0, 0.0]])
+    assert np.array_equal(deltas, [[0.0, -1.0], [1.0, 0.0]])
+    assert (steps, converged) == (0, True)
+
+
+def test_not_converged_at_max_steps():
+    _, _, steps, converged = american_prices(SPOTS, [100.0], [False], 5.0, 0.25, 0.04, tolerance=1e-9, max_steps=128)
+    assert (steps, converged) == (128, False)
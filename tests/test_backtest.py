@@ -0,0 +1,80 @@
+### ------------------ Backtest ------------------ ###
+#* A bull call spread opened on every row of a short, hand-computed price series.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import backtest, book_strategy, outcome_summary, read_price_series
+from benchmarks.synthetic_books import book_frames
+
+
+#* +1 100 Call @ 5, -1 110 Call @ 2, priced at spot 100: -3 below 100, +7 above 110
+BULL_CALL = {"call_inputs": [("Call", 100.0, 1, "Buy", 5.0), ("Call", 110.0, 1, "Sell", 2.0)], "put_inputs": [], "underlying_inputs": []}
+
+
+@pytest.fixture
+def strategy():
+    return book_strategy(*book_frames(BULL_CALL), reference_spot=100.0)
+
+
+def test_relative_strategy(strategy):
+    assert np.allclose(strategy["strikes"], [1.0, 1.1])
+    assert np.allclose(strategy["slopes"], [0.0, 1.0, 0.0])
+    assert np.allclose(strategy["intercepts"], [-0.03, -1.03, 0.07])
+
+
+def test_one_row_horizon(strategy):
+    closes = pd.Series([100.0, 120.0, 90.0, 100.0, 104.0], index=pd.date_range("2024-01-01", periods=5))
+    outcomes = backtest(closes, {"Bull Call": strategy}, horizon=1)
+
+    #* entry S0 -> S1, P&L = S0 · f(S1 / S0) with strikes 1.0 S0, 1.1 S0 and premiums 0.05 S0, 0.02 S0
+    #*   100 -> 120: above 110              +7
+    #*   120 ->  90: below 120              -3.6
+    #*    90 -> 100: above 99               +6.3
+    #*   100 -> 104: 104 - 100 - 3          +1
+    assert outcomes.index.equals(closes.index[:-1])
+    assert np.allclose(outcomes["Bull Call"], [7.0, -3.6, 6.3, 1.0])
+
+
+def test_longer_horizon_and_chunks(strategy):
+    closes = np.array([100.0, 105.0, 120.0, 96.0, 80.0, 88.0])
+    outcomes = backtest(closes, {"Bull Call": strategy}, horizon=2, chunk_size=1) #1 entry per chunk
+    #* 100 -> 120: +7 | 105 -> 96: -0.03 · 105 | 120 -> 80: -0.03 · 120 | 96 -> 88: -0.03 · 96
+    assert np.allclose(outcomes["Bull Call"], [7.0, -3.15, -3.6, -2.88])
+
+
+def test_stacked_strategies_match_one_by_one(strategy):
+    long_call = book_strategy(*book_frames({"call_inputs": [("Call", 100.0, 2, "Buy", 4.0)], "put_inputs": [], "underlying_inputs": []}), 100.0)
+    closes = 100 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.02, 300)))
+    stacked = backtest(closes, {"Bull Call": strategy, "Long Call": long_call}, horizon=5)
+    assert np.allclose(stacked["Bull Call"], backtest(closes, {"Bull Call": strategy}, horizon=5)["Bull Call"])
+    assert np.allclose(stacked["Long Call"], 2 * (np.maximum(closes[5:] - closes[:-5], 0.0) - 0.04 * closes[:-5]))
+
+
+def test_too_short_series(strategy):
+    with pytest.raises(ValueError, match="more than 3 rows"):
+        backtest([100.0, 101.0, 102.0], {"Bull Call": strategy}, horizon=3)
+
+
+def test_outcome_summary(strategy):
+    outcomes = backtest([100.0, 120.0, 90.0, 100.0, 104.0], {"Bull Call": strategy}, horizon=1)
+    summary = outcome_summary(outcomes).loc["Bull Call"]
+    assert summary["Mean"] == pytest.approx((7.0 - 3.6 + 6.3 + 1.0) / 4)
+    assert summary["Min"] == pytest.approx(-3.6)
+    assert summary["Max"] == pytest.approx(7.0)
+    assert summary["Win Rate"] == pytest.approx(0.75)
+    assert summary["Expected Shortfall (5%)"] == pytest.approx(-3.6)
+    assert summary["Entries"] == 4
+
+
+def test_read_price_series_sorts_by_date(tmp_path):
+    path = tmp_path / "prices.csv"
+    path.write_text("Date,Open,Close\n2024-01-03,1,102\n2024-01-01,1,100\n2024-01-02,1,\n2024-01-04,1,99\n")
+    closes = read_price_series(str(path))
+    assert closes.tolist() == [100.0, 102.0, 99.0]
+    assert closes.index[0] == pd.Timestamp("2024-01-01")
+
+    path.write_text("Date,Volume\n2024-01-01,5\n")
+    with pytest.raises(ValueError, match="close"):
+        read_price_series(str(path))
@@ -0,0 +1,106 @@
+### ------------------ Book History ------------------ ###
+#* Undo / redo over the operations of the app (add, swap Buy - Sell, reset) and the payoff results kept per entry.
+
+from book_history import BookHistory, take_snapshot
+
+
+KEYS = ("call_inputs", "put_inputs", "underlying_inputs")
+
+
+def swapped(rows):
+    return [[*row[:3], "Sell" if row[3] == "Buy" else "Buy", *row[4:]] for row in rows]
+
+
+def test_undo_redo_across_swap_and_reset():
+    history = BookHistory(KEYS)
+    books = {"call_inputs": [], "put_inputs": [], "underlying_inputs": []}
+
+    books["call_inputs"].append(["Call", 100.0, 2, "Buy", 3.0])
+    history.record(books, "Buy 2 Call")
+    books["put_inputs"].append(["Put", 95.0, 1, "Sell", 2.0])
+    history.record(books, "Sell 1 Put")
+    books["call_inputs"] = swapped(books["call_inputs"])
+    history.record(books, "Swap Call Buy - Sell")
+    books["call_inputs"] = []
+    history.record(books, "Reset Calls")
+    assert [entry.label for entry in history.entries] == ["Empty books", "Buy 2 Call", "Sell 1 Put", "Swap Call Buy - Sell", "Reset Calls"]
+
+    assert history.undo() == "Reset Calls"
+    assert history.restore() == {"call_inputs": [["Call", 100.0, 2, "Sell", 3.0]], "put_inputs": [["Put", 95.0, 1, "Sell", 2.0]], "underlying_inputs": []}
+    assert history.undo() == "Swap Call Buy - Sell"
+    assert history.restore()["call_inputs"] == [["Call", 100.0, 2, "Buy", 3.0]]
+    assert history.redo() == "Swap Call Buy - Sell"
+    assert history.restore()["call_inputs"] == [["Call", 100.0, 2, "Sell", 3.0]]
+    assert history.redo() == "Reset Calls"
+    assert history.restore()["call_inputs"] == []
+    assert not history.can_redo()
+
+    while history.can_undo():
+        history.undo()
+    assert history.restore() == {key: [] for key in KEYS}
+
+
+def test_restore_gives_fresh_lists():
+    history = BookHistory(KEYS)
+    history.record({"call_inputs": [["Call", 100.0, 1, "Buy", 5.0]]}, "Buy 1 Call")
+    restored = history.restore()
+    restored["call_inputs"][0][3] = "Sell"
+    restored["call_inputs"].append(["Call", 110.0, 1, "Sell", 2.0])
+    assert history.restore()["call_inputs"] == [["Call", 100.0, 1, "Buy", 5.0]]
+
+
+def test_unchanged_books_are_not_recorded_and_are_shared():
+    history = BookHistory(KEYS)
+    books = {"call_inputs": [["Call", 100.0, 1, "Buy", 5.0]], "put_inputs": [["Put", 90.0, 1, "Buy", 1.0]]}
+    first = history.record(books, "Add")
+    assert history.record({key: [list(row) for row in rows] for key, rows in books.items()}, "Edit books") is first
+    assert len(history.entries) == 2
+
+    books["call_inputs"] = swapped(books["call_inputs"])
+    second = history.record(books, "Swap Call Buy - Sell")
+    assert second[1] is first[1] #the untouched put book is the same tuple
+    assert second[0] != first[0]
+
+
+def test_new_operation_after_undo_drops_the_redo_branch():
+    history = BookHistory(KEYS)
+    history.record({"call_inputs": [["Call", 100.0, 1, "Buy", 5.0]]}, "Buy 1 Call")
+    history.record({"call_inputs": [["Call", 100.0, 1, "Buy", 5.0]], "put_inputs": [["Put", 90.0, 1, "Buy", 1.0]]}, "Buy 1 Put")
+    history.undo()
+    history.record({"call_inputs": []}, "Reset Calls")
+    assert [entry.label for entry in history.entries] == ["Empty books", "Buy 1 Call", "Reset Calls"]
+    assert not history.can_redo()
+
+
+def test_results_follow_undo_redo_and_are_trimmed_with_their_entry():
+    history = BookHistory(KEYS, max_entries=3)
+    history.record({"call_inputs": [["Call", 100.0, 1, "Buy", 5.0]]}, "Buy 1 Call")
+    assert history.cached_result("Main") is None
+    history.store_result("Main", "result 1")
+    history.record({"call_inputs": [["Call", 100.0, 1, "Sell", 5.0]]}, "Swap Call Buy - Sell")
+    history.store_result("Main", "result 2")
+    history.store_result("Other", "result 2 other")
+
+    history.undo()
+    assert history.cached_result("Main") == "result 1" #no recompute on undo
+    assert history.cached_result("Other") is None #not evaluated for this view
+    history.redo()
+    assert (history.cached_result("Main"), history.cached_result("Other")) == ("result 2", "result 2 other")
+
+    #* 2 more entries: "Buy 1 Call" (and its result) falls out of the 3 entry log
+    history.record({"call_inputs": []}, "Reset Calls")
+    history.record({"put_inputs": [["Put", 90.0, 1, "Buy", 1.0]]}, "Buy 1 Put")
+    assert [entry.label for entry in history.entries] == ["Swap Call Buy - Sell", "Reset Calls", "Buy 1 Put"]
+    assert all("result 1" not in entry.results.values() for entry in history.entries)
+    history.undo()
+    history.undo()
+    assert history.cached_result("Main") == "result 2"
+    assert not history.can_undo()
+
+
+def test_take_snapshot_reuses_equal_legs():
+    previous = take_snapshot({"call_inputs": [["Call", 100.0, 1, "Buy", 5.0], ["Call", 110.0, 1, "Sell", 2.0]]}, KEYS)
+    snapshot = take_snapshot({"call_inputs": [["Call", 100.0, 1, "Buy", 5.0], ["Call", 110.0, 2, "Sell", 2.0]]}, KEYS, previous)
+    assert snapshot[0][0] is previous[0][0]
+    assert snapshot[0][1] == ("Call", 110.0, 2, "Sell", 2.0)
+    assert snapshot[1] is previous[1]
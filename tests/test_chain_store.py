@@ -0,0 +1,67 @@
+### ------------------ ChainStore ------------------ ###
+#* Quote lookups of a small hand-written archive (both layouts) and the rejection of a strike quoted twice in 1 chain.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from chain_store import ChainStore, build_chain_store, pa
+
+
+def quotes():
+    #* 2 quote dates x 1 expiry x (Call, Put) x strikes 90, 100, 110, in shuffled order: the build sorts them
+    rows = []
+    for day, shift in (("2024-01-02", 0.0), ("2024-01-03", 1.0)):
+        for strike in (110.0, 90.0, 100.0):
+            rows.append((day, "2024-02-16", "C", strike, max(100.0 - strike, 0.0) + 2.0 + shift, max(100.0 - strike, 0.0) + 2.5 + shift))
+            rows.append((day, "2024-02-16", "P", strike, max(strike - 100.0, 0.0) + 1.0 + shift, max(strike - 100.0, 0.0) + 1.2 + shift))
+    return pd.DataFrame(rows, columns=["quote_date", "expiry", "type", "strike", "bid", "ask"])
+
+
+@pytest.fixture(params=[False, pytest.param(True, marks=pytest.mark.skipif(pa is None, reason="pyarrow is not installed"))],
+                ids=["numpy", "arrow"])
+def store(request, tmp_path):
+    return build_chain_store(quotes(), str(tmp_path / "archive"), arrow=request.param)
+
+
+def test_quote(store):
+    assert len(store) == 12
+    assert store.quote("2024-02-16", 90.0, "Call", quote_date="2024-01-02") == {"bid": 12.0, "ask": 12.5, "mid": 12.25}
+    assert store.quote("2024-02-16", 110.0, "Put", quote_date="2024-01-02") == pytest.approx({"bid": 11.0, "ask": 11.2, "mid": 11.1})
+    #* no quote date: the latest one
+    assert store.quote("2024-02-16", 100.0, "Call") == {"bid": 3.0, "ask": 3.5, "mid": 3.25}
+
+
+def test_quote_misses(store):
+    assert store.quote("2024-02-16", 95.0, "Call") is None #strike between 2 quoted ones
+    assert store.quote("2024-02-16", 120.0, "Put") is None #above the chain
+    assert store.quote("2024-03-15", 100.0, "Call") is None #unknown expiry
+    assert store.quote("2024-02-16", 100.0, "Call", quote_date="2023-12-29") is None
+
+
+def test_chain_frame(store):
+    frame = store.chain_frame("2024-02-16", quote_date="2024-01-02")
+    assert frame["Strike"].tolist() == [90.0, 100.0, 110.0]
+    assert np.allclose(frame["Call"], [12.25, 2.25, 2.25])
+    assert np.allclose(frame["Put"], [1.1, 1.1, 11.1])
+
+
+def test_reopened_archive(store):
+    reopened = ChainStore(store.directory)
+    assert [str(day) for day in reopened.quote_dates()] == ["2024-01-02", "2024-01-03"]
+    assert reopened.quote("2024-02-16", 90.0, "Call", quote_date="2024-01-02")["mid"] == 12.25
+
+
+def test_duplicate_strike_is_rejected(tmp_path):
+    frame = quotes()
+    frame = pd.concat([frame, frame.iloc[[2]]], ignore_index=True) #a 2nd quote of the 90 Call of 2024-01-02
+    with pytest.raises(ValueError, match="Strike 90 is quoted more than once for the Call chain expiring 2024-02-16"):
+        build_chain_store(frame, str(tmp_path / "archive"))
+
+
+def test_same_strike_in_other_chains_is_allowed(tmp_path):
+    #* 1 strike per chain, the same strike across types, expiries and quote dates is what every archive has
+    frame = quotes()
+    other_expiry = frame.assign(expiry="2024-03-15")
+    store = build_chain_store(pd.concat([frame, other_expiry], ignore_index=True), str(tmp_path / "archive"))
+    assert store.quote("2024-03-15", 90.0, "Call")["mid"] == 13.25
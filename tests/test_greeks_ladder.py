@@ -0,0 +1,73 @@
+### ------------------ Greeks Ladder ------------------ ###
+#* Leg greeks vs finite differences of a closed-form Black-Scholes price (math.erf, independent of pricing.normal_cdf),
+#* and the scatter-add of the ladder vs summing the legs of every bucket by hand.
+
+import math
+
+import numpy as np
+import pytest
+
+from greeks_ladder import GREEKS, greeks_ladder, leg_greeks
+from pricing import TRADING_DAYS
+
+
+def bs_price(spot, strike, call, time_to_expiry, vol, rate):
+    cdf = lambda x: 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
+    d1 = (math.log(spot / strike) + (rate + 0.5 * vol ** 2) * time_to_expiry) / (vol * math.sqrt(time_to_expiry))
+    d2 = d1 - vol * math.sqrt(time_to_expiry)
+    call_price = spot * cdf(d1) - strike * math.exp(-rate * time_to_expiry) * cdf(d2)
+    return call_price if call else call_price - spot + strike * math.exp(-rate * time_to_expiry) #put-call parity
+
+
+def finite_difference_greeks(spot, strike, call, time_to_expiry, vol, rate):
+    price = lambda s=spot, t=time_to_expiry, v=vol: bs_price(s, strike, call, t, v, rate)
+    h, dv, dt = 1e-3 * spot, 1e-5, 1e-6
+    return np.array([
+        (price(s=spot + h / 10) - price(s=spot - h / 10)) / (h / 5),
+        (price(s=spot + h) - 2 * price() + price(s=spot - h)) / h ** 2,
+        (price(v=vol + dv) - price(v=vol - dv)) / (2 * dv) / 100, #per vol point
+        -(price(t=time_to_expiry + dt) - price(t=time_to_expiry - dt)) / (2 * dt) / TRADING_DAYS, #per trading day
+    ])
+
+
+@pytest.mark.parametrize("spot, vol, days, rate", [(100.0, 0.25, 30, 0.0), (92.0, 0.4, 126, 0.05), (130.0, 0.15, 5, 0.02)])
+def test_leg_greeks_match_black_scholes(spot, vol, days, rate):
+    strikes = np.array([80.0, 95.0, 100.0, 105.0, 120.0] * 2)
+    calls = np.repeat([True, False], 5)
+    greeks = leg_greeks(spot, strikes, calls, days / TRADING_DAYS, vol, rate)
+    assert greeks.shape == (4, 10)
+    for leg, (strike, call) in enumerate(zip(strikes, calls)):
+        expected = finite_difference_greeks(spot, strike, call, days / TRADING_DAYS, vol, rate)
+        assert greeks[:, leg] == pytest.approx(expected, rel=1e-4, abs=1e-6)
+
+
+def test_expired_legs_only_have_intrinsic_delta():
+    greeks = leg_greeks(100.0, [90.0, 110.0, 90.0, 110.0], [True, True, False, False], 0.0, 0.25)
+    assert np.array_equal(greeks[0], [1.0, 0.0, 0.0, -1.0])
+    assert not greeks[1:].any()
+
+
+def test_ladder_buckets_and_expiries():
+    strikes = np.array([91.0, 94.0, 96.0, 101.0, 101.0])
+    calls = np.array([True, False, True, True, False])
+    positions = np.array([1.0, -2.0, 3.0, 1.0, 1.0])
+    days = np.array([30.0, 30.0, 30.0, 30.0, 60.0])
+    ladder = greeks_ladder(strikes, calls, positions, 100.0, 0.3, days, rate=0.01, bucket_width=5.0, underlying_position=-2)
+
+    assert ladder[["Bucket", "Expiry"]].values.tolist()[:-1] == [["90-95", 30.0], ["95-100", 30.0], ["100-105", 30.0], ["100-105", 60.0]]
+    exposures = leg_greeks(100.0, strikes, calls, days / TRADING_DAYS, 0.3, 0.01) * positions
+    expected = [exposures[:, [0, 1]].sum(axis=1), exposures[:, 2], exposures[:, 3], exposures[:, 4]]
+    assert np.allclose(ladder[list(GREEKS)].to_numpy()[:-1], expected)
+
+    underlying = ladder.iloc[-1]
+    assert underlying["Bucket"] == "Underlying"
+    assert (underlying["Delta"], underlying["Gamma"], underlying["Vega"], underlying["Theta"]) == (-2.0, 0.0, 0.0, 0.0)
+    assert ladder["Delta"].sum() == pytest.approx(exposures[0].sum() - 2)
+
+
+def test_straddle_is_delta_neutral_at_the_money_forward():
+    #* no rate: an ATM call has delta N(σ√T / 2), the put N(σ√T / 2) - 1, the straddle 2 N(σ√T / 2) - 1 > 0 (small)
+    ladder = greeks_ladder([100.0, 100.0], [True, False], [1.0, 1.0], 100.0, 0.2, 63)
+    sigma_root_t = 0.2 * math.sqrt(63 / TRADING_DAYS)
+    assert ladder["Delta"].iloc[0] == pytest.approx(math.erf(sigma_root_t / 2 / math.sqrt(2.0)), abs=1e-6)
+    assert ladder["Gamma"].iloc[0] > 0 and ladder["Vega"].iloc[0] > 0 and ladder["Theta"].iloc[0] < 0
@@ -0,0 +1,38 @@
+### ------------------ PayoffEvaluator ------------------ ###
+#* The evaluator built from the strike vertices of a pipeline result vs the kernel it wraps and a hand-computed payoff.
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic_books import book_frames, random_book, template_book
+from payoff_engine import PayoffEvaluator, evaluate_portfolio
+from payoff_kernels import evaluate_piecewise
+
+
+def test_bull_call_spread_by_hand():
+    #* +1 100 Call @ 5, -1 110 Call @ 2: -3 below 100, +7 above 110, linear in between
+    evaluator = PayoffEvaluator(np.array([100.0, 110.0]), np.array([-3.0, 7.0]), np.array([0.0, 1.0, 0.0]))
+    prices = np.array([50.0, 100.0, 104.5, 110.0, 200.0])
+    assert np.allclose(evaluator.evaluate(prices), [-3.0, -3.0, 1.5, 7.0, 7.0])
+    assert evaluator(104.5) == pytest.approx(1.5)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_evaluator_matches_evaluate_piecewise(seed):
+    evaluator = PayoffEvaluator.from_result(evaluate_portfolio(*book_frames(random_book(30, 8, 2, seed=seed))))
+    prices = np.random.default_rng(seed).uniform(evaluator.strikes[0] - 20, evaluator.strikes[-1] + 20, (7, 9))
+
+    expected = evaluate_piecewise(evaluator.strikes, evaluator.slopes, evaluator.intercepts, prices)
+    assert expected.shape == prices.shape
+    assert np.array_equal(evaluator.evaluate(prices), expected)
+    assert np.allclose([evaluator(price) for price in prices.ravel()], expected.ravel())
+
+    buffer = np.empty_like(prices)
+    assert evaluator.evaluate(prices, out=buffer) is buffer
+    assert np.array_equal(buffer, expected)
+
+
+def test_evaluator_hits_the_strike_p_l():
+    result = evaluate_portfolio(*book_frames(template_book("iron_condor")))
+    evaluator = result["payoff_evaluator"]
+    assert np.allclose(evaluator.evaluate(result["strikes"].to_numpy(dtype=float)), result["total_p_l"])
@@ -0,0 +1,89 @@
+### ------------------ Payoff Kernels ------------------ ###
+#* The NumPy kernels vs the plain-loop kernels (the functions Numba compiles, run here as Python) on random legs,
+#* the compiled Numba backend when it is installed, and the checks of evaluate_piecewise's out buffer.
+
+import numpy as np
+import pytest
+
+import payoff_kernels
+from payoff_kernels import KERNELS, breakeven_scan, evaluate_piecewise, strike_interval_slopes, strike_profit_loss
+
+
+LOOPS = {
+    "strike_profit_loss": payoff_kernels._strike_profit_loss_loops,
+    "strike_interval_slopes": payoff_kernels._strike_interval_slopes_loops,
+    "breakeven_scan": payoff_kernels._breakeven_scan_loops,
+    "evaluate_piecewise": payoff_kernels._evaluate_piecewise_loops,
+}
+
+
+def random_legs(seed, n_legs=12):
+    rng = np.random.default_rng(seed)
+    leg_strikes = rng.choice(np.arange(80.0, 121.0, 2.5), n_legs)
+    leg_calls = rng.random(n_legs) < 0.5
+    leg_positions = rng.integers(1, 5, n_legs) * rng.choice([-1.0, 1.0], n_legs)
+    leg_costs = rng.uniform(0.5, 10.0, n_legs).round(2)
+    return leg_strikes, leg_calls, leg_positions, leg_costs, np.unique(leg_strikes)
+
+
+def kernel_outputs(kernels, seed):
+    leg_strikes, leg_calls, leg_positions, leg_costs, strikes = random_legs(seed)
+    p_l = kernels["strike_profit_loss"](leg_strikes, leg_calls, leg_positions, leg_costs, strikes)
+    slopes = kernels["strike_interval_slopes"](leg_strikes, leg_calls, leg_positions, strikes, 1.0)
+    intercepts = np.append(p_l - slopes[:-1] * strikes, p_l[-1] - slopes[-1] * strikes[-1])
+    prices = np.random.default_rng(seed).uniform(60.0, 140.0, 500)
+    evaluated = kernels["evaluate_piecewise"](strikes, slopes, intercepts, prices, np.empty_like(prices))
+    return p_l, slopes, kernels["breakeven_scan"](strikes, p_l, slopes), evaluated
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_numpy_matches_loops(seed):
+    #* same legs added in the same order: bit-identical
+    for numpy_output, loop_output in zip(kernel_outputs(KERNELS["numpy"], seed), kernel_outputs(LOOPS, seed)):
+        assert np.array_equal(numpy_output, loop_output)
+
+
+@pytest.mark.skipif("numba" not in KERNELS, reason="numba is not installed")
+@pytest.mark.parametrize("seed", range(10))
+def test_numba_matches_numpy(seed):
+    for numba_output, numpy_output in zip(kernel_outputs(KERNELS["numba"], seed), kernel_outputs(KERNELS["numpy"], seed)):
+        assert np.array_equal(numba_output, numpy_output)
+
+
+def test_straddle_by_hand():
+    #* +1 100 Call @ 5, +1 100 Put @ 5: -10 at 100, roots at 90 and 110
+    strikes = np.array([100.0])
+    p_l = strike_profit_loss([100.0, 100.0], [True, False], [1.0, 1.0], [5.0, 5.0], strikes, backend="numpy")
+    slopes = strike_interval_slopes([100.0, 100.0], [True, False], [1.0, 1.0], strikes, backend="numpy")
+    assert np.array_equal(p_l, [-10.0])
+    assert np.array_equal(slopes, [-1.0, 1.0])
+    assert np.allclose(breakeven_scan(strikes, p_l, slopes, backend="numpy"), [90.0, 110.0])
+
+
+def test_breakeven_at_a_strike_within_tolerance():
+    #* P&L within ZERO_TOLERANCE of 0 at a strike is a root at exactly that strike
+    roots = breakeven_scan([90.0, 100.0, 110.0], [-5.0, 1e-12, 5.0], [0.0, 0.5, 0.5, 0.0], backend="numpy")
+    assert np.array_equal(roots, [100.0])
+
+
+def test_evaluate_piecewise_keeps_the_shape():
+    strikes, slopes, intercepts = np.array([100.0, 110.0]), np.array([0.0, 1.0, 0.0]), np.array([-3.0, -103.0, 7.0])
+    prices = np.array([[50.0, 100.0], [104.5, 200.0]])
+    assert np.allclose(evaluate_piecewise(strikes, slopes, intercepts, prices, backend="numpy"), [[-3.0, -3.0], [1.5, 7.0]])
+
+    out = np.empty((2, 2))
+    assert evaluate_piecewise(strikes, slopes, intercepts, prices, out=out, backend="numpy") is out
+    assert np.allclose(out, [[-3.0, -3.0], [1.5, 7.0]])
+
+
+@pytest.mark.parametrize("out", [
+    np.empty((4, 2))[::2], #sliced view: not contiguous
+    np.empty((2, 2)).T[:, ::-1], #reversed transpose: not contiguous
+    np.empty((2, 2), dtype=np.float32),
+    np.empty(4), #right size, wrong shape
+    [[0.0, 0.0], [0.0, 0.0]],
+])
+def test_evaluate_piecewise_rejects_bad_out(out):
+    strikes, slopes, intercepts = np.array([100.0]), np.array([0.0, 1.0]), np.array([-5.0, -105.0])
+    with pytest.raises(ValueError, match=r"out must be a C-contiguous float64 array of shape \(2, 2\)"):
+        evaluate_piecewise(strikes, slopes, intercepts, np.full((2, 2), 100.0), out=out)
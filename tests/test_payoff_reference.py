@@ -0,0 +1,21 @@
+### ------------------ Payoff Engine vs Reference Evaluator (property test) ------------------ ###
+#* Same randomized checks as benchmarks/verify_reference.py on a fixed set of seeded books, so they run with pytest.
+#* Run from the repository root: python -m pytest -q tests
+
+import numpy as np
+import pytest
+
+from benchmarks.verify_reference import case_book, check_book, random_case
+
+
+N_BOOKS = 60
+MAX_LEGS = 40
+MAX_STRIKES = 12
+
+_rng = np.random.default_rng(2024)
+CASES = [random_case(_rng, MAX_LEGS, MAX_STRIKES) for _ in range(N_BOOKS)]
+
+
+@pytest.mark.parametrize("case", CASES, ids=[f"{case['generator']}-{case['seed']}" for case in CASES])
+def test_engine_matches_reference(case):
+    assert check_book(case_book(case)) == []
@@ -0,0 +1,82 @@
+### ------------------ Vol Surface ------------------ ###
+#* The natural cubic spline against curves it must reproduce exactly, and surface lookups in strike and moneyness.
+
+import numpy as np
+import pytest
+
+from pricing import TRADING_DAYS
+from vol_surface import SurfaceError, VolSurface, evaluate_spline, load_surface, read_surface_quotes, spline_coefficients
+
+
+def test_spline_goes_through_the_knots():
+    x = np.array([80.0, 90.0, 95.0, 100.0, 110.0, 125.0])
+    y = np.array([0.35, 0.29, 0.26, 0.25, 0.27, 0.31])
+    coefficients = spline_coefficients(x, y)
+    assert coefficients.shape == (5, 4)
+    assert np.allclose(evaluate_spline(x, coefficients, x), y)
+
+
+def test_spline_is_exact_on_a_line():
+    #* a line has 0 second derivative everywhere: the natural spline is the line itself
+    x = np.array([1.0, 2.0, 4.0, 7.0, 8.0])
+    coefficients = spline_coefficients(x, 0.5 - 0.03 * x)
+    points = np.linspace(1.0, 8.0, 29)
+    assert np.allclose(evaluate_spline(x, coefficients, points), 0.5 - 0.03 * points)
+    assert np.allclose(coefficients[:, 2:], 0.0)
+
+
+def test_spline_is_c2_with_natural_ends():
+    x = np.array([0.0, 1.0, 2.5, 3.0, 5.0])
+    a, b, c, d = spline_coefficients(x, np.array([1.0, 0.0, 2.0, 1.5, 3.0])).T
+    h = np.diff(x)
+    #* value, slope and curvature continuous at the inner knots
+    assert np.allclose(a[:-1] + b[:-1] * h[:-1] + c[:-1] * h[:-1] ** 2 + d[:-1] * h[:-1] ** 3, a[1:])
+    assert np.allclose(b[:-1] + 2 * c[:-1] * h[:-1] + 3 * d[:-1] * h[:-1] ** 2, b[1:])
+    assert np.allclose(2 * c[:-1] + 6 * d[:-1] * h[:-1], 2 * c[1:])
+    #* natural: no curvature at both ends
+    assert c[0] == pytest.approx(0.0)
+    assert 2 * c[-1] + 6 * d[-1] * h[-1] == pytest.approx(0.0, abs=1e-12)
+
+
+def test_spline_is_flat_outside_and_small_cases():
+    x = np.array([90.0, 100.0, 110.0])
+    coefficients = spline_coefficients(x, np.array([0.3, 0.2, 0.25]))
+    assert np.allclose(evaluate_spline(x, coefficients, [50.0, 200.0]), [0.3, 0.25])
+    assert np.allclose(evaluate_spline(x[:2], spline_coefficients(x[:2], np.array([0.3, 0.2])), [95.0]), [0.25])
+    assert np.allclose(evaluate_spline(x[:1], spline_coefficients(x[:1], np.array([0.3])), [80.0, 120.0]), [0.3, 0.3])
+
+
+def write_surface(tmp_path, header, rows):
+    path = tmp_path / "surface.csv"
+    path.write_text(header + "\n" + "\n".join(",".join(str(value) for value in row) for row in rows) + "\n")
+    return str(path)
+
+
+def test_surface_interpolates_total_variance(tmp_path):
+    #* flat smiles of 20% at 63 days and 30% at 252 days, quoted in %
+    path = write_surface(tmp_path, "Strike,Days,IV", [(strike, days, vol) for days, vol in ((63, 20), (252, 30)) for strike in (90, 100, 110)])
+    surface = load_surface(path)
+    assert load_surface(path) is surface #cached by content
+
+    assert np.allclose(surface.vol([90.0, 100.0, 105.0], 63 / TRADING_DAYS), 0.2)
+    assert np.allclose(surface.vol(100.0, 1.0), 0.3)
+    assert np.allclose(surface.vol(100.0, [1 / TRADING_DAYS, 3.0]), [0.2, 0.3]) #flat outside the expiries
+    t = 126 / TRADING_DAYS
+    expected = np.sqrt((0.04 * 0.25 + (0.09 - 0.04 * 0.25) * (t - 0.25) / 0.75) / t)
+    assert surface.vol(100.0, t) == pytest.approx(expected)
+
+
+def test_moneyness_surface_needs_the_spot(tmp_path):
+    path = write_surface(tmp_path, "moneyness,years,iv", [(0.9, 0.5, 0.3), (1.0, 0.5, 0.25), (1.1, 0.5, 0.28)])
+    surface = VolSurface(*read_surface_quotes(path))
+    assert np.allclose(surface.vol([90.0, 100.0], 0.5, spot=100.0), [0.3, 0.25])
+    assert np.allclose(surface.vol([180.0, 200.0], 0.5, spot=200.0), [0.3, 0.25])
+    with pytest.raises(SurfaceError):
+        surface.vol(100.0, 0.5)
+
+
+def test_unusable_file(tmp_path):
+    with pytest.raises(SurfaceError):
+        read_surface_quotes(write_surface(tmp_path, "strike,price", [(100, 5.0)]))
+    with pytest.raises(SurfaceError):
+        read_surface_quotes(write_surface(tmp_path, "strike,days,iv", [(100, 0, 0.2), (100, 30, -1)]))
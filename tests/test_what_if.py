@@ -0,0 +1,76 @@
+### ------------------ What-If Superposition ------------------ ###
+#* base + adjustment curves vs the payoff pipeline run on the merged book.
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic_books import book_frames, random_book, template_book
+from payoff_engine import evaluate_portfolio
+from what_if import BOOK_KEYS, Piecewise, compare_variants, evaluate, result_piecewise, superpose, variant_metrics
+
+
+def merged(base, adjustment):
+    return {key: list(base.get(key, [])) + list(adjustment.get(key, [])) for key in BOOK_KEYS}
+
+
+def piecewise(book):
+    return result_piecewise(evaluate_portfolio(*book_frames(book)))
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_superpose_matches_the_merged_book(seed):
+    base, adjustment = random_book(12, 6, 1, seed=seed), random_book(4, 5, 0, seed=100 + seed, spot=105.0)
+    total = superpose(piecewise(base), piecewise(adjustment))
+    expected = piecewise(merged(base, adjustment))
+
+    prices = np.linspace(min(total.strikes[0], expected.strikes[0]) - 30, max(total.strikes[-1], expected.strikes[-1]) + 30, 1001)
+    assert np.allclose(evaluate(total, prices), evaluate(expected, prices))
+    assert total.cost == pytest.approx(expected.cost)
+    #* the tails of the sum are the sums of the tails
+    assert total.slopes[0] == pytest.approx(expected.slopes[0])
+    assert total.slopes[-1] == pytest.approx(expected.slopes[-1])
+
+
+def test_superpose_by_hand():
+    #* +1 100 Call @ 5 (base) + -1 110 Call @ 2 (adjustment) = bull call spread: -3 below 100, +7 above 110
+    base = Piecewise(np.array([100.0]), np.array([0.0, 1.0]), np.array([-5.0, -105.0]), 5.0)
+    adjustment = Piecewise(np.array([110.0]), np.array([0.0, -1.0]), np.array([2.0, 112.0]), -2.0)
+    total = superpose(base, adjustment)
+    assert np.array_equal(total.strikes, [100.0, 110.0])
+    assert np.allclose(total.slopes, [0.0, 1.0, 0.0])
+    assert np.allclose(evaluate(total, np.array([50.0, 100.0, 105.0, 110.0, 200.0])), [-3.0, -3.0, 2.0, 7.0, 7.0])
+    assert total.cost == pytest.approx(3.0)
+
+    metrics = variant_metrics(total)
+    assert (metrics["Max Profit"], metrics["Max Loss"]) == (pytest.approx(7.0), pytest.approx(-3.0))
+    assert np.allclose(metrics["Breakevens"], [103.0])
+
+
+def test_superpose_shared_strike_and_lines():
+    #* a straddle from 2 books on the same strike, then 2 underlying lines (no vertices at all)
+    call = Piecewise(np.array([100.0]), np.array([0.0, 1.0]), np.array([-5.0, -105.0]), 5.0)
+    put = Piecewise(np.array([100.0]), np.array([-1.0, 0.0]), np.array([95.0, -5.0]), 5.0)
+    straddle = superpose(call, put)
+    assert np.array_equal(straddle.strikes, [100.0])
+    assert np.allclose(evaluate(straddle, np.array([80.0, 100.0, 125.0])), [10.0, -10.0, 15.0])
+
+    long_line = Piecewise(np.empty(0), np.array([2.0]), np.array([-200.0]), 200.0)
+    short_line = Piecewise(np.empty(0), np.array([-1.0]), np.array([105.0]), -105.0)
+    line = superpose(long_line, short_line)
+    assert len(line.strikes) == 0
+    assert np.allclose(evaluate(line, np.array([90.0, 110.0])), [-5.0, 15.0])
+    assert variant_metrics(line)["Breakevens"] == [pytest.approx(95.0)]
+
+
+def test_compare_variants():
+    base_book = template_book("call_ratio")
+    hedge = {"call_inputs": [["Call", 115.0, 1, "Buy", 0.5]]}
+    curves, table = compare_variants(evaluate_portfolio(*book_frames(base_book)), {"Hedged": hedge})
+    assert list(table.index) == ["Current Book", "Hedged"]
+    assert table.loc["Current Book", "Max Loss"] == -np.inf
+    assert np.isfinite(table.loc["Hedged", "Max Loss"])
+    assert table.loc["Hedged", "Adjustment Legs"] == 1
+
+    expected = piecewise(merged(base_book, hedge))
+    prices = np.linspace(50.0, 150.0, 201)
+    assert np.allclose(evaluate(curves["Hedged"], prices), evaluate(expected, prices))
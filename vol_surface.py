@@ -0,0 +1,180 @@
+### ------------------ Local Volatility Surface (strike / moneyness x expiry) ------------------ ###
+#* Loads an implied vol surface from a local CSV in long format, 1 row per quote:
+#*   strike or moneyness (strike / spot), days (trading days) or years to expiry, iv (decimal or %)
+#* and precomputes its interpolation once:
+#*  - every expiry's smile is fitted with a natural cubic spline and resampled on 1 common strike grid,
+#*  - the spline coefficients of every (expiry, grid cell) are kept, so a lookup is 1 searchsorted + 1 cubic per expiry,
+#*  - between expiries the total variance σ²·T is interpolated linearly (no calendar arbitrage from the interpolation),
+#*  - outside the grid the vol is flat (nearest strike / expiry).
+#* Surfaces are cached by the SHA-256 of the file, so re-reading an unchanged file never refits it.
+#* Run from the repository root: python vol_surface.py surface.csv --strikes 90 95 100 105 110 --days 30
+
+### ------------------ Import Libraries ------------------ ###
+import argparse
+import collections
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from pricing import TRADING_DAYS
+
+
+STRIKE_COLUMNS = ("strike", "moneyness")
+EXPIRY_COLUMNS = {"days": 1 / TRADING_DAYS, "dte": 1 / TRADING_DAYS, "years": 1.0, "t": 1.0} #column -> years per unit
+VOL_COLUMNS = ("iv", "vol", "implied_vol", "implied_volatility", "volatility")
+GRID_POINTS = 200 #points of the common strike grid
+SURFACE_CACHE_SIZE = 8
+
+
+class SurfaceError(ValueError):
+    #* the file is not a usable vol surface
+    pass
+
+
+###! ------------------ Natural Cubic Spline Coefficients ------------------ ###
+
+def spline_coefficients(x, y):
+    #* natural cubic spline through (x, y): coefficients (a, b, c, d) of a + b·h + c·h² + d·h³ on every cell, h = x - x[i]
+    n = len(x)
+    if n == 1:
+        return np.array([[y[0], 0.0, 0.0, 0.0]])
+    if n == 2:
+        return np.array([[y[0], (y[1] - y[0]) / (x[1] - x[0]), 0.0, 0.0]])
+
+    h = np.diff(x)
+    slopes = np.diff(y) / h
+    #* second derivatives M (M[0] = M[-1] = 0): h[i-1]·M[i-1] + 2(h[i-1] + h[i])·M[i] + h[i]·M[i+1] = 6(slope[i] - slope[i-1])
+    system = np.diag(2 * (h[:-1] + h[1:])) + np.diag(h[1:-1], 1) + np.diag(h[1:-1], -1)
+    second = np.zeros(n)
+    second[1:-1] = np.linalg.solve(system, 6 * np.diff(slopes))
+
+    return np.column_stack([
+        y[:-1],
+        slopes - h * (2 * second[:-1] + second[1:]) / 6,
+        second[:-1] / 2,
+        np.diff(second) / (6 * h),
+    ])
+
+
+def evaluate_spline(knots, coefficients, x):
+    #* coefficients: (..., cells, 4) on the same knots, x clamped to the knots (flat extrapolation)
+    x = np.clip(x, knots[0], knots[-1])
+    cell = np.clip(np.searchsorted(knots, x, side="right") - 1, 0, coefficients.shape[-2] - 1)
+    h = x - knots[cell]
+    a, b, c, d = np.moveaxis(coefficients[..., cell, :], -1, 0)
+    return a + h * (b + h * (c + h * d))
+
+
+###! ------------------ Surface ------------------ ###
+
+class VolSurface:
+    def __init__(self, quotes, by_moneyness):
+        #* quotes: DataFrame with "x" (strike or moneyness), "T" (years) and "iv" (decimal)
+        self.by_moneyness = by_moneyness
+        self.expiries = np.sort(quotes["T"].unique())
+        self.grid = np.linspace(quotes["x"].min(), quotes["x"].max(), GRID_POINTS if quotes["x"].nunique() > 1 else 1)
+
+        #* 1 spline per expiry on its own quotes, resampled on the common grid, then the grid spline coefficients
+        smiles = []
+        for expiry in self.expiries:
+            smile = quotes[quotes["T"] == expiry].groupby("x")["iv"].mean()
+            knots = smile.index.to_numpy(dtype=float)
+            smiles.append(evaluate_spline(knots, spline_coefficients(knots, smile.to_numpy(dtype=float)), self.grid))
+        self.grid_vols = np.maximum(np.array(smiles), 1e-4) #(expiries, grid points)
+        self.coefficients = np.array([spline_coefficients(self.grid, smile) for smile in self.grid_vols]) #(expiries, cells, 4)
+
+    def vol(self, strikes, time_to_expiry, spot=None):
+        #* implied vol of every (strike, expiry) in 1 vectorized call, any broadcastable shapes
+        strikes = np.asarray(strikes, dtype=float)
+        if self.by_moneyness:
+            if spot is None:
+                raise SurfaceError("A moneyness surface needs the spot to look up strikes")
+            x = strikes / np.asarray(spot, dtype=float)
+        else:
+            x = strikes
+        times = np.broadcast_to(np.asarray(time_to_expiry, dtype=float), np.broadcast(x, time_to_expiry).shape)
+        x = np.broadcast_to(x, times.shape)
+
+        #* smile of every expiry at every point: (expiries, points)
+        smiles = evaluate_spline(self.grid, self.coefficients, x.reshape(-1)) if len(self.grid) > 1 else np.repeat(self.grid_vols, x.size, axis=1)
+        if len(self.expiries) == 1:
+            return smiles[0].reshape(times.shape)
+
+        #* linear in total variance between the 2 bracketing expiries, flat vol outside
+        t = np.clip(times.reshape(-1), self.expiries[0], self.expiries[-1])
+        upper = np.clip(np.searchsorted(self.expiries, t, side="left"), 1, len(self.expiries) - 1)
+        lower = upper - 1
+        columns = np.arange(t.size)
+        t0, t1 = self.expiries[lower], self.expiries[upper]
+        w0, w1 = smiles[lower, columns] ** 2 * t0, smiles[upper, columns] ** 2 * t1
+        variance = w0 + (w1 - w0) * (t - t0) / (t1 - t0)
+        return np.sqrt(variance / t).reshape(times.shape)
+
+
+###! ------------------ Load a Local File (cached by content hash) ------------------ ###
+
+_surface_cache = collections.OrderedDict() #sha256 -> VolSurface, least recently used first
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_surface_quotes(path):
+    raw = pd.read_csv(path)
+    columns = {name.strip().lower(): name for name in raw.columns}
+
+    strike_column = next((name for name in STRIKE_COLUMNS if name in columns), None)
+    expiry_column = next((name for name in EXPIRY_COLUMNS if name in columns), None)
+    vol_column = next((name for name in VOL_COLUMNS if name in columns), None)
+    if strike_column is None or expiry_column is None or vol_column is None:
+        raise SurfaceError(f"The surface file needs a strike / moneyness column, a {' / '.join(EXPIRY_COLUMNS)} column "
+                           f"and an implied vol column ({', '.join(VOL_COLUMNS)})")
+
+    quotes = pd.DataFrame({
+        "x": raw[columns[strike_column]].astype(float),
+        "T": raw[columns[expiry_column]].astype(float) * EXPIRY_COLUMNS[expiry_column],
+        "iv": raw[columns[vol_column]].astype(float),
+    }).dropna()
+    quotes = quotes[(quotes["T"] > 0) & (quotes["iv"] > 0) & (quotes["x"] > 0)]
+    if quotes.empty:
+        raise SurfaceError("The surface file has no positive (strike, expiry, vol) rows")
+    if quotes["iv"].median() > 3: #quoted in %
+        quotes["iv"] /= 100
+    return quotes, strike_column == "moneyness"
+
+
+def load_surface(path):
+    key = file_hash(path)
+    if key in _surface_cache:
+        _surface_cache.move_to_end(key)
+        return _surface_cache[key]
+
+    surface = VolSurface(*read_surface_quotes(path))
+    _surface_cache[key] = surface
+    if len(_surface_cache) > SURFACE_CACHE_SIZE:
+        _surface_cache.popitem(last=False)
+    return surface
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up implied vols on a local surface file")
+    parser.add_argument("path", help="CSV with strike / moneyness, days / years and iv columns")
+    parser.add_argument("--strikes", type=float, nargs="+", required=True)
+    parser.add_argument("--days", type=float, default=30, help="trading days to expiry")
+    parser.add_argument("--spot", type=float, default=None, help="needed for moneyness surfaces")
+    args = parser.parse_args()
+
+    surface = load_surface(args.path)
+    vols = surface.vol(args.strikes, args.days / TRADING_DAYS, spot=args.spot)
+    for strike, vol in zip(args.strikes, vols):
+        print(f"{strike:10.2f}  {100 * vol:6.2f}%")
+
+
+if __name__ == "__main__":
+    main()
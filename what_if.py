@@ -0,0 +1,116 @@
+### ------------------ What-If Comparison by Payoff Superposition ------------------ ###
+#* The expiration payoff is linear in the legs: payoff(base + adjustment) = payoff(base) + payoff(adjustment).
+#* A variant is only its adjustment legs (same [Type, Strike, Quantity, Action, Cost] rows as the session state books);
+#* its payoff is the cached base curve + the curve of the adjustment, so a variant never re-runs the base book.
+#* Both curves are piecewise linear: the sum has the union of their vertices, its value there is the sum of the 2
+#* evaluations and its slope on every interval is the sum of the 2 slopes.
+
+### ------------------ Import Libraries ------------------ ###
+import collections
+import functools
+
+import numpy as np
+import pandas as pd
+
+from payoff_engine import LEG_COLUMNS, evaluate_portfolio, compute_breakeven_points, tail_metrics
+from payoff_kernels import evaluate_piecewise
+
+
+BOOK_KEYS = ("call_inputs", "put_inputs", "underlying_inputs")
+
+#* piecewise linear payoff: S sorted vertices, S + 1 slopes and intercepts (interval k = searchsorted(strikes, price, "right"))
+Piecewise = collections.namedtuple("Piecewise", ["strikes", "slopes", "intercepts", "cost"])
+
+
+###! ------------------ Piecewise Payoff of a Book ------------------ ###
+
+def result_piecewise(portfolio_result):
+    #* the payoff pipeline result of a book as a Piecewise; a book without open options is a line (underlying legs)
+    statistics = [portfolio_result[key] for key in ("call_stats", "put_stats", "underlying_stats")]
+    cost = 0.0 - sum(stats.get("net_amount", 0.0) for stats in statistics) #cash paid (+) or received (-) for the legs (no -0.0)
+
+    if portfolio_result["total_portfolio"].empty:
+        underlying_position = float(portfolio_result["underlying_stats"].get("net_assets", 0))
+        return Piecewise(np.empty(0), np.array([underlying_position]), np.array([-cost]), cost)
+
+    evaluator = portfolio_result["payoff_evaluator"]
+    return Piecewise(evaluator.strikes, evaluator.slopes, evaluator.intercepts, cost)
+
+
+def freeze_book(book):
+    #* hashable copy of a book (dict of lists of rows) for the cache below
+    return tuple(tuple(tuple(row) for row in book.get(key, [])) for key in BOOK_KEYS)
+
+
+@functools.lru_cache(maxsize=64)
+def book_piecewise(frozen_book):
+    #* payoff of a (small) adjustment book, computed once per distinct set of legs
+    frames = [pd.DataFrame([list(row) for row in rows], columns=LEG_COLUMNS) for rows in frozen_book]
+    return result_piecewise(evaluate_portfolio(*frames))
+
+
+###! ------------------ Superposition ------------------ ###
+
+def evaluate(piecewise, prices):
+    return evaluate_piecewise(piecewise.strikes, piecewise.slopes, piecewise.intercepts, prices)
+
+
+def superpose(base, adjustment):
+    strikes = np.union1d(base.strikes, adjustment.strikes)
+
+    #* interval k of the sum starts at vertex k - 1: the same point falls in interval searchsorted(., vertex, "right") of each curve
+    left_points = np.concatenate([[-np.inf], strikes])
+    slopes = (base.slopes[np.searchsorted(base.strikes, left_points, side="right")]
+              + adjustment.slopes[np.searchsorted(adjustment.strikes, left_points, side="right")])
+
+    anchor = np.maximum(np.arange(len(strikes) + 1) - 1, 0)
+    if len(strikes):
+        p_l = evaluate(base, strikes) + evaluate(adjustment, strikes)
+        intercepts = p_l[anchor] - slopes * strikes[anchor]
+    else: #2 lines
+        intercepts = base.intercepts + adjustment.intercepts
+    return Piecewise(strikes, slopes, intercepts, base.cost + adjustment.cost)
+
+
+def variant_metrics(piecewise):
+    if not len(piecewise.strikes):
+        slope = float(piecewise.slopes[0])
+        return {"Cost": piecewise.cost, "Max Profit": np.inf if slope else 0.0 - piecewise.cost, "Max Loss": -np.inf if slope else 0.0 - piecewise.cost,
+                "Breakevens": [] if not slope else [float(-piecewise.intercepts[0] / slope)]}
+
+    p_l = evaluate(piecewise, piecewise.strikes)
+    slopes = pd.Series(piecewise.slopes)
+    tails = tail_metrics(piecewise.strikes, p_l, slopes)
+    return {
+        "Cost": piecewise.cost,
+        "Max Profit": tails["max_profit"],
+        "Max Loss": tails["max_loss"],
+        "Breakevens": compute_breakeven_points(piecewise.strikes, p_l, slopes),
+    }
+
+
+def compare_variants(base_result, variants):
+    #* base_result: payoff pipeline result of the current book, variants: name -> adjustment book
+    #* returns name -> Piecewise (the base first) and the comparison table
+    base = result_piecewise(base_result)
+    curves = {"Current Book": base}
+    for name, adjustment in variants.items():
+        curves[name] = superpose(base, book_piecewise(freeze_book(adjustment)))
+
+    rows = []
+    for name, piecewise in curves.items():
+        metrics = variant_metrics(piecewise)
+        rows.append({
+            "Variant": name,
+            "Cost": metrics["Cost"],
+            "Max Profit": metrics["Max Profit"],
+            "Max Loss": metrics["Max Loss"],
+            "Breakevens": ", ".join(f"{point:.2f}" for point in metrics["Breakevens"]) or "None",
+            "Adjustment Legs": 0 if name == "Current Book" else sum(len(variants[name].get(key, [])) for key in BOOK_KEYS),
+        })
+    return curves, pd.DataFrame(rows).set_index("Variant")
+
+
+def curves_frame(curves, prices):
+    #* P&L of every variant on 1 price grid, for the overlay chart
+    return pd.DataFrame({name: evaluate(piecewise, prices) for name, piecewise in curves.items()}, index=pd.Index(prices, name="Stock Price"))